@@ -26,6 +26,10 @@ fi
 
 command -v aws >/dev/null 2>&1 || { echo "❌ 需要安装 AWS CLI"; exit 1; }
 command -v python3 >/dev/null 2>&1 || { echo "❌ 需要安装 Python3"; exit 1; }
+# 第 4 步的数据校验用 pyarrow 读取 CSV，提前检查，避免基础设施部署完才失败
+if [ "$FROM_STEP" -le 4 ]; then
+    python3 -c "import pyarrow" 2>/dev/null || { echo "❌ 数据校验需要 pyarrow，请先执行 pip3 install -r requirements.txt"; exit 1; }
+fi
 
 # 读取配置
 REGION=$(python3 -c "import yaml; c=yaml.safe_load(open('config.yaml')); print(c['aws']['region'])")
@@ -33,6 +37,8 @@ ACCOUNT_ID=$(python3 -c "import yaml; c=yaml.safe_load(open('config.yaml')); pri
 BUCKET=$(python3 -c "import yaml; c=yaml.safe_load(open('config.yaml')); print(c['s3']['bucket_name'])")
 PREFIX=$(python3 -c "import yaml; c=yaml.safe_load(open('config.yaml')); print(c['s3']['prefix'])")
 IDENTITY_STORE_ID=$(python3 -c "import yaml; c=yaml.safe_load(open('config.yaml')); print(c['identity_center']['identity_store_id'])")
+SCAN_CUTOFF=$(python3 -c "import yaml; c=yaml.safe_load(open('config.yaml')); print(c.get('athena', {}).get('bytes_scanned_cutoff_per_query', 10737418240))")
+SCAN_BUDGET=$(python3 -c "import yaml; c=yaml.safe_load(open('config.yaml')); print(c.get('athena', {}).get('daily_scan_budget_bytes', 107374182400))")
 STACK_NAME="kiro-analytics-stack"
 WORKGROUP="kiro-analytics-workgroup"
 GLUE_DB="kiro_analytics"
@@ -65,13 +71,27 @@ if [ "$STACK_STATUS" = "ROLLBACK_COMPLETE" ] || [ "$STACK_STATUS" = "DELETE_FAIL
     echo "  ✓ 旧 Stack 已删除"
 fi
 
-aws cloudformation deploy \
+# 打包 Lambda 代码（scripts/kiro_analytics 共享模块）并上传到 S3
+rm -rf build/lambda && mkdir -p build/lambda
+cp -r scripts/kiro_analytics build/lambda/
+find build/lambda -name __pycache__ -prune -exec rm -rf {} +
+aws cloudformation package \
     --template-file infrastructure/cloudformation.yaml \
+    --s3-bucket $BUCKET \
+    --s3-prefix lambda-artifacts \
+    --output-template-file build/cloudformation.packaged.yaml \
+    --region $REGION >/dev/null
+echo "  ✓ Lambda 代码已打包"
+
+aws cloudformation deploy \
+    --template-file build/cloudformation.packaged.yaml \
     --stack-name $STACK_NAME \
     --parameter-overrides \
         S3BucketName=$BUCKET \
         S3Prefix=$PREFIX \
         IdentityStoreId=$IDENTITY_STORE_ID \
+        BytesScannedCutoffPerQuery=$SCAN_CUTOFF \
+        DailyScanBudgetBytes=$SCAN_BUDGET \
     --capabilities CAPABILITY_IAM \
     --region $REGION \
     --no-fail-on-empty-changeset
@@ -229,24 +249,23 @@ echo ""
 fi # step 3
 
 # ============================================
-# 4. 验证 Athena 数据查询（含重试，等待表可用）
+# 4. 验证数据（等待 Glue 表可用，再直接校验 S3 中最新一天的报告文件）
 # ============================================
 if [ "$FROM_STEP" -le 4 ]; then
-echo "4️⃣  验证 Athena 数据查询..."
+echo "4️⃣  验证数据..."
 
 python3 -c "
 import boto3, time, sys
-athena = boto3.client('athena', region_name='$REGION')
 glue = boto3.client('glue', region_name='$REGION')
 tables = ['by_user_analytic', 'user_report']
 max_retries = 6
 ok = True
 
 for t in tables:
-    # 先等 Glue 表存在
     for attempt in range(max_retries):
         try:
             glue.get_table(DatabaseName='$GLUE_DB', Name=t)
+            print(f'  ✓ {t}: 表已创建')
             break
         except glue.exceptions.EntityNotFoundException:
             if attempt < max_retries - 1:
@@ -255,32 +274,13 @@ for t in tables:
             else:
                 print(f'  ✗ {t}: 表不存在，Crawler 可能未正确创建')
                 ok = False
-                continue
-
-    if not ok:
-        continue
-
-    # 查询验证
-    r = athena.start_query_execution(
-        QueryString=f'SELECT COUNT(*) FROM $GLUE_DB.{t}',
-        WorkGroup='$WORKGROUP')
-    qid = r['QueryExecutionId']
-    while True:
-        s = athena.get_query_execution(QueryExecutionId=qid)['QueryExecution']['Status']['State']
-        if s == 'SUCCEEDED':
-            cnt = athena.get_query_results(QueryExecutionId=qid)['ResultSet']['Rows'][1]['Data'][0]['VarCharValue']
-            print(f'  ✓ {t}: {cnt} 条记录')
-            break
-        elif s == 'FAILED':
-            reason = athena.get_query_execution(QueryExecutionId=qid)['QueryExecution']['Status'].get('StateChangeReason','')
-            print(f'  ✗ {t}: {reason}')
-            ok = False
-            break
-        time.sleep(2)
 if not ok:
     sys.exit(1)
 "
 
+# 流式校验报告 CSV 的列数、userid、计数列与日期格式（不经过 Athena）
+python3 scripts/validate_data.py
+
 echo "✓ 数据验证通过"
 echo ""
 fi # step 4
@@ -291,6 +291,9 @@ fi # step 4
 if [ "$FROM_STEP" -le 5 ]; then
 echo "5️⃣  创建 Athena 视图..."
 python3 scripts/create_views.py
+
+# 预先注册按用户 / 日期区间 / 层级查询的预编译语句
+python3 scripts/query_catalog.py register
 echo ""
 fi # step 5
 
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+按日期区间并行回填：把区间拆成按天/按周的 chunk，用进程池并行执行 SQL 模板。
+
+断点保存在 .backfill/<job>.json，中断后重新运行会从未完成的 chunk 继续。
+报告会晚 1~2 天到达：最近 3 天（--redo-days）的 chunk 每次都重跑，没有源数据的 chunk 不写断点。
+
+用法:
+    python3 scripts/backfill.py sql/backfill/daily_user_activity.sql \\
+        --start 2026-02-01 --end 2026-05-31 --chunk week --workers 8
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+import yaml
+
+from kiro_analytics import backfill, metrics
+from kiro_analytics.athena import WORKGROUP
+from kiro_analytics.partitions import REDO_DAYS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按日期区间并行回填')
+    parser.add_argument('template', help='SQL 模板文件')
+    parser.add_argument('--start', required=True, help='开始日期 YYYY-MM-DD')
+    parser.add_argument('--end', default=(date.today() - timedelta(days=1)).isoformat(),
+                        help='结束日期 YYYY-MM-DD（默认昨天）')
+    parser.add_argument('--chunk', choices=['day', 'week'], default='day', help='拆分粒度')
+    parser.add_argument('--workers', type=int, default=4, help='并行进程数')
+    parser.add_argument('--job', help='任务名（断点文件名），默认取模板文件名')
+    parser.add_argument('--restart', action='store_true', help='忽略已有断点，从头执行')
+    parser.add_argument('--redo-days', type=int, default=REDO_DAYS,
+                        help=f'最近 N 天的 chunk 即使已完成也重跑（默认 {REDO_DAYS}）')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open('config.yaml'))
+    athena_cfg = config.get('athena', {})
+    job = args.job or os.path.splitext(os.path.basename(args.template))[0]
+    params = {'db': config['glue']['database_name'], 'bucket': config['s3']['bucket_name']}
+    max_concurrency = int(athena_cfg.get('max_concurrent_queries', backfill.DEFAULT_MAX_CONCURRENCY))
+
+    with open(args.template) as f:
+        template = f.read()
+
+    print(f"回填 {job}: {args.start} ~ {args.end}，按{'周' if args.chunk == 'week' else '天'}拆分，"
+          f"{min(args.workers, max_concurrency)} 个并行进程")
+    summary = backfill.run(
+        job, template, params, args.start, args.end, chunk=args.chunk,
+        workers=args.workers, max_concurrency=max_concurrency,
+        workgroup=athena_cfg.get('workgroup', WORKGROUP),
+        region=config['aws']['region'], restart=args.restart, redo_days=args.redo_days)
+
+    print(f"\n完成 {summary['chunks']} 个 chunk / {summary['days']} 天，用时 {summary['seconds']}s，"
+          f"扫描 {summary['bytes_scanned'] / 1024 ** 3:.2f} GB，"
+          f"吞吐 {summary.get('days_per_minute', 0)} 天/分钟")
+    if summary['empty']:
+        print(f"⚠️ {len(summary['empty'])} 个 chunk 没有源数据（{summary['empty'][0][0]} 起），"
+              f"报告到达后重新运行即可补上")
+    metrics.report()
+    if summary['failed']:
+        print(f"✗ {summary['failed']} 个 chunk 失败，重新运行同一命令即可续跑")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+用户映射 Lambda 冷启动基准测试：在不同 MemorySize 下测量 Init Duration 与内存占用。
+
+每轮修改函数的 MemorySize 和一个占位环境变量，强制下一次调用为冷启动，
+以 {"ping": true} 调用（只完成初始化即返回），解析日志中的 REPORT 行。
+结束后恢复原有配置。
+
+用法:
+    python3 scripts/bench_lambda_cold_start.py --memory 128,256,512,1024 --runs 3
+    python3 scripts/bench_lambda_cold_start.py --local   # 仅测本地导入耗时和内存
+"""
+import argparse
+import base64
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import yaml
+
+from kiro_analytics import metrics
+from kiro_analytics.clients import client
+
+FUNCTION_NAME = 'kiro-user-mapping-sync'
+
+REPORT_FIELDS = {
+    'duration_ms': r'\tDuration: ([\d.]+) ms',
+    'billed_ms': r'Billed Duration: ([\d.]+) ms',
+    'max_memory_mb': r'Max Memory Used: (\d+) MB',
+    'init_ms': r'Init Duration: ([\d.]+) ms',
+}
+
+LOCAL_PROBE = """
+import json, time, tracemalloc, resource
+tracemalloc.start()
+t0 = time.perf_counter()
+from kiro_analytics import lambda_handler
+t1 = time.perf_counter()
+lambda_handler.handler({'ping': True}, None)
+t2 = time.perf_counter()
+peak = tracemalloc.get_traced_memory()[1]
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'first_call_ms': (t2 - t1) * 1000,
+                  'py_peak_kb': peak / 1024,
+                  'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def parse_report(log_tail):
+    line = next((l for l in log_tail.splitlines() if l.startswith('REPORT')), '')
+    result = {}
+    for field, pattern in REPORT_FIELDS.items():
+        m = re.search(pattern, line)
+        if m:
+            result[field] = float(m.group(1))
+    return result
+
+
+def wait_updated(lam):
+    lam.get_waiter('function_updated').wait(FunctionName=FUNCTION_NAME)
+
+
+def cold_invoke(lam, memory, env):
+    """更新配置以强制冷启动，然后调用一次"""
+    variables = dict(env, BENCH_NONCE=uuid.uuid4().hex)
+    lam.update_function_configuration(
+        FunctionName=FUNCTION_NAME, MemorySize=memory,
+        Environment={'Variables': variables})
+    wait_updated(lam)
+    with metrics.span('lambda.invoke', memory=memory):
+        resp = lam.invoke(FunctionName=FUNCTION_NAME, LogType='Tail',
+                          Payload=json.dumps({'ping': True}).encode())
+    return parse_report(base64.b64decode(resp.get('LogResult', '')).decode('utf-8', 'replace'))
+
+
+def bench_remote(region, memories, runs):
+    lam = client('lambda', region)
+    original = lam.get_function_configuration(FunctionName=FUNCTION_NAME)
+    env = original.get('Environment', {}).get('Variables', {})
+    results = {}
+    try:
+        for memory in memories:
+            print(f"  MemorySize={memory} MB ", end='', flush=True)
+            samples = []
+            for _ in range(runs):
+                report = cold_invoke(lam, memory, env)
+                samples.append(report)
+                metrics.emit({'type': 'bench', 'stage': 'lambda.cold_start', 'memory': memory, **report})
+                print('.', end='', flush=True)
+            results[memory] = samples
+            print(' ✓')
+    finally:
+        lam.update_function_configuration(
+            FunctionName=FUNCTION_NAME, MemorySize=original['MemorySize'],
+            Environment={'Variables': env})
+        wait_updated(lam)
+        print(f"  已恢复 MemorySize={original['MemorySize']} MB")
+
+    print(f"\n{'Memory':>8} {'Init ms':>10} {'Duration ms':>12} {'Max Mem MB':>11}")
+    for memory, samples in results.items():
+        def med(field):
+            values = [s[field] for s in samples if field in s]
+            return f"{statistics.median(values):.1f}" if values else '-'
+        print(f"{memory:>8} {med('init_ms'):>10} {med('duration_ms'):>12} {med('max_memory_mb'):>11}")
+
+
+def bench_local(runs):
+    env = dict(os.environ, KIRO_METRICS='off')
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', LOCAL_PROBE], cwd=scripts_dir, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(out))
+    for field in ('import_ms', 'first_call_ms', 'py_peak_kb', 'max_rss_mb'):
+        print(f"  {field:<14} {statistics.median(s[field] for s in samples):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用户映射 Lambda 冷启动基准测试')
+    parser.add_argument('--memory', default='128,256,512,1024', help='逗号分隔的 MemorySize 列表 (MB)')
+    parser.add_argument('--runs', type=int, default=3, help='每个 MemorySize 的冷启动次数')
+    parser.add_argument('--local', action='store_true', help='只在本地测量模块导入耗时和内存')
+    args = parser.parse_args()
+
+    if args.local:
+        print(f"本地冷启动测量 ({args.runs} 次取中位数)...")
+        bench_local(args.runs)
+        return
+
+    config = yaml.safe_load(open('config.yaml'))
+    memories = [int(m) for m in args.memory.split(',') if m.strip()]
+    print(f"冷启动基准测试: {FUNCTION_NAME}，每档 {args.runs} 次\n")
+    started = time.time()
+    bench_remote(config['aws']['region'], memories, args.runs)
+    print(f"\n✓ 完成，用时 {time.time() - started:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
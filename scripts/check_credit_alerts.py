@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+增量检查 Credit 超额告警：只读取新到达的 user_report CSV，更新当月累计，
+对越过 overage_cap 80% / 100% 的用户发出告警（配置了 alerts.topic_arn 时发布到 SNS）。
+
+用法:
+    python3 scripts/check_credit_alerts.py                    # 检查最近 4 天（含晚到的报告）
+    python3 scripts/check_credit_alerts.py --date 2026-03-05  # 检查指定日期
+"""
+import argparse
+from datetime import date, datetime, timezone
+
+import yaml
+
+from kiro_analytics import credit_alerts, metrics, reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='增量 Credit 超额告警')
+    parser.add_argument('--date', help=f'只检查指定日期 YYYY-MM-DD（默认今天及之前 {credit_alerts.RECENT_DAYS - 1} 天）')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open('config.yaml'))
+    region = config['aws']['region']
+    bucket = config['s3']['bucket_name']
+    base = reports.logs_base(config['s3']['prefix'], config['aws']['account_id'])
+    alert_cfg = config.get('alerts', {})
+    thresholds = tuple(alert_cfg.get('thresholds', credit_alerts.THRESHOLDS))
+
+    if args.date:
+        day = date.fromisoformat(args.date)
+        keys = [o['Key'] for o in reports.list_day_objects(bucket, base, 'user_report', day, region=region)]
+    else:
+        keys = credit_alerts.recent_keys(bucket, base, datetime.now(timezone.utc).date(), region=region)
+    print(f"找到 {len(keys)} 个 user_report 文件")
+
+    alerts = credit_alerts.process_keys(bucket, keys, thresholds=thresholds, region=region)
+    if alerts:
+        print(credit_alerts.format_message(alerts))
+        credit_alerts.publish(alerts, alert_cfg.get('topic_arn'), region=region)
+    else:
+        print("✓ 没有新的告警")
+    metrics.report()
+
+
+if __name__ == '__main__':
+    main()
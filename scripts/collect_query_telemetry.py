@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+采集 kiro-analytics-workgroup 的 Athena 查询历史到遥测表 athena_query_telemetry，
+创建成本排行视图，并检查当日扫描量是否超出预算（超出时退出码为 2）。
+
+可重复运行，只处理上次之后的新查询；建议每小时通过 cron 执行一次。
+"""
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import yaml
+
+from kiro_analytics import metrics, telemetry
+from kiro_analytics.athena import WORKGROUP, run_query
+
+
+def create_views(region):
+    with open('sql/telemetry_views.sql') as f:
+        content = f.read()
+    for stmt in [s.strip() for s in content.split(';')]:
+        body = '\n'.join(l for l in stmt.splitlines() if not l.strip().startswith('--')).strip()
+        if body.startswith('CREATE'):
+            run_query(body, label='telemetry_views', region=region)
+
+
+def main():
+    config = yaml.safe_load(open('config.yaml'))
+    region = config['aws']['region']
+    bucket = config['s3']['bucket_name']
+    glue_db = config['glue']['database_name']
+    athena_cfg = config.get('athena', {})
+    workgroup = athena_cfg.get('workgroup', WORKGROUP)
+    daily_budget = int(athena_cfg.get('daily_scan_budget_bytes', telemetry.DEFAULT_DAILY_SCAN_BUDGET))
+
+    print("1. 创建/更新遥测表...")
+    telemetry.ensure_table(glue_db, bucket, region=region)
+    print(f"  ✓ {glue_db}.{telemetry.TABLE}")
+
+    print(f"2. 采集 {workgroup} 查询历史...")
+    records, checkpoint = telemetry.collect(bucket, workgroup=workgroup, region=region)
+    print(f"  ✓ 新增 {len(records)} 条查询记录")
+
+    if records:
+        by_fp = defaultdict(lambda: [0, 0, ''])
+        for r in records:
+            agg = by_fp[(r['source'], r['query_fingerprint'])]
+            agg[0] += 1
+            agg[1] += r['bytes_scanned'] or 0
+            agg[2] = agg[2] or r['query'][:80].replace('\n', ' ')
+        print("  本批扫描量 Top 5:")
+        for (source, fp), (count, total, sample) in sorted(by_fp.items(), key=lambda kv: -kv[1][1])[:5]:
+            print(f"    {total / 1024 ** 3:>8.2f} GB  {count:>4} 次  [{source}] {sample}")
+
+    print("3. 创建成本排行视图...")
+    create_views(region)
+    print("  ✓ athena_expensive_queries / athena_daily_scan")
+
+    today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    used = checkpoint['daily_bytes'].get(today, 0)
+    pct = used / daily_budget * 100 if daily_budget else 0
+    print(f"\n今日扫描量: {used / 1024 ** 3:.2f} GB / 预算 {daily_budget / 1024 ** 3:.0f} GB "
+          f"({pct:.0f}%)，估算成本 ${telemetry.estimated_cost_usd(used):.2f}")
+    metrics.emit({'type': 'budget', 'stage': 'athena.daily_scan', 'bytes_scanned': used,
+                  'budget_bytes': daily_budget}, metrics=[('bytes_scanned', 'Bytes')])
+    metrics.report()
+    if daily_budget and used > daily_budget:
+        print("✗ 已超出每日扫描预算")
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
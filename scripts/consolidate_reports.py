@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+合并每天的报告小文件：每个 region/day 的多个 CSV 合并为少数几个 gzip 文件，
+写入 s3://<bucket>/compact/，并创建/更新 by_user_analytic_compact / user_report_compact 表。
+
+config.yaml 中设置 glue.compact_tables: true 后，create_views.py 和 create_datasets.py
+会改用合并后的表。
+
+用法:
+    python3 scripts/consolidate_reports.py                                  # 合并最近 3 天到昨天（补上晚到的报告）
+    python3 scripts/consolidate_reports.py --start 2026-02-01 --end 2026-03-31
+    python3 scripts/consolidate_reports.py --date 2026-03-05 --merge-clients  # 同时合并 CLI / IDE 行
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+import yaml
+
+from kiro_analytics import consolidate, metrics, reports
+from kiro_analytics.partitions import REDO_DAYS, iter_days, parse_date, redo_from
+from kiro_analytics.userid_scan import S3Source
+
+
+def main():
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    parser = argparse.ArgumentParser(description='合并每天的报告小文件')
+    parser.add_argument('--date', help='只合并指定日期 YYYY-MM-DD')
+    parser.add_argument('--start', help='开始日期 YYYY-MM-DD（默认最近 --redo-days 天）')
+    parser.add_argument('--end', default=yesterday, help='结束日期 YYYY-MM-DD（默认昨天）')
+    parser.add_argument('--redo-days', type=int, default=REDO_DAYS,
+                        help=f'未指定 --start / --date 时从 N 天前开始，覆盖晚到的报告（默认 {REDO_DAYS}）')
+    parser.add_argument('--merge-clients', action='store_true',
+                        help='把同一用户同一天的 KIRO_CLI / KIRO_IDE 行合并为一行（client_type=ALL）')
+    parser.add_argument('--target-mb', type=int, default=consolidate.TARGET_BYTES // 1024 ** 2,
+                        help='每个输出文件的未压缩大小上限（MB，默认 128）')
+    parser.add_argument('--workers', type=int, default=8, help='并行线程数')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open('config.yaml'))
+    region = config['aws']['region']
+    bucket = config['s3']['bucket_name']
+    glue_db = config['glue']['database_name']
+    base = reports.logs_base(config['s3']['prefix'], config['aws']['account_id'])
+
+    if args.date:
+        days = [parse_date(args.date)]
+    else:
+        start = parse_date(args.start) if args.start else redo_from(redo_days=args.redo_days)
+        days = list(iter_days(start, parse_date(args.end)))
+    if not days:
+        print("✗ 日期区间为空")
+        sys.exit(1)
+    print(f"合并 {days[0]} ~ {days[-1]} 的报告文件"
+          f"{'（合并 client_type）' if args.merge_clients else ''}...")
+
+    source = S3Source(bucket, region)
+    results = consolidate.run(source, bucket, base, days, merge_clients=args.merge_clients,
+                              target_bytes=args.target_mb * 1024 ** 2, workers=args.workers,
+                              region=region)
+    for r in results:
+        if r['files_in']:
+            print(f"  ✓ {r['table']}/{r['region']}/{r['day']}: {r['files_in']} → {r['files_out']} 个文件，"
+                  f"{r['rows']} 行，{r['bytes_out'] / 1024:.1f} KB")
+
+    files_in = sum(r['files_in'] for r in results)
+    files_out = sum(r['files_out'] for r in results)
+    metrics.emit({'type': 'consolidate', 'stage': 'consolidate.run', 'days': len(days),
+                  'files_in': files_in, 'files_out': files_out},
+                 metrics=[('files_in', 'Count'), ('files_out', 'Count')])
+
+    print("创建/更新 _compact 表...")
+    regions = {r for t in reports.TABLES for r in source.list_dirs(f'{base}{t}/')}
+    for name in consolidate.ensure_tables(glue_db, bucket, regions, region=region):
+        print(f"  ✓ {glue_db}.{name}")
+
+    print(f"\n✅ 合并完成：{files_in} 个文件 → {files_out} 个文件")
+    metrics.report()
+
+
+if __name__ == '__main__':
+    main()
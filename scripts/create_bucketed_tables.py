@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+按 userid 分桶重建 by_user_analytic_bucketed / user_report_bucketed，桶数按源数据量自动计算。
+每个月单独执行一条分桶 CTAS（Athena 不支持向分桶表 INSERT INTO），全部成功后才更新正式表。按用户下钻时在分桶列上用等值条件即可只读取对应的桶：
+
+    SELECT * FROM kiro_analytics.user_report_bucketed
+    WHERE userid_norm = '24681498-20e1-7057-3818-19d6b7a2f397'
+
+用法:
+    python3 scripts/create_bucketed_tables.py                 # 重建两张表
+    python3 scripts/create_bucketed_tables.py --buckets 16    # 指定桶数
+    python3 scripts/create_bucketed_tables.py --dry-run       # 只打印数据量和桶数
+"""
+import argparse
+
+import yaml
+
+from kiro_analytics import bucketing, consolidate, metrics, reports
+from kiro_analytics.athena import WORKGROUP
+
+TEMPLATE = 'sql/bucketed/by_userid.sql'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按 userid 分桶重建派生表')
+    parser.add_argument('--tables', default=','.join(reports.TABLES), help='逗号分隔的源表')
+    parser.add_argument('--buckets', type=int, help='桶数（默认按数据量计算）')
+    parser.add_argument('--dry-run', action='store_true', help='只计算桶数，不重建')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open('config.yaml'))
+    region = config['aws']['region']
+    bucket = config['s3']['bucket_name']
+    glue_db = config['glue']['database_name']
+    workgroup = config.get('athena', {}).get('workgroup', WORKGROUP)
+    base = reports.logs_base(config['s3']['prefix'], config['aws']['account_id'])
+
+    with open(TEMPLATE) as f:
+        template = f.read()
+
+    for table in args.tables.split(','):
+        total, monthly = bucketing.source_volume(bucket, base, table, region=region)
+        buckets = args.buckets or bucketing.bucket_count(monthly)
+        print(f"{table}: {total / 1024 ** 2:.1f} MB / {len(monthly)} 个月，"
+              f"最大月 {max(monthly.values(), default=0) / 1024 ** 2:.1f} MB → {buckets} 个桶")
+        if args.dry_run:
+            continue
+        if not monthly:
+            print(f"  ⚠️ {table} 没有源数据，跳过")
+            continue
+        source = consolidate.source_table(config, table)
+        name = bucketing.rebuild(template, glue_db, bucket, table, source, buckets, list(monthly),
+                                 workgroup=workgroup, region=region)
+        print(f"  ✓ {glue_db}.{name}（源表 {source}）")
+
+    metrics.report()
+
+
+if __name__ == '__main__':
+    main()
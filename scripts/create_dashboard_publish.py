@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 """创建综合 Dashboard，包含多个 Sheet，覆盖两个数据集的关键图表"""
-import boto3
 import yaml
 import sys
 
+from kiro_analytics import metrics
+from kiro_analytics.clients import client
+
 config = yaml.safe_load(open('config.yaml'))
-qs = boto3.client('quicksight', region_name=config['aws']['region'])
+qs = client('quicksight', config['aws']['region'])
 aid = config['aws']['account_id']
 region = config['aws']['region']
 user_arn = config['quicksight']['user_arn']
@@ -16,6 +18,9 @@ CREDITS_DS_ARN = f"arn:aws:quicksight:{region}:{aid}:dataset/kiro-user-credits-d
 DASHBOARD_ID = 'kiro-comprehensive-dashboard'
 DASHBOARD_NAME = 'Kiro 综合仪表板'
 
+# 默认只看最近 N 天，可在 config.yaml 的 quicksight.default_date_range_days 修改
+DATE_RANGE_DAYS = int(config['quicksight'].get('default_date_range_days', 30))
+
 perms = [{
     'Principal': user_arn,
     'Actions': [
@@ -122,6 +127,49 @@ def table(vid, title, ds, group_cols, value_cols):
     }}
 
 
+def date_parameters(days):
+    """StartDate / EndDate 参数，默认为最近 days 天（随打开时间滚动）"""
+    return [
+        {'DateTimeParameterDeclaration': {
+            'Name': 'StartDate', 'TimeGranularity': 'DAY',
+            'DefaultValues': {'RollingDate': {
+                'Expression': f"addDateTime(-{days}, 'DD', truncDate('DD', now()))"}},
+        }},
+        {'DateTimeParameterDeclaration': {
+            'Name': 'EndDate', 'TimeGranularity': 'DAY',
+            'DefaultValues': {'RollingDate': {'Expression': "truncDate('DD', now())"}},
+        }},
+    ]
+
+
+def date_controls(sheet_id):
+    return [{'DateTimePicker': {
+        'ParameterControlId': f'{sheet_id}-{name}', 'Title': title, 'SourceParameterName': name,
+    }} for name, title in (('StartDate', '开始日期'), ('EndDate', '结束日期'))]
+
+
+def date_range_filter_group(fg_id, ds, sheet_ids):
+    """按 report_date（由分区列计算，见 create_datasets.py）过滤 ds 在所有 Sheet 上的全部图表"""
+    return {
+        'FilterGroupId': fg_id,
+        'Filters': [{'TimeRangeFilter': {
+            'FilterId': f'{fg_id}-range',
+            'Column': {'DataSetIdentifier': ds, 'ColumnName': 'report_date'},
+            'RangeMinimumValue': {'Parameter': 'StartDate'},
+            'RangeMaximumValue': {'Parameter': 'EndDate'},
+            'IncludeMinimum': True,
+            'IncludeMaximum': True,
+            'NullOption': 'NON_NULLS_ONLY',
+            'TimeGranularity': 'DAY',
+        }}],
+        'ScopeConfiguration': {'SelectedSheets': {'SheetVisualScopingConfigurations': [
+            {'SheetId': sid, 'Scope': 'ALL_VISUALS'} for sid in sheet_ids
+        ]}},
+        'CrossDataset': 'SINGLE_DATASET',
+        'Status': 'ENABLED',
+    }
+
+
 # ============================================
 # Dashboard Definition
 # ============================================
@@ -192,42 +240,56 @@ definition = {
     ]
 }
 
+# 日期范围参数与筛选：每个 Sheet 顶部放开始/结束日期控件，两个数据集各一个筛选组
+sheet_ids = [sheet['SheetId'] for sheet in definition['Sheets']]
+for sheet in definition['Sheets']:
+    sheet['ParameterControls'] = date_controls(sheet['SheetId'])
+definition['ParameterDeclarations'] = date_parameters(DATE_RANGE_DAYS)
+definition['FilterGroups'] = [
+    date_range_filter_group('fg-date-credits', CR, sheet_ids),
+    date_range_filter_group('fg-date-activity', AC, sheet_ids),
+]
+
 
 # ============================================
 # 创建或更新 Dashboard
 # ============================================
 print("创建综合仪表板...")
 
-try:
-    qs.create_dashboard(
-        AwsAccountId=aid,
-        DashboardId=DASHBOARD_ID,
-        Name=DASHBOARD_NAME,
-        Permissions=perms,
-        Definition=definition
-    )
-    print(f"✓ Dashboard 创建成功: {DASHBOARD_NAME}")
-except qs.exceptions.ResourceExistsException:
-    print("  Dashboard 已存在，更新中...")
-    qs.update_dashboard(
-        AwsAccountId=aid,
-        DashboardId=DASHBOARD_ID,
-        Name=DASHBOARD_NAME,
-        Definition=definition
-    )
-    print(f"✓ Dashboard 更新成功: {DASHBOARD_NAME}")
+with metrics.span('quicksight.dashboard', dashboard=DASHBOARD_ID) as sp:
+    try:
+        qs.create_dashboard(
+            AwsAccountId=aid,
+            DashboardId=DASHBOARD_ID,
+            Name=DASHBOARD_NAME,
+            Permissions=perms,
+            Definition=definition
+        )
+        sp['action'] = 'create'
+        print(f"✓ Dashboard 创建成功: {DASHBOARD_NAME}")
+    except qs.exceptions.ResourceExistsException:
+        print("  Dashboard 已存在，更新中...")
+        qs.update_dashboard(
+            AwsAccountId=aid,
+            DashboardId=DASHBOARD_ID,
+            Name=DASHBOARD_NAME,
+            Definition=definition
+        )
+        sp['action'] = 'update'
+        print(f"✓ Dashboard 更新成功: {DASHBOARD_NAME}")
 
 # 发布最新版本
 import time
 time.sleep(3)
 try:
-    versions = qs.list_dashboard_versions(AwsAccountId=aid, DashboardId=DASHBOARD_ID)
-    latest = max(v['VersionNumber'] for v in versions['DashboardVersionSummaryList'])
-    qs.update_dashboard_published_version(
-        AwsAccountId=aid,
-        DashboardId=DASHBOARD_ID,
-        VersionNumber=latest
-    )
+    with metrics.span('quicksight.publish', dashboard=DASHBOARD_ID):
+        versions = qs.list_dashboard_versions(AwsAccountId=aid, DashboardId=DASHBOARD_ID)
+        latest = max(v['VersionNumber'] for v in versions['DashboardVersionSummaryList'])
+        qs.update_dashboard_published_version(
+            AwsAccountId=aid,
+            DashboardId=DASHBOARD_ID,
+            VersionNumber=latest
+        )
     print(f"✓ 已发布版本 {latest}")
 except Exception as e:
     print(f"  发布版本跳过: {e}")
@@ -248,18 +310,22 @@ analysis_perms = [{
     ]
 }]
 
-try:
-    qs.create_analysis(
-        AwsAccountId=aid, AnalysisId=ANALYSIS_ID, Name=ANALYSIS_NAME,
-        Definition=definition, Permissions=analysis_perms
-    )
-    print(f"✓ Analysis 创建成功: {ANALYSIS_NAME}")
-except qs.exceptions.ResourceExistsException:
-    qs.update_analysis(
-        AwsAccountId=aid, AnalysisId=ANALYSIS_ID, Name=ANALYSIS_NAME,
-        Definition=definition
-    )
-    print(f"✓ Analysis 已更新: {ANALYSIS_NAME}")
+with metrics.span('quicksight.analysis', analysis=ANALYSIS_ID) as sp:
+    try:
+        qs.create_analysis(
+            AwsAccountId=aid, AnalysisId=ANALYSIS_ID, Name=ANALYSIS_NAME,
+            Definition=definition, Permissions=analysis_perms
+        )
+        sp['action'] = 'create'
+        print(f"✓ Analysis 创建成功: {ANALYSIS_NAME}")
+    except qs.exceptions.ResourceExistsException:
+        qs.update_analysis(
+            AwsAccountId=aid, AnalysisId=ANALYSIS_ID, Name=ANALYSIS_NAME,
+            Definition=definition
+        )
+        sp['action'] = 'update'
+        print(f"✓ Analysis 已更新: {ANALYSIS_NAME}")
 
 print(f"\n✅ 综合仪表板部署完成！")
 print(f"访问: https://{region}.quicksight.aws.amazon.com/sn/dashboards/{DASHBOARD_ID}")
+metrics.report()
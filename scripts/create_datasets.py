@@ -1,15 +1,30 @@
 #!/usr/bin/env python3
-import boto3
 import yaml
 import json
 from pathlib import Path
 
+from kiro_analytics import consolidate, metrics
+from kiro_analytics.clients import client
+from kiro_analytics.partitions import DAY_COL, MONTH_COL, YEAR_COL
+
+# 分区列（Crawler 按 <region>/<year>/<month>/<day>/ 生成）
+PARTITION_INPUT_COLUMNS = [{'Name': c, 'Type': 'STRING'} for c in (YEAR_COL, MONTH_COL, DAY_COL)]
+
+# report_date 只由分区列计算：仪表板按日期过滤时，直连查询生成的 WHERE 条件
+# 只引用分区列，Athena 可以据此裁剪分区，而不是扫描全部历史
+REPORT_DATE_COLUMN = {'CreateColumnsOperation': {'Columns': [{
+    'ColumnName': 'report_date',
+    'ColumnId': 'report_date',
+    'Expression': (f"parseDate(concat({{{YEAR_COL}}}, '-', {{{MONTH_COL}}}, '-', {{{DAY_COL}}}), "
+                   f"'yyyy-MM-dd')"),
+}]}}
+
 class QuickSightDeployer:
     def __init__(self, config_path='config.yaml'):
         with open(config_path) as f:
             self.config = yaml.safe_load(f)
         
-        self.qs = boto3.client('quicksight', region_name=self.config['aws']['region'])
+        self.qs = client('quicksight', self.config['aws']['region'])
         self.account_id = self.config['aws']['account_id']
         
     def create_data_source(self):
@@ -62,7 +77,7 @@ class QuickSightDeployer:
             'activity': {
                 'RelationalTable': {
                     'DataSourceArn': ds_arn, 'Catalog': 'AwsDataCatalog',
-                    'Schema': db, 'Name': 'by_user_analytic',
+                    'Schema': db, 'Name': consolidate.source_table(self.config, 'by_user_analytic'),
                     'InputColumns': [
                         {'Name': 'date', 'Type': 'STRING'},
                         {'Name': 'userid', 'Type': 'STRING'},
@@ -87,6 +102,7 @@ class QuickSightDeployer:
                         {'Name': 'docgeneration_acceptedfilescreations', 'Type': 'INTEGER'},
                         {'Name': 'transformation_eventcount', 'Type': 'INTEGER'},
                         {'Name': 'transformation_linesgenerated', 'Type': 'INTEGER'},
+                        *PARTITION_INPUT_COLUMNS,
                     ]
                 }
             },
@@ -105,6 +121,7 @@ class QuickSightDeployer:
             'activity-base': {
                 'Alias': 'activity_data',
                 'Source': {'PhysicalTableId': 'activity'},
+                'DataTransforms': [REPORT_DATE_COLUMN],
             },
             'mapping-base': {
                 'Alias': 'user_mapping',
@@ -129,7 +146,7 @@ class QuickSightDeployer:
                 'DataTransforms': [{
                     'ProjectOperation': {
                         'ProjectedColumns': [
-                            'date', 'userid', 'username',
+                            'date', 'report_date', 'userid', 'username',
                             'chat_aicodelines', 'chat_messagesinteracted', 'chat_messagessent',
                             'inline_aicodelines', 'inline_acceptancecount', 'inline_suggestionscount',
                             'codefix_generationeventcount', 'codefix_acceptanceeventcount',
@@ -179,7 +196,7 @@ class QuickSightDeployer:
             'credits': {
                 'RelationalTable': {
                     'DataSourceArn': ds_arn, 'Catalog': 'AwsDataCatalog',
-                    'Schema': db, 'Name': 'user_report',
+                    'Schema': db, 'Name': consolidate.source_table(self.config, 'user_report'),
                     'InputColumns': [
                         {'Name': 'date', 'Type': 'STRING'},
                         {'Name': 'userid', 'Type': 'STRING'},
@@ -192,6 +209,7 @@ class QuickSightDeployer:
                         {'Name': 'overage_credits_used', 'Type': 'DECIMAL'},
                         {'Name': 'overage_enabled', 'Type': 'STRING'},
                         {'Name': 'profileid', 'Type': 'STRING'},
+                        *PARTITION_INPUT_COLUMNS,
                     ]
                 }
             },
@@ -210,6 +228,7 @@ class QuickSightDeployer:
             'credits-base': {
                 'Alias': 'credits_data',
                 'Source': {'PhysicalTableId': 'credits'},
+                'DataTransforms': [REPORT_DATE_COLUMN],
             },
             'mapping2-base': {
                 'Alias': 'user_mapping2',
@@ -234,7 +253,7 @@ class QuickSightDeployer:
                 'DataTransforms': [{
                     'ProjectOperation': {
                         'ProjectedColumns': [
-                            'date', 'userid', 'username',
+                            'date', 'report_date', 'userid', 'username',
                             'client_type', 'subscription_tier',
                             'total_messages', 'chat_conversations',
                             'credits_used', 'overage_cap',
@@ -278,14 +297,18 @@ class QuickSightDeployer:
         print("开始部署 QuickSight 资源...\n")
 
         # 1. 创建数据源
-        data_source_id = self.create_data_source()
+        with metrics.span('quicksight.data_source'):
+            data_source_id = self.create_data_source()
 
         # 2. 创建数据集
-        dataset_id = self.create_dataset(data_source_id)
-        credits_dataset_id = self.create_credits_dataset(data_source_id)
+        with metrics.span('quicksight.dataset', dataset='activity'):
+            dataset_id = self.create_dataset(data_source_id)
+        with metrics.span('quicksight.dataset', dataset='credits'):
+            credits_dataset_id = self.create_credits_dataset(data_source_id)
 
         print("\n✓ 数据源和数据集部署完成！")
         print(f"\n访问 QuickSight 控制台查看: https://{self.config['aws']['region']}.quicksight.aws.amazon.com/")
+        metrics.report()
 
 if __name__ == '__main__':
     deployer = QuickSightDeployer()
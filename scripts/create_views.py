@@ -1,20 +1,26 @@
 #!/usr/bin/env python3
 """在 Athena 中创建所有分析视图"""
-import boto3
 import re
 import time
 import yaml
 
+from kiro_analytics import consolidate, metrics
+from kiro_analytics.clients import client
+
 
 def main():
     config = yaml.safe_load(open('config.yaml'))
     region = config['aws']['region']
     workgroup = 'kiro-analytics-workgroup'
-    athena = boto3.client('athena', region_name=region)
+    athena = client('athena', region)
 
     with open('sql/create_views.sql') as f:
         content = f.read()
 
+    # glue.compact_tables 为 true 时改用合并后的 _compact 表
+    content = re.sub(r'\bkiro_analytics\.(by_user_analytic|user_report)\b',
+                     lambda m: f'kiro_analytics.{consolidate.source_table(config, m.group(1))}', content)
+
     # 去掉 SQL 注释
     content = re.sub(r'--.*$', '', content, flags=re.MULTILINE)
 
@@ -29,22 +35,26 @@ def main():
         view_name = stmt.split('AS')[0].replace('CREATE OR REPLACE VIEW', '').strip()
         print(f"  创建 {view_name} ... ", end='', flush=True)
 
-        resp = athena.start_query_execution(QueryString=stmt, WorkGroup=workgroup)
+        with metrics.span('athena.submit', label=view_name):
+            resp = athena.start_query_execution(QueryString=stmt, WorkGroup=workgroup)
         qid = resp['QueryExecutionId']
 
-        while True:
-            status = athena.get_query_execution(QueryExecutionId=qid)
-            state = status['QueryExecution']['Status']['State']
-            if state == 'SUCCEEDED':
-                print('✓')
-                break
-            elif state == 'FAILED':
-                reason = status['QueryExecution']['Status'].get('StateChangeReason', 'unknown')
-                print(f'✗ {reason}')
-                failed += 1
-                break
-            time.sleep(2)
+        with metrics.span('athena.wait', label=view_name, query_id=qid):
+            while True:
+                status = athena.get_query_execution(QueryExecutionId=qid)
+                state = status['QueryExecution']['Status']['State']
+                if state == 'SUCCEEDED':
+                    print('✓')
+                    break
+                elif state == 'FAILED':
+                    reason = status['QueryExecution']['Status'].get('StateChangeReason', 'unknown')
+                    print(f'✗ {reason}')
+                    failed += 1
+                    break
+                time.sleep(2)
+        metrics.record_query(status['QueryExecution'], label=view_name)
 
+    metrics.report()
     if failed:
         print(f"\n✗ {failed} 个视图创建失败")
         exit(1)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+多账户 / 多 Region 汇总：自动发现报告桶中 AWSLogs/ 下的全部成员账户与 Region，
+按账户并行合并到 s3://<bucket>/org/，创建/更新 by_user_analytic_all / user_report_all 表
+（分区列 account + partition_0..3），并按账户所属的 Identity Store 同步用户名映射。
+
+config.yaml 中设置 glue.fanout_tables: true 后，create_views.py 和 create_datasets.py
+会改用汇总表。汇总逻辑位于 kiro_analytics.fanout。
+
+用法:
+    python3 scripts/fanout_reports.py                                   # 汇总最近 3 天到昨天（补上晚到的报告）
+    python3 scripts/fanout_reports.py --start 2026-02-01 --end 2026-03-31 --skip-mapping
+    python3 scripts/fanout_reports.py --accounts 111111111111,222222222222
+    python3 scripts/fanout_reports.py --date 2026-03-05 --full-mapping  # 从汇总表重新同步全部用户名
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import yaml
+
+from kiro_analytics import fanout, metrics, reports, user_mapping, userid_scan
+from kiro_analytics.athena import WORKGROUP
+from kiro_analytics.partitions import REDO_DAYS, iter_days, parse_date, redo_from
+
+
+def main():
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    parser = argparse.ArgumentParser(description='多账户 / 多 Region 报告汇总')
+    parser.add_argument('--date', help='只汇总指定日期 YYYY-MM-DD')
+    parser.add_argument('--start', help='开始日期 YYYY-MM-DD（默认最近 --redo-days 天）')
+    parser.add_argument('--end', default=yesterday, help='结束日期 YYYY-MM-DD（默认昨天）')
+    parser.add_argument('--redo-days', type=int, default=REDO_DAYS,
+                        help=f'未指定 --start / --date 时从 N 天前开始，覆盖晚到的报告（默认 {REDO_DAYS}）')
+    parser.add_argument('--accounts', help='只处理这些账户，逗号分隔（默认 fanout.accounts，留空则自动发现）')
+    parser.add_argument('--merge-clients', action='store_true',
+                        help='把同一用户同一天的 KIRO_CLI / KIRO_IDE 行合并为一行（client_type=ALL）')
+    parser.add_argument('--workers-per-account', type=int, help='每个账户的并行线程数（默认 fanout.workers_per_account）')
+    parser.add_argument('--skip-mapping', action='store_true', help='不同步用户名映射')
+    parser.add_argument('--full-mapping', action='store_true', help='从 _all 表查询全部 userid 重新同步映射')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open('config.yaml'))
+    region = config['aws']['region']
+    bucket = config['s3']['bucket_name']
+    prefix = config['s3']['prefix']
+    glue_db = config['glue']['database_name']
+    fanout_cfg = config.get('fanout', {})
+    workers = args.workers_per_account or int(fanout_cfg.get('workers_per_account', 4))
+    accounts = args.accounts.split(',') if args.accounts else [str(a) for a in fanout_cfg.get('accounts') or []]
+
+    if args.date:
+        days = [parse_date(args.date)]
+    else:
+        start = parse_date(args.start) if args.start else redo_from(redo_days=args.redo_days)
+        days = list(iter_days(start, parse_date(args.end)))
+    if not days:
+        print("✗ 日期区间为空")
+        sys.exit(1)
+
+    # ============================================
+    # 1. 发现账户与 Region
+    # ============================================
+    print("1. 发现账户与 Region...")
+    source = userid_scan.S3Source(bucket, region)
+    layout = fanout.discover(source, prefix, accounts)
+    if not layout:
+        print(f"✗ s3://{bucket}/{prefix}AWSLogs/ 下没有找到 Kiro 报告")
+        sys.exit(1)
+    for account, tables in sorted(layout.items()):
+        regions = sorted({r for rs in tables.values() for r in rs})
+        print(f"  {account}: {', '.join(regions)}")
+
+    # ============================================
+    # 2. 按账户并行合并
+    # ============================================
+    print(f"2. 合并 {days[0]} ~ {days[-1]}（{len(layout)} 个账户并行，每个账户 {workers} 个线程）...")
+    began = time.perf_counter()
+    results = fanout.run(source, bucket, prefix, days, layout, merge_clients=args.merge_clients,
+                         workers_per_account=workers, region=region)
+    wall = time.perf_counter() - began
+    for account, (stats, elapsed) in sorted(results.items()):
+        files_in = sum(r['files_in'] for r in stats)
+        rows = sum(r['rows'] for r in stats)
+        print(f"  ✓ {account}: {files_in} 个文件，{rows} 行，{elapsed:.1f}s")
+    slowest = max(elapsed for _, elapsed in results.values())
+    total = sum(elapsed for _, elapsed in results.values())
+    print(f"  总耗时 {wall:.1f}s（最慢账户 {slowest:.1f}s，各账户合计 {total:.1f}s）")
+    metrics.emit({'type': 'fanout', 'stage': 'fanout.run', 'accounts': len(layout), 'days': len(days),
+                  'files_in': sum(r['files_in'] for stats, _ in results.values() for r in stats)},
+                 metrics=[('accounts', 'Count'), ('files_in', 'Count')])
+
+    # ============================================
+    # 3. 创建/更新 _all 表
+    # ============================================
+    print("3. 创建/更新 _all 表...")
+    # 表定义覆盖桶中的全部账户，--accounts 只限制本次合并的范围
+    full_layout = fanout.discover(source, prefix) if accounts else layout
+    fanout.ensure_tables(glue_db, bucket, full_layout, region=region)
+    for t in reports.TABLES:
+        print(f"  ✓ {glue_db}.{fanout.fanout_table(t)}")
+
+    # ============================================
+    # 4. 按 Identity Store 同步用户名映射
+    # ============================================
+    if not args.skip_mapping:
+        print("4. 同步用户名映射...")
+        full = args.full_mapping or user_mapping.load_mapping(bucket, region=region) is None
+        if full:
+            by_account = user_mapping.collect_userids_by_account(
+                glue_db, [fanout.fanout_table(t) for t in reports.TABLES],
+                workgroup=config.get('athena', {}).get('workgroup', WORKGROUP), region=region)
+        else:
+            keep_quotes = userid_scan.table_keeps_quotes(glue_db, region=region)
+            with ThreadPoolExecutor(max_workers=len(layout)) as pool:
+                found = pool.map(lambda a: userid_scan.scan(source, reports.logs_base(prefix, a), days,
+                                                            keep_quotes=keep_quotes, workers=workers),
+                                 sorted(layout))
+                by_account = dict(zip(sorted(layout), found))
+        by_store = {}
+        for account, uids in by_account.items():
+            by_store.setdefault(fanout.identity_store_for(config, account), set()).update(uids)
+        mapping = user_mapping.sync_stores(bucket, glue_db, by_store, full=full, region=region)
+        print(f"  ✓ 共 {len(mapping)} 个用户（{len(by_store)} 个 Identity Store）")
+
+    if not config.get('glue', {}).get('fanout_tables'):
+        print("\n提示: 在 config.yaml 中设置 glue.fanout_tables: true，视图和数据集才会读取 _all 汇总表")
+    print(f"\n✅ 多账户汇总完成：{len(layout)} 个账户")
+    metrics.report()
+
+
+if __name__ == '__main__':
+    main()
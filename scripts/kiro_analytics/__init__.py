@@ -0,0 +1 @@
+"""Kiro User Activity Analytics 共享模块（脚本与 Lambda 共用）"""
@@ -0,0 +1,59 @@
+"""Athena 查询执行（带阶段埋点）"""
+import time
+
+from kiro_analytics import metrics
+from kiro_analytics.clients import client
+
+WORKGROUP = 'kiro-analytics-workgroup'
+SUBMIT_RETRIES = 8
+
+
+def start_query(sql, label=None, workgroup=WORKGROUP, region=None, params=None):
+    """提交查询；超出账户并发配额 (TooManyRequestsException) 时指数退避重试。
+    params 为 EXECUTE 预编译语句的参数（SQL 字面量列表），见 kiro_analytics.statements"""
+    athena = client('athena', region)
+    kwargs = {'ExecutionParameters': params} if params else {}
+    with metrics.span('athena.submit', label=label) as sp:
+        for attempt in range(SUBMIT_RETRIES):
+            try:
+                return athena.start_query_execution(QueryString=sql, WorkGroup=workgroup,
+                                                    **kwargs)['QueryExecutionId']
+            except athena.exceptions.TooManyRequestsException:
+                if attempt == SUBMIT_RETRIES - 1:
+                    raise
+                sp['throttled'] = attempt + 1
+                time.sleep(min(2 ** attempt, 30))
+
+
+def wait_query(qid, label=None, region=None):
+    """等待查询结束并返回 QueryExecution；失败或取消时抛出异常"""
+    athena = client('athena', region)
+    with metrics.span('athena.wait', label=label, query_id=qid):
+        while True:
+            execution = athena.get_query_execution(QueryExecutionId=qid)['QueryExecution']
+            state = execution['Status']['State']
+            if state in ('SUCCEEDED', 'FAILED', 'CANCELLED'):
+                break
+            time.sleep(2)
+    metrics.record_query(execution, label=label)
+    if state != 'SUCCEEDED':
+        raise Exception(f"Query failed: {execution['Status'].get('StateChangeReason', '')}")
+    return execution
+
+
+def fetch_rows(qid, label=None, region=None):
+    rows = []
+    with metrics.span('athena.fetch', label=label, query_id=qid) as sp:
+        paginator = client('athena', region).get_paginator('get_query_results')
+        for page in paginator.paginate(QueryExecutionId=qid):
+            for row in page['ResultSet']['Rows']:
+                rows.append([col.get('VarCharValue', '') for col in row['Data']])
+        sp['rows'] = max(len(rows) - 1, 0)
+    return rows[1:]  # skip header
+
+
+def run_query(sql, label=None, workgroup=WORKGROUP, region=None, params=None):
+    """执行 Athena 查询并返回结果行（不含表头）"""
+    qid = start_query(sql, label=label, workgroup=workgroup, region=region, params=params)
+    wait_query(qid, label=label, region=region)
+    return fetch_rows(qid, label=label, region=region)
@@ -0,0 +1,224 @@
+"""
+按日期区间并行回填。
+
+把 [start, end] 拆成按天或按周的 chunk，用进程池并行执行 SQL 模板，
+并发数不超过 Athena 查询并发配额；每完成一个 chunk 就写入本地断点文件，
+中断后重新运行会跳过已完成的 chunk。
+
+报告会晚到，断点只用于已稳定的日期：
+    - 没有扫描到任何源数据的 chunk（分区尚未投递）不写断点，下次运行会重试
+    - 与最近 REDO_DAYS 天相交的 chunk 即使已有断点也总是重跑，补上晚到的 Region / 行
+
+SQL 模板按 ';' 分隔，可用的占位符:
+    {db} {bucket} {start} {end} {partition_filter} {partition_date}
+    {partition_filter} 展开为分区列上的日期谓词，{partition_date} 为分区列拼成的
+    'YYYY-MM-DD' 表达式（见 kiro_analytics.partitions）
+
+模板中的指令注释:
+    -- @once                 该语句只在所有 chunk 之前执行一次（如 CREATE TABLE IF NOT EXISTS）
+    -- @clear s3://.../dt={dt}/   执行 chunk 前清空其中每一天的输出前缀，使重跑幂等
+"""
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from kiro_analytics import clients, metrics
+from kiro_analytics.athena import WORKGROUP, start_query, wait_query
+from kiro_analytics.partitions import REDO_DAYS, date_filter, iter_days, parse_date, partition_date_expr, redo_from
+
+CHECKPOINT_DIR = '.backfill'
+# Athena DML 默认活跃查询配额为 25，留出余量给 QuickSight 和其他脚本
+DEFAULT_MAX_CONCURRENCY = 20
+
+_DIRECTIVE = re.compile(r'^\s*--\s*@(\w+)\s*(.*)$')
+
+
+def split_range(start, end, chunk='day'):
+    """拆分为 [(chunk_start, chunk_end)]，按周拆分时每块从周一开始"""
+    start, end = parse_date(start), parse_date(end)
+    chunks = []
+    cur = start
+    while cur <= end:
+        if chunk == 'week':
+            stop = min(cur + timedelta(days=6 - cur.weekday()), end)
+        else:
+            stop = cur
+        chunks.append((cur, stop))
+        cur = stop + timedelta(days=1)
+    return chunks
+
+
+def parse_template(text):
+    """返回 (once 语句列表, 每个 chunk 的语句列表, clear 前缀模板列表)"""
+    once, per_chunk, clear = [], [], []
+    for raw in text.split(';'):
+        directives = {}
+        body = []
+        for line in raw.splitlines():
+            m = _DIRECTIVE.match(line)
+            if m:
+                directives[m.group(1)] = m.group(2).strip()
+            elif not line.strip().startswith('--'):
+                body.append(line)
+        if 'clear' in directives:
+            clear.append(directives['clear'])
+        sql = '\n'.join(body).strip()
+        if sql:
+            (once if 'once' in directives else per_chunk).append(sql)
+    return once, per_chunk, clear
+
+
+def render(sql, params, start=None, end=None):
+    values = dict(params, partition_date=partition_date_expr())
+    if start is not None:
+        values.update(start=start.isoformat(), end=end.isoformat(),
+                      partition_filter=date_filter(start, end))
+    return sql.format(**values)
+
+
+def clear_prefixes(uri_templates, start, end, params, region=None):
+    """删除 chunk 内每一天的输出前缀（s3://bucket/prefix/dt={dt}/）"""
+    s3 = clients.client('s3', region)
+    deleted = 0
+    for template in uri_templates:
+        for day in iter_days(start, end):
+            uri = template.format(dt=day.isoformat(), **params)
+            bucket, _, prefix = uri[len('s3://'):].partition('/')
+            paginator = s3.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+                keys = [{'Key': o['Key']} for o in page.get('Contents', [])]
+                if keys:
+                    s3.delete_objects(Bucket=bucket, Delete={'Objects': keys, 'Quiet': True})
+                    deleted += len(keys)
+    return deleted
+
+
+def run_chunk(job, statements, clear, params, start, end, workgroup, region):
+    """在工作进程中执行一个 chunk，返回统计信息"""
+    metrics.configure(script=f'backfill_{job}')
+    label = f'{job}:{start}'
+    began = time.perf_counter()
+    bytes_scanned = 0
+    query_ids = []
+    with metrics.span('backfill.chunk', job=job, start=start.isoformat(), end=end.isoformat()):
+        if clear:
+            clear_prefixes(clear, start, end, params, region)
+        for sql in statements:
+            qid = start_query(render(sql, params, start, end), label=label,
+                              workgroup=workgroup, region=region)
+            execution = wait_query(qid, label=label, region=region)
+            query_ids.append(qid)
+            bytes_scanned += execution.get('Statistics', {}).get('DataScannedInBytes', 0)
+    return {
+        'start': start.isoformat(), 'end': end.isoformat(),
+        'days': (end - start).days + 1,
+        'seconds': round(time.perf_counter() - began, 2),
+        'bytes_scanned': bytes_scanned,
+        # 分区裁剪后一个字节都没读到，说明源分区还不存在或为空
+        'empty': bytes_scanned == 0,
+        'query_ids': query_ids,
+    }
+
+
+class Checkpoint:
+    """本地 JSON 断点：记录已完成的 chunk 及其统计"""
+
+    def __init__(self, job, directory=CHECKPOINT_DIR):
+        self.path = os.path.join(directory, f'{job}.json')
+        self.done = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.done = json.load(f).get('done', {})
+
+    def key(self, start, end):
+        return f'{start.isoformat()}..{end.isoformat()}'
+
+    def is_done(self, start, end):
+        return self.key(start, end) in self.done
+
+    def mark(self, result):
+        self.done[f"{result['start']}..{result['end']}"] = result
+        self._save()
+
+    def unmark(self, start, end):
+        if self.done.pop(self.key(start, end), None) is not None:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'done': self.done}, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def reset(self):
+        self.done = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def run(job, template, params, start, end, chunk='day', workers=4,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY, workgroup=WORKGROUP, region=None,
+        restart=False, redo_days=REDO_DAYS, today=None, log=print):
+    """执行回填，返回汇总统计；summary['empty'] 为没有源数据、未写断点的 chunk 列表"""
+    once, statements, clear = parse_template(template)
+    checkpoint = Checkpoint(job)
+    if restart:
+        checkpoint.reset()
+
+    chunks = split_range(start, end, chunk)
+    unsettled = redo_from(today, redo_days)
+    pending = [(s, e) for s, e in chunks if not checkpoint.is_done(s, e) or e >= unsettled]
+    redo = sum(1 for s, e in pending if checkpoint.is_done(s, e))
+    log(f"  共 {len(chunks)} 个 chunk，已完成 {len(chunks) - len(pending)}，待执行 {len(pending)}"
+        f"（其中 {redo} 个为 {unsettled} 之后的重算）")
+    if not pending:
+        return {'chunks': 0, 'days': 0, 'seconds': 0, 'bytes_scanned': 0, 'failed': 0, 'empty': []}
+
+    for sql in once:
+        qid = start_query(render(sql, params), label=f'{job}:once', workgroup=workgroup, region=region)
+        wait_query(qid, label=f'{job}:once', region=region)
+
+    workers = max(1, min(workers, max_concurrency, len(pending)))
+    began = time.perf_counter()
+    days = bytes_scanned = failed = 0
+    empty = []
+    # 子进程必须创建自己的 boto3 客户端，不能继承父进程的缓存
+    with ProcessPoolExecutor(max_workers=workers, initializer=clients.reset) as pool:
+        futures = {
+            pool.submit(run_chunk, job, statements, clear, params, s, e, workgroup, region): (s, e)
+            for s, e in pending
+        }
+        for future in as_completed(futures):
+            s, e = futures[future]
+            try:
+                result = future.result()
+            except Exception as ex:
+                failed += 1
+                log(f"  ✗ {s}..{e}: {ex}")
+                continue
+            if result['empty']:
+                empty.append((s, e))
+                checkpoint.unmark(s, e)
+                log(f"  ⚠️ {s}..{e}: 没有源数据（报告尚未投递），未记录断点")
+                continue
+            checkpoint.mark(result)
+            days += result['days']
+            bytes_scanned += result['bytes_scanned']
+            elapsed = time.perf_counter() - began
+            log(f"  ✓ {s}..{e}  {result['seconds']:>6.1f}s  {result['bytes_scanned'] / 1024 ** 2:>9.1f} MB"
+                f"  [{len(checkpoint.done)}/{len(chunks)}, {days / (elapsed / 60):.1f} 天/分钟]")
+
+    seconds = time.perf_counter() - began
+    summary = {
+        'chunks': len(pending) - failed - len(empty), 'days': days, 'seconds': round(seconds, 1),
+        'bytes_scanned': bytes_scanned, 'failed': failed,
+        'days_per_minute': round(days / (seconds / 60), 2) if seconds else 0,
+    }
+    metrics.emit({'type': 'backfill', 'stage': 'backfill.run', 'job': job, 'workers': workers, **summary},
+                 metrics=[('days_per_minute', 'Count'), ('bytes_scanned', 'Bytes')])
+    summary['empty'] = sorted(empty)
+    return summary
@@ -0,0 +1,169 @@
+"""
+按 userid 分桶的派生表。
+
+Athena 对分桶列上的等值条件只读取对应的桶文件，按用户下钻（单个用户的明细、
+Top N 用户的逐日数据）时只需扫描约 1/N 的数据。分桶列为去掉引号的 userid
+（userid_norm），原始 userid 保留以便 JOIN user_mapping。
+
+Athena 不支持向分桶表 INSERT INTO，每次全量重建：每个月单独执行一条分桶 CTAS，
+写入 <版本目录>/ym=YYYY-MM/，每条查询只扫描一个月，不会超过工作组的单查询扫描上限；
+全部成功后把正式表（按 ym 分区，partition projection 指向各月目录）原地更新到新版本，
+失败时正式表不受影响。桶数按源数据量计算，使每个月分区中每个桶的源 CSV 约 256 MB。
+"""
+import math
+import time
+from collections import defaultdict
+
+from kiro_analytics import metrics, reports
+from kiro_analytics.athena import WORKGROUP, run_query
+from kiro_analytics.clients import client
+from kiro_analytics.consolidate import clear_prefix
+from kiro_analytics.partitions import MONTH_COL, YEAR_COL
+
+PREFIX = 'derived/bucketed/'
+SUFFIX = '_bucketed'
+BUCKET_COLUMN = 'userid_norm'
+TARGET_SOURCE_BYTES_PER_BUCKET = 256 * 1024 ** 2
+MAX_BUCKETS = 64
+TMP_SUFFIX = '_building'
+MONTH_KEY = 'ym'
+
+
+def bucketed_table(table):
+    return f'{table}{SUFFIX}'
+
+
+def location(table, version):
+    """每次重建写入新的版本目录，替换成功后再删除旧目录"""
+    return f'{PREFIX}{table}-{version}/'
+
+
+def month_location(prefix, month):
+    return f'{prefix}{MONTH_KEY}={month}/'
+
+
+def month_table(name, month):
+    """单个月份 CTAS 的临时表，只用于登记列和分桶定义，数据目录由正式表复用"""
+    return f"{name}{TMP_SUFFIX}_{month.replace('-', '')}"
+
+
+def source_volume(bucket, base, table, region=None):
+    """源表 CSV 总字节数和每月字节数 {YYYY-MM: bytes}"""
+    paginator = client('s3', region).get_paginator('list_objects_v2')
+    monthly = defaultdict(int)
+    for page in paginator.paginate(Bucket=bucket, Prefix=f'{base}{table}/'):
+        for o in page.get('Contents', []):
+            parsed = reports.parse_key(o['Key'])
+            if parsed:
+                monthly[f'{parsed[2]:%Y-%m}'] += o['Size']
+    return sum(monthly.values()), dict(monthly)
+
+
+def bucket_count(monthly_bytes, target=TARGET_SOURCE_BYTES_PER_BUCKET, max_buckets=MAX_BUCKETS):
+    """按最大月份的数据量计算桶数，取 2 的幂以便数据增长后翻倍重建"""
+    largest = max(monthly_bytes.values(), default=0)
+    n = max(1, math.ceil(largest / target))
+    return min(max_buckets, 2 ** math.ceil(math.log2(n)))
+
+
+def month_filter(month):
+    """只读取 YYYY-MM 这一个月的分区"""
+    year, mon = month.split('-')
+    return f"{YEAR_COL} = '{year}' AND {MONTH_COL} = '{mon}'"
+
+
+def source_columns(glue_db, source, region=None):
+    """源表的数据列。CTAS 中显式列出，不把 partition_0..3 等分区列复制进派生表"""
+    table = client('glue', region).get_table(DatabaseName=glue_db, Name=source)['Table']
+    return [c['Name'] for c in table['StorageDescriptor']['Columns']]
+
+
+def parse_template(template):
+    """去掉注释行，返回单条 CTAS 语句"""
+    lines = [line for line in template.splitlines() if not line.strip().startswith('--')]
+    return '\n'.join(lines).strip().rstrip(';').strip()
+
+
+def table_input(month_ctas, name, bucket, prefix, months):
+    """以月份 CTAS 表的列、SerDe 和分桶定义为准，按 ym 分区，
+    partition projection 指向版本目录下的各月目录，不需要登记分区"""
+    sd = dict(month_ctas['StorageDescriptor'])
+    sd['Location'] = f's3://{bucket}/{prefix}'
+    params = dict(month_ctas.get('Parameters', {}))
+    params.update({
+        'projection.enabled': 'true',
+        f'projection.{MONTH_KEY}.type': 'date',
+        f'projection.{MONTH_KEY}.format': 'yyyy-MM',
+        f'projection.{MONTH_KEY}.range': f'{months[0]},{months[-1]}',
+        f'projection.{MONTH_KEY}.interval': '1',
+        f'projection.{MONTH_KEY}.interval.unit': 'MONTHS',
+        'storage.location.template': f's3://{bucket}/{prefix}{MONTH_KEY}=${{{MONTH_KEY}}}/',
+    })
+    return {
+        'Name': name,
+        'TableType': 'EXTERNAL_TABLE',
+        'PartitionKeys': [{'Name': MONTH_KEY, 'Type': 'string'}],
+        'Parameters': params,
+        'StorageDescriptor': sd,
+    }
+
+
+def _publish(glue_db, ti, region=None):
+    """正式表已存在时用 UpdateTable 原地指向新版本（失败时旧定义不变），否则创建；
+    返回旧的数据位置"""
+    glue = client('glue', region)
+    try:
+        old = glue.get_table(DatabaseName=glue_db, Name=ti['Name'])['Table']
+    except glue.exceptions.EntityNotFoundException:
+        glue.create_table(DatabaseName=glue_db, TableInput=ti)
+        return None
+    glue.update_table(DatabaseName=glue_db, TableInput=ti)
+    return old['StorageDescriptor']['Location']
+
+
+def _drop_table(glue_db, name, region=None):
+    """只删除 Glue 表定义，不删除数据"""
+    glue = client('glue', region)
+    try:
+        glue.delete_table(DatabaseName=glue_db, Name=name)
+    except glue.exceptions.EntityNotFoundException:
+        pass
+
+
+def rebuild(template, glue_db, bucket, table, source, buckets, months, workgroup=WORKGROUP, region=None,
+            log=print):
+    """重建一张分桶表，全部月份成功后才更新正式表。
+
+    每个月一条分桶 CTAS（临时表 <表名>_building_YYYYMM），只读取该月的源数据，
+    写入新版本目录下的 ym=YYYY-MM/；全部成功后用第一个月的表定义更新正式表并删除旧目录。
+    中途失败时删除新版本目录，正式表保持不变；临时表定义总会被删除"""
+    name = bucketed_table(table)
+    prefix = location(table, time.strftime('%Y%m%dT%H%M%S'))
+    ctas = parse_template(template)
+    columns = ',\n    '.join(f'"{c}"' for c in source_columns(glue_db, source, region))
+    months = sorted(months)
+    tmps = [month_table(name, month) for month in months]
+    with metrics.span('bucketing.rebuild', table=name, buckets=buckets, months=len(months)):
+        try:
+            for i, (month, tmp) in enumerate(zip(months, tmps)):
+                # 上次中断可能留下同名临时表，CTAS 要求表不存在
+                _drop_table(glue_db, tmp, region)
+                sql = ctas.format(db=glue_db, table=tmp, source=source, columns=columns,
+                                  location=f's3://{bucket}/{month_location(prefix, month)}',
+                                  bucket_column=BUCKET_COLUMN, bucket_count=buckets,
+                                  month_filter=month_filter(month))
+                with metrics.span('bucketing.month', table=name, month=month):
+                    run_query(sql, label=tmp, workgroup=workgroup, region=region)
+                log(f"  ✓ {month}（{i + 1}/{len(months)}）")
+            first = client('glue', region).get_table(DatabaseName=glue_db, Name=tmps[0])['Table']
+            old = _publish(glue_db, table_input(first, name, bucket, prefix, months), region)
+        except Exception:
+            clear_prefix(bucket, prefix, region)
+            raise
+        finally:
+            for tmp in tmps:
+                _drop_table(glue_db, tmp, region)
+        if old and old.rstrip('/') != f's3://{bucket}/{prefix}'.rstrip('/'):
+            old_bucket, _, old_prefix = old[len('s3://'):].partition('/')
+            clear_prefix(old_bucket, old_prefix.rstrip('/') + '/', region)
+    return name
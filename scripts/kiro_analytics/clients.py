@@ -0,0 +1,33 @@
+"""
+boto3 客户端懒加载缓存。
+
+客户端在第一次使用时才创建（boto3 本身也延迟导入），之后在同一进程内复用；
+在 Lambda 中即跨 warm invocation 复用，冷启动只为实际用到的服务付出初始化成本。
+use_factory() 可替换客户端的创建方式（本地负载模拟器用它注入模拟服务）。
+"""
+_clients = {}
+_factory = None
+
+
+def client(service, region=None):
+    """获取（必要时创建）指定服务和 Region 的 boto3 客户端"""
+    key = (service, region)
+    if key not in _clients:
+        if _factory is not None:
+            _clients[key] = _factory(service, region)
+        else:
+            import boto3
+            _clients[key] = boto3.client(service, region_name=region)
+    return _clients[key]
+
+
+def use_factory(factory):
+    """factory(service, region) 返回客户端对象；传 None 恢复使用 boto3。会清空缓存"""
+    global _factory
+    _factory = factory
+    reset()
+
+
+def reset():
+    """清空缓存（切换凭证或测试时使用）"""
+    _clients.clear()
@@ -0,0 +1,183 @@
+"""
+新用户首次出现索引与按周 cohort 留存，增量维护。
+
+    user_first_seen          userid（去引号）→ 首次出现日期、首个 client_type、首个订阅层级、cohort 周
+    cohort_retention_weekly  按 activity_week 分区：每个 cohort 在该周的活跃人数与留存率
+
+两张原始表都只按分区列读取新日期：first_seen 只追加索引中还没有的用户，
+留存表每次只追加最新的完整一周（周一至周日）。进度保存在
+s3://<bucket>/state/cohorts.json，仪表板读取留存表只需几百行。
+
+报告会晚到，first_seen 一旦写入就不会再修正，因此：
+    - 只处理最近 REDO_DAYS 天之前的日期（投递延迟）
+    - first_seen_through 只推进到连续已到达的最后一天；报告缺失的日期在
+      超过 FINAL_AFTER_DAYS 之前会挡住后面的日期
+    - 留存周在周日超过 FINAL_AFTER_DAYS 之前都是“未关闭”的，每次运行重算，
+      retention_through 只记录已关闭的周
+"""
+import json
+from datetime import date, timedelta
+
+from kiro_analytics import metrics, reports
+from kiro_analytics.athena import WORKGROUP, run_query
+from kiro_analytics.clients import client
+from kiro_analytics.consolidate import clear_prefix
+from kiro_analytics.partitions import date_filter, is_final, iter_days, partition_date_expr, redo_from
+
+FIRST_SEEN = 'user_first_seen'
+RETENTION = 'cohort_retention_weekly'
+FIRST_SEEN_PREFIX = f'derived/{FIRST_SEEN}/'
+RETENTION_PREFIX = f'derived/{RETENTION}/'
+STATE_KEY = 'state/cohorts.json'
+# 首次运行时从这一天开始建立索引（早于 Kiro 报告最早的数据）
+EPOCH = date(2024, 1, 1)
+
+
+def load_state(bucket, region=None):
+    s3 = client('s3', region)
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=STATE_KEY)['Body'].read())
+    except s3.exceptions.NoSuchKey:
+        return {'first_seen_through': None, 'retention_through': None}
+
+
+def save_state(bucket, state, region=None):
+    client('s3', region).put_object(Bucket=bucket, Key=STATE_KEY, Body=json.dumps(state).encode('utf-8'),
+                                    ContentType='application/json')
+
+
+def reset(bucket, region=None):
+    """清空两张表的数据和进度，下次运行从 EPOCH 全量重建（如补投了更早的报告）"""
+    clear_prefix(bucket, FIRST_SEEN_PREFIX, region)
+    clear_prefix(bucket, RETENTION_PREFIX, region)
+    client('s3', region).delete_object(Bucket=bucket, Key=STATE_KEY)
+
+
+def create_tables_sql(db, bucket):
+    return [
+        f"CREATE EXTERNAL TABLE IF NOT EXISTS {db}.{FIRST_SEEN} (\n"
+        f"    userid string,\n    first_date string,\n    first_client_type string,\n"
+        f"    first_tier string,\n    cohort_week string\n)\n"
+        f"STORED AS PARQUET\nLOCATION 's3://{bucket}/{FIRST_SEEN_PREFIX}'",
+        f"CREATE EXTERNAL TABLE IF NOT EXISTS {db}.{RETENTION} (\n"
+        f"    cohort_week string,\n    weeks_since int,\n    cohort_size bigint,\n"
+        f"    active_users bigint,\n    retention_pct double\n)\n"
+        f"PARTITIONED BY (activity_week string)\n"
+        f"STORED AS PARQUET\nLOCATION 's3://{bucket}/{RETENTION_PREFIX}'",
+    ]
+
+
+def _activity(db, start, end):
+    """两张原始表在 [start, end] 内的 (uid, d, client_type, tier)，只读取相关分区"""
+    where = date_filter(start, end)
+    return (f"    SELECT replace(userid, '\"', '') AS uid, {partition_date_expr()} AS d,\n"
+            f"           CAST(NULL AS varchar) AS client_type, CAST(NULL AS varchar) AS tier\n"
+            f"    FROM {db}.by_user_analytic WHERE {where}\n"
+            f"    UNION ALL\n"
+            f"    SELECT replace(userid, '\"', ''), {partition_date_expr()}, client_type, subscription_tier\n"
+            f"    FROM {db}.user_report WHERE {where}")
+
+
+def first_seen_sql(db, start, end):
+    """只插入索引中尚不存在的用户，重复执行同一区间不会产生重复行"""
+    return (f"INSERT INTO {db}.{FIRST_SEEN}\n"
+            f"SELECT n.uid, n.first_date, n.first_client_type, n.first_tier,\n"
+            f"       CAST(date_trunc('week', date(n.first_date)) AS varchar)\n"
+            f"FROM (\n"
+            f"  SELECT uid, min(d) AS first_date,\n"
+            f"         min_by(client_type, d) FILTER (WHERE client_type IS NOT NULL) AS first_client_type,\n"
+            f"         min_by(tier, d) FILTER (WHERE tier IS NOT NULL) AS first_tier\n"
+            f"  FROM (\n{_activity(db, start, end)}\n  )\n"
+            f"  WHERE uid <> ''\n"
+            f"  GROUP BY uid\n"
+            f") n\n"
+            f"LEFT JOIN {db}.{FIRST_SEEN} f ON f.userid = n.uid\n"
+            f"WHERE f.userid IS NULL")
+
+
+def retention_sql(db, week_start):
+    """week_start（周一）这一周各 cohort 的活跃人数；没有活跃用户的 cohort 记为 0"""
+    week_end = week_start + timedelta(days=6)
+    return (f"INSERT INTO {db}.{RETENTION}\n"
+            f"SELECT c.cohort_week,\n"
+            f"       CAST(date_diff('week', date(c.cohort_week), date('{week_start}')) AS int),\n"
+            f"       c.cohort_size,\n"
+            f"       COALESCE(a.active_users, 0),\n"
+            f"       CAST(COALESCE(a.active_users, 0) AS DOUBLE) / c.cohort_size * 100,\n"
+            f"       '{week_start}' AS activity_week\n"
+            f"FROM (\n"
+            f"  SELECT cohort_week, COUNT(*) AS cohort_size FROM {db}.{FIRST_SEEN}\n"
+            f"  WHERE cohort_week <= '{week_start}' GROUP BY cohort_week\n"
+            f") c\n"
+            f"LEFT JOIN (\n"
+            f"  SELECT f.cohort_week, COUNT(*) AS active_users\n"
+            f"  FROM (SELECT DISTINCT uid FROM (\n{_activity(db, week_start, week_end)}\n  )) w\n"
+            f"  JOIN {db}.{FIRST_SEEN} f ON f.userid = w.uid\n"
+            f"  GROUP BY f.cohort_week\n"
+            f") a ON a.cohort_week = c.cohort_week")
+
+
+def complete_weeks(first, through):
+    """从 first（周一）开始、截止日期不晚于 through 的所有完整周的周一"""
+    weeks = []
+    monday = first
+    while monday + timedelta(days=6) <= through:
+        weeks.append(monday)
+        monday += timedelta(days=7)
+    return weeks
+
+
+def earliest_cohort(db, workgroup=WORKGROUP, region=None):
+    rows = run_query(f'SELECT min(cohort_week) FROM {db}.{FIRST_SEEN}', label=f'{FIRST_SEEN}:min',
+                     workgroup=workgroup, region=region)
+    return date.fromisoformat(rows[0][0]) if rows and rows[0][0] else None
+
+
+def arrived_through(bucket, base, start, end, today=None, region=None):
+    """[start, end] 中从 start 起连续“报告已到达或已不会再补投”的最后一天，没有则返回 None"""
+    through = None
+    for day in iter_days(start, end):
+        if not is_final(day, today) and not reports.day_arrived(bucket, base, day, region=region):
+            break
+        through = day
+    return through
+
+
+def update(db, bucket, end, base, workgroup=WORKGROUP, region=None, today=None, log=print):
+    """把 first_seen 更新到 end（不晚于投递延迟之前、且报告已连续到达的日期），
+    再计算之后所有完整周；周日已不会再补投的周才记为已关闭"""
+    for sql in create_tables_sql(db, bucket):
+        run_query(sql, label='cohorts:create', workgroup=workgroup, region=region)
+    state = load_state(bucket, region)
+    end = min(end, redo_from(today) - timedelta(days=1))
+
+    through = state.get('first_seen_through')
+    start = date.fromisoformat(through) + timedelta(days=1) if through else EPOCH
+    stop = arrived_through(bucket, base, start, end, today=today, region=region) if start <= end else None
+    if stop:
+        with metrics.span('cohorts.first_seen', start=start.isoformat(), end=stop.isoformat()):
+            run_query(first_seen_sql(db, start, stop), label=FIRST_SEEN, workgroup=workgroup, region=region)
+        state['first_seen_through'] = stop.isoformat()
+        save_state(bucket, state, region)
+        log(f"  ✓ {FIRST_SEEN}: {start} ~ {stop}")
+    if start <= end and stop != end:
+        waiting = stop + timedelta(days=1) if stop else start
+        log(f"  ⚠️ {waiting} 的报告尚未到达，{FIRST_SEEN} 暂停在 {state.get('first_seen_through') or '-'}")
+
+    done = state.get('retention_through')
+    first = (date.fromisoformat(done) + timedelta(days=7) if done
+             else earliest_cohort(db, workgroup=workgroup, region=region))
+    through = state.get('first_seen_through')
+    weeks = complete_weeks(first, date.fromisoformat(through)) if first and through else []
+    for week in weeks:
+        sunday = week + timedelta(days=6)
+        with metrics.span('cohorts.retention', week=week.isoformat()):
+            clear_prefix(bucket, f'{RETENTION_PREFIX}activity_week={week}/', region)
+            run_query(retention_sql(db, week), label=f'{RETENTION}:{week}', workgroup=workgroup, region=region)
+        # 周按日期升序，某周未关闭则之后的周也都未关闭，下次运行从这一周开始重算
+        closed = is_final(sunday, today)
+        if closed:
+            state['retention_through'] = week.isoformat()
+            save_state(bucket, state, region)
+        log(f"  ✓ {RETENTION}: {week} ~ {sunday}{'' if closed else '（未关闭，下次重算）'}")
+    return state
@@ -0,0 +1,254 @@
+"""
+报告小文件合并。
+
+每个 region/day 按 client_type 各投递一份 CSV，组织越大每个分区的小文件越多，
+Athena 的按文件开销（S3 GET、split 调度）会占主导。本模块把每个 region/day 的
+文件合并为少数几个 gzip CSV（按未压缩大小切分，默认 128 MB 一个），写入：
+
+    s3://<bucket>/compact/<table>/<region>/<YYYY>/<MM>/<DD>/part-00000.csv.gz
+
+并创建与 Crawler 表结构、SerDe 完全相同的 <table>_compact 表（分区列仍为
+partition_0..3，使用 partition projection，无需 Crawler）。
+
+行按原始文本拷贝，不重新转义，因此 LazySimpleSerDe 下 userid 的引号等细节与原表一致。
+merge_clients=True 时再把同一用户同一天的 KIRO_CLI / KIRO_IDE 两行合并为一行
+（数值列求和，overage_cap 取最大值，client_type 置为 ALL）。
+"""
+import gzip
+import io
+import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from kiro_analytics import metrics, reports
+from kiro_analytics.clients import client
+from kiro_analytics.partitions import DAY_COL, MONTH_COL, REGION_COL, YEAR_COL
+
+PREFIX = 'compact/'
+SUFFIX = '_compact'
+TARGET_BYTES = 128 * 1024 ** 2
+MERGED_CLIENT_TYPE = 'ALL'
+# 合并 client_type 时取最大值而不是求和的列
+MAX_COLUMNS = {'overage_cap'}
+KEY_COLUMNS = ('date', 'userid')
+
+
+def compact_table(table):
+    return f'{table}{SUFFIX}'
+
+
+def source_table(config, table):
+    """config.yaml 中 glue.compact_tables 为 true 时，视图和数据集改用合并后的表；
+    glue.fanout_tables 为 true 时改用多账户汇总表（见 kiro_analytics.fanout）"""
+    glue = config.get('glue', {})
+    if glue.get('fanout_tables'):
+        from kiro_analytics.fanout import fanout_table
+        return fanout_table(table)
+    return compact_table(table) if glue.get('compact_tables') else table
+
+
+def output_prefix(table, report_region, day):
+    return reports.day_prefix(PREFIX, table, report_region, day)
+
+
+def _number(token):
+    """可参与合并的有限数值；nan / inf 等返回 None，按非数值原样保留"""
+    try:
+        value = float(token)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _format(value):
+    if not math.isfinite(value):
+        # 两个极大值相加溢出，写为空（Athena 中为 NULL）
+        return ''
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def merge_client_rows(header, lines):
+    """按 (date, userid) 合并多行，返回合并后的行文本列表（保持首次出现的顺序）"""
+    columns = [c.strip().strip('"').lower() for c in header.split(',')]
+    key_idx = [columns.index(c) for c in KEY_COLUMNS if c in columns]
+    client_idx = columns.index('client_type') if 'client_type' in columns else None
+    merged = OrderedDict()
+    for line in lines:
+        parts = line.split(',')
+        if len(parts) != len(columns):
+            # 列数不符的行（如字段中含逗号）原样保留
+            merged[('raw', len(merged))] = parts
+            continue
+        key = tuple(parts[i] for i in key_idx)
+        current = merged.get(key)
+        if current is None:
+            merged[key] = parts
+            continue
+        for i, token in enumerate(parts):
+            if i in key_idx or i == client_idx:
+                continue
+            a, b = _number(current[i]), _number(token)
+            if a is not None and b is not None:
+                current[i] = _format(max(a, b) if columns[i] in MAX_COLUMNS else a + b)
+            elif not current[i] and token:
+                current[i] = token
+        if client_idx is not None:
+            quote = '"' if current[client_idx].startswith('"') else ''
+            current[client_idx] = f'{quote}{MERGED_CLIENT_TYPE}{quote}'
+    return [','.join(parts) for parts in merged.values()]
+
+
+class _PartWriter:
+    """按未压缩大小切分，写出 part-NNNNN.csv.gz"""
+
+    def __init__(self, bucket, prefix, header, target_bytes, region=None):
+        self.bucket, self.prefix, self.header = bucket, prefix, header
+        self.target_bytes, self.region = target_bytes, region
+        self.keys, self.bytes_written = [], 0
+        self._buf = None
+
+    def _open(self):
+        self._raw = io.BytesIO()
+        self._buf = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        self._size = 0
+        self.write(self.header, count=False)
+
+    def write(self, line, count=True):
+        if self._buf is None:
+            self._open()
+        data = (line + '\n').encode('utf-8')
+        self._buf.write(data)
+        self._size += len(data)
+        if count and self._size >= self.target_bytes:
+            self.flush()
+
+    def flush(self):
+        if self._buf is None:
+            return
+        self._buf.close()
+        body = self._raw.getvalue()
+        key = f'{self.prefix}part-{len(self.keys):05d}.csv.gz'
+        client('s3', self.region).put_object(Bucket=self.bucket, Key=key, Body=body,
+                                             ContentType='text/csv', ContentEncoding='gzip')
+        self.keys.append(key)
+        self.bytes_written += len(body)
+        self._buf = None
+
+
+def clear_prefix(bucket, prefix, region=None):
+    s3 = client('s3', region)
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        keys = [{'Key': o['Key']} for o in page.get('Contents', [])]
+        if keys:
+            s3.delete_objects(Bucket=bucket, Delete={'Objects': keys, 'Quiet': True})
+
+
+def consolidate_day(source, bucket, base, table, report_region, day, merge_clients=False,
+                    target_bytes=TARGET_BYTES, region=None, out_prefix=None):
+    """合并一个 table/region/day，返回统计信息；source 提供 list_files / iter_lines（见 userid_scan）。
+    out_prefix 默认为 compact/<table>/<region>/<YYYY>/<MM>/<DD>/"""
+    keys = list(source.list_files(reports.day_prefix(base, table, report_region, day)))
+    stats = {'table': table, 'region': report_region, 'day': day.isoformat(),
+             'files_in': len(keys), 'files_out': 0, 'rows': 0, 'bytes_out': 0}
+    if not keys:
+        return stats
+    prefix = out_prefix or output_prefix(table, report_region, day)
+    with metrics.span('consolidate.day', table=table, region=report_region,
+                      day=day.isoformat(), files_in=len(keys)) as sp:
+        header, lines = None, []
+        for key in keys:
+            it = source.iter_lines(key)
+            first = next(it, None)
+            if first is None:
+                continue
+            header = header or first
+            lines.extend(line for line in it if line.strip())
+        if merge_clients and header:
+            lines = merge_client_rows(header, lines)
+        clear_prefix(bucket, prefix, region)
+        if header:
+            writer = _PartWriter(bucket, prefix, header, target_bytes, region)
+            for line in lines:
+                writer.write(line)
+            writer.flush()
+            stats.update(files_out=len(writer.keys), rows=len(lines), bytes_out=writer.bytes_written)
+        sp.update(files_out=stats['files_out'], rows=stats['rows'], bytes_out=stats['bytes_out'])
+    return stats
+
+
+def run(source, bucket, base, days, tables=reports.TABLES, merge_clients=False,
+        target_bytes=TARGET_BYTES, workers=8, region=None):
+    """并行合并多天、多个 region，返回每个 table/region/day 的统计列表"""
+    tasks = []
+    for table in tables:
+        for report_region in source.list_dirs(f'{base}{table}/'):
+            tasks.extend((table, report_region, day) for day in days)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks) or 1))) as pool:
+        return list(pool.map(
+            lambda t: consolidate_day(source, bucket, base, *t, merge_clients=merge_clients,
+                                      target_bytes=target_bytes, region=region),
+            tasks))
+
+
+def table_input(crawler_table, bucket, regions):
+    """复制 Crawler 表的列和 SerDe，指向 compact/ 前缀并启用 partition projection"""
+    name = crawler_table['Name']
+    sd = dict(crawler_table['StorageDescriptor'])
+    sd['Location'] = f's3://{bucket}/{PREFIX}{name}/'
+    params = {k: v for k, v in crawler_table.get('Parameters', {}).items()
+              if k in ('classification', 'delimiter', 'skip.header.line.count', 'columnsOrdered')}
+    params.update({
+        'skip.header.line.count': '1',
+        'projection.enabled': 'true',
+        f'projection.{REGION_COL}.type': 'enum',
+        f'projection.{REGION_COL}.values': ','.join(sorted(regions)),
+        f'projection.{YEAR_COL}.type': 'integer',
+        f'projection.{YEAR_COL}.range': '2024,2099',
+        f'projection.{MONTH_COL}.type': 'integer',
+        f'projection.{MONTH_COL}.range': '1,12',
+        f'projection.{MONTH_COL}.digits': '2',
+        f'projection.{DAY_COL}.type': 'integer',
+        f'projection.{DAY_COL}.range': '1,31',
+        f'projection.{DAY_COL}.digits': '2',
+        'storage.location.template': (f's3://{bucket}/{PREFIX}{name}/${{{REGION_COL}}}/'
+                                      f'${{{YEAR_COL}}}/${{{MONTH_COL}}}/${{{DAY_COL}}}/'),
+    })
+    return {
+        'Name': compact_table(name),
+        'TableType': 'EXTERNAL_TABLE',
+        'PartitionKeys': [{'Name': c, 'Type': 'string'} for c in (REGION_COL, YEAR_COL, MONTH_COL, DAY_COL)],
+        'Parameters': params,
+        'StorageDescriptor': {k: sd[k] for k in ('Columns', 'Location', 'InputFormat', 'OutputFormat', 'SerdeInfo')
+                              if k in sd},
+    }
+
+
+def crawler_regions(glue_db, table, region=None):
+    """Crawler 表已登记分区中的报告 Region（partition_0 的取值）"""
+    paginator = client('glue', region).get_paginator('get_partitions')
+    return {p['Values'][0] for page in paginator.paginate(DatabaseName=glue_db, TableName=table)
+            for p in page['Partitions'] if p.get('Values')}
+
+
+def ensure_tables(glue_db, bucket, regions, tables=reports.TABLES, region=None, log=print):
+    """为每张 Crawler 表创建/更新对应的 _compact 表。
+
+    regions 为空时改用 Crawler 表分区中的 Region；仍为空则跳过该表，
+    避免写出空的 projection 取值让表无法查询。返回创建/更新了的表名"""
+    glue = client('glue', region)
+    done = []
+    for table in tables:
+        crawler_table = glue.get_table(DatabaseName=glue_db, Name=table)['Table']
+        table_regions = set(regions) or crawler_regions(glue_db, table, region)
+        if not table_regions:
+            log(f"  ⚠️ {table}: 报告前缀和 Crawler 分区中都没有 Region，跳过 {compact_table(table)}")
+            continue
+        ti = table_input(crawler_table, bucket, table_regions)
+        with metrics.span('glue.update', table=ti['Name']):
+            try:
+                glue.create_table(DatabaseName=glue_db, TableInput=ti)
+            except glue.exceptions.AlreadyExistsException:
+                glue.update_table(DatabaseName=glue_db, TableInput=ti)
+        done.append(ti['Name'])
+    return done
@@ -0,0 +1,151 @@
+"""
+增量 Credit 超额告警。
+
+只处理新到达的 user_report CSV 对象（直接从 S3 流式读取，不经过 Athena），
+把每个用户的当月累计 credits_used 保存在紧凑的状态文件中：
+
+    s3://<bucket>/state/credit_alerts/<YYYY-MM>.json
+    {"processed": [已处理对象 key], "processed_since": "YYYY-MM-DD",
+     "users": {userid: [累计 credits, overage_cap, tier, 已告警级别]}}
+
+当月累计超过（>）overage_cap 的 80% / 100% 时各告警一次（与 user_credits_enhanced 视图的
+Warning / Over Limit 口径一致：credits_used > overage_cap 为 Over Limit，比例 > 0.8 为 Warning），
+成本只与当天新增数据量成正比。
+
+processed 只保留最近 PROCESSED_RETAIN_DAYS 天的 key（去重只需要覆盖仍会被重新列出的日期），
+更早日期的 key 视为已处理，状态文件大小不随月内天数增长。
+"""
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+from kiro_analytics import metrics, reports
+from kiro_analytics.clients import client
+from kiro_analytics.partitions import REDO_DAYS
+
+STATE_PREFIX = 'state/credit_alerts/'
+THRESHOLDS = (80, 100)
+LEVEL_NAMES = {80: 'Warning', 100: 'Over Limit'}
+# 报告最多晚到 REDO_DAYS 天：定时检查列出今天及之前 REDO_DAYS 天的目录
+RECENT_DAYS = REDO_DAYS + 1
+# 大于 RECENT_DAYS，重新列出的 key 都还在 processed 中
+PROCESSED_RETAIN_DAYS = 7
+
+
+def state_key(month):
+    return f'{STATE_PREFIX}{month}.json'
+
+
+def load_state(bucket, month, region=None):
+    s3 = client('s3', region)
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=state_key(month))['Body'].read())
+    except s3.exceptions.NoSuchKey:
+        return {'processed': [], 'users': {}}
+
+
+def save_state(bucket, month, state, region=None):
+    body = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    with metrics.span('s3.upload', key=state_key(month), bytes=len(body)):
+        client('s3', region).put_object(Bucket=bucket, Key=state_key(month), Body=body,
+                                        ContentType='application/json')
+
+
+def apply_rows(users, rows, thresholds=THRESHOLDS):
+    """把一个文件的行累加进 users，返回本次新超过阈值（严格大于）的告警列表"""
+    touched = set()
+    for row in rows:
+        uid = row.get('userid', '').strip('"').strip()
+        if not uid:
+            continue
+        entry = users.setdefault(uid, [0.0, 0.0, '', 0])
+        entry[0] += reports.to_float(row.get('credits_used'))
+        entry[1] = max(entry[1], reports.to_float(row.get('overage_cap')))
+        entry[2] = row.get('subscription_tier') or entry[2]
+        touched.add(uid)
+
+    alerts = []
+    for uid in touched:
+        credits, cap, tier, alerted = users[uid]
+        if cap <= 0:
+            continue
+        pct = credits / cap * 100
+        crossed = [t for t in thresholds if pct > t and t > alerted]
+        if crossed:
+            level = max(crossed)
+            users[uid][3] = level
+            alerts.append({'userid': uid, 'tier': tier, 'credits_mtd': round(credits, 2),
+                           'overage_cap': cap, 'utilization_pct': round(pct, 1),
+                           'level': level, 'status': LEVEL_NAMES.get(level, f'{level}%')})
+    return alerts
+
+
+def prune_processed(state, retain_days=PROCESSED_RETAIN_DAYS):
+    """只保留最新日期之前 retain_days 天内的已处理 key"""
+    days = {k: reports.parse_key(k)[2] for k in state['processed']}
+    if not days:
+        return
+    since = max(days.values()) - timedelta(days=retain_days - 1)
+    state['processed'] = sorted(k for k, d in days.items() if d >= since)
+    state['processed_since'] = since.isoformat()
+
+
+def process_keys(bucket, keys, thresholds=THRESHOLDS, region=None):
+    """处理一批 user_report 对象 key（已处理过的会被跳过），返回告警列表"""
+    by_month = defaultdict(list)
+    for key in keys:
+        parsed = reports.parse_key(key)
+        if parsed and parsed[0] == 'user_report' and key.endswith('.csv'):
+            by_month[f'{parsed[2]:%Y-%m}'].append(key)
+
+    alerts = []
+    for month, month_keys in sorted(by_month.items()):
+        state = load_state(bucket, month, region)
+        processed = set(state['processed'])
+        since = state.get('processed_since', '')
+        new_keys = sorted(k for k in set(month_keys)
+                          if k not in processed and reports.parse_key(k)[2].isoformat() >= since)
+        if not new_keys:
+            continue
+        with metrics.span('alerts.evaluate', month=month, files=len(new_keys)) as sp:
+            for key in new_keys:
+                found = apply_rows(state['users'], reports.iter_csv_rows(bucket, key, region), thresholds)
+                for alert in found:
+                    alert['month'] = month
+                    alert['source_key'] = key
+                alerts.extend(found)
+                state['processed'].append(key)
+            sp['users'] = len(state['users'])
+            sp['alerts'] = len(alerts)
+        prune_processed(state)
+        save_state(bucket, month, state, region)
+    return alerts
+
+
+def recent_keys(bucket, base, today, days=RECENT_DAYS, region=None):
+    """列出最近几天（含今天）的 user_report 对象 key；晚到的文件落在较早日期的目录中"""
+    keys = []
+    regions = reports.list_regions(bucket, base, 'user_report', region)
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        keys.extend(o['Key'] for o in
+                    reports.list_day_objects(bucket, base, 'user_report', day, regions, region))
+    return keys
+
+
+def format_message(alerts):
+    lines = [f"Kiro Credit 告警: {len(alerts)} 个用户越过阈值", '']
+    for a in sorted(alerts, key=lambda a: -a['utilization_pct']):
+        lines.append(f"[{a['status']}] {a['userid']} ({a['tier']}) "
+                     f"{a['credits_mtd']} / {a['overage_cap']} = {a['utilization_pct']}%  ({a['month']})")
+    return '\n'.join(lines)
+
+
+def publish(alerts, topic_arn, region=None):
+    if not alerts or not topic_arn:
+        return
+    with metrics.span('sns.publish', alerts=len(alerts)):
+        client('sns', region).publish(
+            TopicArn=topic_arn,
+            Subject=f'Kiro Credit alert: {len(alerts)} user(s)',
+            Message=format_message(alerts))
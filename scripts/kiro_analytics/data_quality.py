@@ -0,0 +1,239 @@
+"""
+报告 CSV 的本地数据质量校验：用 pyarrow 流式读取 S3（或本地目录）中的文件，
+按批做向量化检查，替代部署时对整张表执行的 SELECT COUNT(*)。
+
+按 LazySimpleSerDe 的方式读取（按逗号切分、不处理引号），所有列先读成字符串，
+再逐批检查：
+    - 列数与列名是否符合 46 / 11 列的约定，行宽是否一致
+    - userid 为空、userid 带引号（Athena 中需要 replace 去引号）
+    - COUNTER_COLUMNS 中的计数列能否解析为数值、是否为负数（其余列不做数值检查）
+    - date 列格式（by_user_analytic 为 MM-DD-YYYY，user_report 为 YYYY-MM-DD）
+      以及是否与所在目录的日期一致
+    - client_type 是否为 KIRO_CLI / KIRO_IDE
+每个文件记录行数、字节数与吞吐（MB/s）。依赖 pyarrow（pip install pyarrow）。
+"""
+import random
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+
+from kiro_analytics import metrics, reports
+from kiro_analytics.userid_scan import day_keys
+
+BLOCK_SIZE = 4 * 1024 * 1024
+CLIENT_TYPES = ['KIRO_CLI', 'KIRO_IDE']
+NUMBER = r'^-?[0-9]+(\.[0-9]+)?([eE][-+]?[0-9]+)?$'
+# 表 → (列数, 必须存在的列, date 列正则, date 列格式)
+SCHEMAS = {
+    'by_user_analytic': (
+        46,
+        ['date', 'userid', 'chat_aicodelines', 'chat_messagesinteracted', 'chat_messagessent',
+         'inline_aicodelines', 'inline_acceptancecount', 'inline_suggestionscount',
+         'codefix_acceptanceeventcount', 'codefix_acceptedlines', 'codefix_generatedlines',
+         'codefix_generationeventcount', 'codereview_failedeventcount', 'codereview_findingscount',
+         'codereview_succeededeventcount', 'dev_acceptanceeventcount', 'dev_acceptedlines',
+         'dev_generatedlines', 'dev_generationeventcount', 'testgeneration_acceptedlines',
+         'testgeneration_acceptedtests', 'testgeneration_eventcount', 'testgeneration_generatedlines',
+         'testgeneration_generatedtests', 'inlinechat_acceptanceeventcount',
+         'inlinechat_acceptedlineadditions', 'inlinechat_acceptedlinedeletions',
+         'inlinechat_totaleventcount', 'docgeneration_eventcount', 'docgeneration_acceptedfilescreations',
+         'docgeneration_acceptedlineadditions', 'transformation_eventcount', 'transformation_linesgenerated'],
+        r'^[0-9]{2}-[0-9]{2}-[0-9]{4}$', '%m-%d-%Y',
+    ),
+    'user_report': (
+        11,
+        ['date', 'userid', 'client_type', 'subscription_tier', 'credits_used', 'overage_cap',
+         'overage_credits_used', 'overage_enabled', 'total_messages', 'chat_conversations', 'profileid'],
+        r'^[0-9]{4}-[0-9]{2}-[0-9]{2}$', '%Y-%m-%d',
+    ),
+}
+# 表 → 需要做数值检查的计数列；报告新增的列不在其中，不会被误判为非数值
+COUNTER_COLUMNS = {
+    'by_user_analytic': frozenset(SCHEMAS['by_user_analytic'][1][2:]),
+    'user_report': frozenset(['credits_used', 'overage_cap', 'overage_credits_used', 'total_messages',
+                              'chat_conversations']),
+}
+# 出现即判定校验失败的问题；其余只作为警告输出
+ERRORS = ('column_count', 'missing_columns', 'bad_rows', 'null_userid', 'non_numeric', 'negative', 'bad_date')
+WARNINGS = ('quoted_userid', 'date_mismatch', 'unknown_client_type')
+
+
+class _CountingReader:
+    """包装二进制流：先读出表头行，其余内容交给 pyarrow，同时统计读取的字节数"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes = 0
+        self._buffer = b''
+
+    def _read_raw(self, size):
+        data = self.stream.read(size)
+        self.bytes += len(data)
+        return data
+
+    def header(self):
+        while b'\n' not in self._buffer:
+            chunk = self._read_raw(64 * 1024)
+            if not chunk:
+                break
+            self._buffer += chunk
+        line, _, self._buffer = self._buffer.partition(b'\n')
+        return line.decode('utf-8-sig').rstrip('\r')
+
+    def read(self, size=-1):
+        if self._buffer:
+            data = self._buffer if size is None or size < 0 else self._buffer[:size]
+            self._buffer = self._buffer[len(data):]
+            return data
+        return self._read_raw(size if size is not None and size >= 0 else -1)
+
+    @property
+    def closed(self):
+        return False
+
+    def close(self):
+        self.stream.close()
+
+
+def _clean(name):
+    return name.strip().strip('"').lower()
+
+
+def check_batch(batch, names, table, day, issues):
+    """对一个 RecordBatch 做向量化检查，问题计数累加到 issues"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    _, _, date_pattern, date_format = SCHEMAS[table]
+    counters = COUNTER_COLUMNS[table]
+
+    def add(name, mask):
+        n = pc.sum(pc.cast(pc.fill_null(mask, False), 'int64')).as_py() or 0
+        if n:
+            issues[name] = issues.get(name, 0) + n
+
+    client_types = pa.array(CLIENT_TYPES, type=pa.string())
+    for i, name in enumerate(names):
+        raw = batch.column(i)
+        value = pc.utf8_trim(raw, '"')
+        empty = pc.or_(pc.is_null(value), pc.equal(pc.utf8_length(value), 0))
+        if name == 'userid':
+            add('null_userid', empty)
+            add('quoted_userid', pc.starts_with(raw, '"'))
+        elif name == 'date':
+            valid = pc.match_substring_regex(value, date_pattern)
+            add('bad_date', pc.invert(valid))
+            if day is not None:
+                add('date_mismatch', pc.and_(valid, pc.not_equal(value, day.strftime(date_format))))
+        elif name == 'client_type':
+            known = pc.is_in(value, value_set=client_types)
+            add('unknown_client_type', pc.and_(pc.invert(empty), pc.invert(known)))
+        elif name in counters:
+            # 计数列允许为空（Athena 中为 NULL），非空时必须是非负数值
+            numeric = pc.match_substring_regex(value, NUMBER)
+            add('non_numeric', pc.and_(pc.invert(empty), pc.invert(numeric)))
+            add('negative', pc.and_(numeric, pc.starts_with(value, '-')))
+
+
+def validate_file(source, key, block_size=BLOCK_SIZE):
+    """流式校验一个报告文件，返回 {'key', 'table', 'rows', 'bytes', 'seconds', 'mb_per_s', 'issues'}"""
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+
+    parsed = reports.parse_key(key)
+    table, day = (parsed[0], parsed[2]) if parsed else (None, None)
+    result = {'key': key, 'table': table, 'rows': 0, 'bytes': 0, 'seconds': 0.0, 'mb_per_s': 0.0, 'issues': {}}
+    if table not in SCHEMAS:
+        return result
+    issues = result['issues']
+    expected_count, required, _, _ = SCHEMAS[table]
+    bad_rows = []
+
+    def on_invalid_row(row):
+        bad_rows.append(row.number)
+        return 'skip'
+
+    began = time.perf_counter()
+    stream = _CountingReader(source.open(key))
+    with metrics.span('data_quality.file', table=table, key=key) as sp:
+        try:
+            header = stream.header()
+            names = [_clean(n) for n in header.split(',')] if header else []
+            if len(names) != expected_count:
+                issues['column_count'] = len(names)
+            missing = [c for c in required if c not in names]
+            if missing:
+                issues['missing_columns'] = len(missing)
+            if names:
+                # 所有列按字符串读取，坏数据不会让 pyarrow 的类型推断报错，由 check_batch 统计
+                columns = [f'c{i}' for i in range(len(names))]
+                reader = pacsv.open_csv(
+                    stream,
+                    read_options=pacsv.ReadOptions(block_size=block_size, column_names=columns),
+                    parse_options=pacsv.ParseOptions(quote_char=False, invalid_row_handler=on_invalid_row),
+                    convert_options=pacsv.ConvertOptions(
+                        column_types={c: pa.string() for c in columns}, strings_can_be_null=False))
+                for batch in reader:
+                    result['rows'] += batch.num_rows
+                    check_batch(batch, names, table, day, issues)
+        except pa.ArrowInvalid:
+            bad_rows.append(None)
+        finally:
+            stream.close()
+        if bad_rows:
+            issues['bad_rows'] = len(bad_rows)
+        result['bytes'] = stream.bytes
+        result['seconds'] = time.perf_counter() - began
+        result['mb_per_s'] = result['bytes'] / 1024 ** 2 / result['seconds'] if result['seconds'] else 0.0
+        sp.update(rows=result['rows'], bytes=result['bytes'], mb_per_s=round(result['mb_per_s'], 2))
+    return result
+
+
+def latest_day(source, base, table):
+    """各 region 下最新的 YYYY/MM/DD 目录中最晚的一天，没有数据时返回 None"""
+    latest = None
+    for report_region in source.list_dirs(f'{base}{table}/'):
+        prefix = f'{base}{table}/{report_region}/'
+        parts = []
+        for _ in range(3):
+            found = sorted(source.list_dirs(prefix))
+            if not found:
+                break
+            parts.append(found[-1])
+            prefix += found[-1] + '/'
+        if len(parts) == 3:
+            day = date(*map(int, parts))
+            latest = max(latest, day) if latest else day
+    return latest
+
+
+def run(source, base, days, sample=None, workers=8, seed=None):
+    """校验指定日期的报告文件；sample 为每张表最多随机抽取的文件数。返回每个文件的结果"""
+    with metrics.span('data_quality.list') as sp:
+        keys = day_keys(source, base, days)
+        sp['files'] = len(keys)
+    if sample:
+        rng = random.Random(seed)
+        picked = []
+        for table in SCHEMAS:
+            table_keys = [k for k in keys if f'/{table}/' in k]
+            picked.extend(rng.sample(table_keys, min(sample, len(table_keys))))
+        keys = picked
+    with metrics.span('data_quality.run', files=len(keys)) as sp:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(keys) or 1))) as pool:
+            results = list(pool.map(lambda k: validate_file(source, k), keys))
+        sp['rows'] = sum(r['rows'] for r in results)
+        sp['bytes'] = sum(r['bytes'] for r in results)
+    return results
+
+
+def summarize(results):
+    """{'files', 'rows', 'bytes', 'errors': {问题: 数量}, 'warnings': {...}}"""
+    summary = {'files': len(results), 'rows': 0, 'bytes': 0, 'errors': {}, 'warnings': {}}
+    for r in results:
+        summary['rows'] += r['rows']
+        summary['bytes'] += r['bytes']
+        for name, n in r['issues'].items():
+            bucket = summary['errors'] if name in ERRORS else summary['warnings']
+            bucket[name] = bucket.get(name, 0) + n
+    return summary
@@ -0,0 +1,128 @@
+"""
+多账户 / 多 Region 报告汇总。
+
+组织内各成员账户把 Kiro 报告投递到同一个桶时，每个账户一个前缀：
+
+    s3://<bucket>/<prefix>AWSLogs/<account>/KiroLogs/<table>/<region>/<YYYY>/<MM>/<DD>/00/*.csv
+
+Crawler 只抓取部署账户自己的前缀。本模块自动发现 AWSLogs/ 下的全部账户与 Region，
+按账户并行合并（每个账户有自己的线程池，总耗时取决于最大的账户而不是所有账户之和），写入：
+
+    s3://<bucket>/org/<table>/<account>/<region>/<YYYY>/<MM>/<DD>/part-00000.csv.gz
+
+并创建 <table>_all 表：列和 SerDe 与 Crawler 表相同，分区列为 account + partition_0..3，
+使用 partition projection。config.yaml 中设置 glue.fanout_tables: true 后，
+视图和数据集改用 _all 表。
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from kiro_analytics import consolidate, metrics, reports
+from kiro_analytics.clients import client
+from kiro_analytics.partitions import DAY_COL, MONTH_COL, REGION_COL, YEAR_COL
+
+PREFIX = 'org/'
+SUFFIX = '_all'
+ACCOUNT_COL = 'account'
+
+
+def fanout_table(table):
+    return f'{table}{SUFFIX}'
+
+
+def output_prefix(table, account, report_region, day):
+    return f'{PREFIX}{table}/{account}/{report_region}/{day:%Y/%m/%d}/'
+
+
+def discover(source, prefix, accounts=None):
+    """{account: {table: [region]}}；accounts 非空时只保留这些账户"""
+    layout = {}
+    with metrics.span('fanout.discover') as sp:
+        for account in source.list_dirs(f'{prefix}AWSLogs/'):
+            if accounts and account not in accounts:
+                continue
+            base = reports.logs_base(prefix, account)
+            tables = {t: sorted(source.list_dirs(f'{base}{t}/')) for t in reports.TABLES}
+            if any(tables.values()):
+                layout[account] = tables
+        sp['accounts'] = len(layout)
+    return layout
+
+
+def run_account(source, bucket, prefix, account, tables, days, merge_clients=False,
+                target_bytes=consolidate.TARGET_BYTES, workers=4, region=None):
+    """合并一个账户的全部 table/region/day，返回 (统计列表, 耗时秒)"""
+    base = reports.logs_base(prefix, account)
+    tasks = [(t, r, d) for t, regions in tables.items() for r in regions for d in days]
+    began = time.perf_counter()
+    with metrics.span('fanout.account', account=account, tasks=len(tasks)):
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tasks) or 1))) as pool:
+            results = list(pool.map(
+                lambda t: consolidate.consolidate_day(
+                    source, bucket, base, *t, merge_clients=merge_clients, target_bytes=target_bytes,
+                    region=region, out_prefix=output_prefix(t[0], account, t[1], t[2])),
+                tasks))
+    for r in results:
+        r['account'] = account
+    return results, time.perf_counter() - began
+
+
+def run(source, bucket, prefix, days, layout, merge_clients=False, target_bytes=consolidate.TARGET_BYTES,
+        workers_per_account=4, region=None):
+    """所有账户并行合并，返回 {account: (统计列表, 耗时秒)}"""
+    accounts = sorted(layout)
+    with ThreadPoolExecutor(max_workers=max(1, len(accounts))) as pool:
+        results = pool.map(
+            lambda a: run_account(source, bucket, prefix, a, layout[a], days, merge_clients=merge_clients,
+                                  target_bytes=target_bytes, workers=workers_per_account, region=region),
+            accounts)
+        return dict(zip(accounts, results))
+
+
+def _projected(table, col):
+    values = (table or {}).get('Parameters', {}).get(f'projection.{col}.values', '')
+    return {v for v in values.split(',') if v}
+
+
+def table_input(crawler_table, bucket, layout, existing=None):
+    """在 _compact 表定义的基础上加 account 分区，指向 org/ 前缀。
+
+    layout 应来自未过滤的 discover()；existing 为已有的 _all 表定义，其中的账户与 Region
+    会并入 projection，只处理部分账户时也不会把其他账户从表中去掉"""
+    name = crawler_table['Name']
+    regions = {r for tables in layout.values() for r in tables.get(name, [])} | _projected(existing, REGION_COL)
+    accounts = set(layout) | _projected(existing, ACCOUNT_COL)
+    ti = consolidate.table_input(crawler_table, bucket, regions or {'us-east-1'})
+    ti['Name'] = fanout_table(name)
+    ti['StorageDescriptor']['Location'] = f's3://{bucket}/{PREFIX}{name}/'
+    ti['PartitionKeys'] = [{'Name': ACCOUNT_COL, 'Type': 'string'}] + ti['PartitionKeys']
+    ti['Parameters'].update({
+        f'projection.{ACCOUNT_COL}.type': 'enum',
+        f'projection.{ACCOUNT_COL}.values': ','.join(sorted(accounts)),
+        'storage.location.template': (f's3://{bucket}/{PREFIX}{name}/${{{ACCOUNT_COL}}}/${{{REGION_COL}}}/'
+                                      f'${{{YEAR_COL}}}/${{{MONTH_COL}}}/${{{DAY_COL}}}/'),
+    })
+    return ti
+
+
+def ensure_tables(glue_db, bucket, layout, tables=reports.TABLES, region=None):
+    """为每张 Crawler 表创建/更新对应的 _all 表（新账户或新 Region 出现后重新执行即可）"""
+    glue = client('glue', region)
+    for table in tables:
+        crawler_table = glue.get_table(DatabaseName=glue_db, Name=table)['Table']
+        try:
+            existing = glue.get_table(DatabaseName=glue_db, Name=fanout_table(table))['Table']
+        except glue.exceptions.EntityNotFoundException:
+            existing = None
+        ti = table_input(crawler_table, bucket, layout, existing)
+        with metrics.span('glue.update', table=ti['Name']):
+            if existing is None:
+                glue.create_table(DatabaseName=glue_db, TableInput=ti)
+            else:
+                glue.update_table(DatabaseName=glue_db, TableInput=ti)
+
+
+def identity_store_for(config, account):
+    """fanout.identity_stores 中指定的 Identity Store，未指定时使用 identity_center.identity_store_id"""
+    stores = config.get('fanout', {}).get('identity_stores') or {}
+    return stores.get(str(account)) or config['identity_center']['identity_store_id']
@@ -0,0 +1,69 @@
+"""
+Lambda 入口:
+    kiro-user-mapping-sync  Handler: kiro_analytics.lambda_handler.handler
+    kiro-credit-alerts      Handler: kiro_analytics.lambda_handler.credit_alerts_handler
+
+模块导入时只读取环境变量，不创建任何 boto3 客户端；客户端在首次调用时懒加载，
+并在 warm invocation 之间复用。
+"""
+import os
+from datetime import datetime, timezone
+from urllib.parse import unquote_plus
+
+from kiro_analytics import credit_alerts, metrics, user_mapping, userid_scan
+
+BUCKET = os.environ.get('S3_BUCKET', '')
+GLUE_DB = os.environ.get('GLUE_DATABASE', 'kiro_analytics')
+ID_STORE = os.environ.get('IDENTITY_STORE_ID', '')
+WORKGROUP = os.environ.get('ATHENA_WORKGROUP', user_mapping.WORKGROUP)
+REPORT_BASE = os.environ.get('REPORT_BASE', '')
+ALERT_TOPIC_ARN = os.environ.get('ALERT_TOPIC_ARN', '')
+ALERT_THRESHOLDS = tuple(int(t) for t in os.environ.get('ALERT_THRESHOLDS', '80,100').split(','))
+
+metrics.configure(script='user_mapping_lambda')
+
+
+def sync_delta(days):
+    """直接读取最近几天的报告文件提取 userid；尚无映射文件时返回 None"""
+    today = datetime.now(timezone.utc).date()
+    keep_quotes = userid_scan.table_keeps_quotes(GLUE_DB)
+    source = userid_scan.S3Source(BUCKET)
+    raw_userids = userid_scan.scan(source, REPORT_BASE, userid_scan.recent_days(today, days), keep_quotes=keep_quotes)
+    return user_mapping.sync_delta(BUCKET, GLUE_DB, ID_STORE, raw_userids)
+
+
+def handler(event, context):
+    """
+    event:
+        {"ping": true}                 只完成初始化即返回，供冷启动基准测试使用
+        {"mode": "delta", "days": 4}   只扫描最近几天的报告文件（定时任务默认；days 默认
+                                       userid_scan.DELTA_DAYS，覆盖晚到的报告）
+        {} / {"mode": "full"}          通过 Athena 完整同步
+    """
+    event = event or {}
+    if event.get('ping'):
+        return {'ping': True}
+    mode = event.get('mode', 'full')
+    print(f'Starting {mode} sync: DB={GLUE_DB}, IDStore={ID_STORE}')
+    with metrics.span('sync.total', mode=mode) as sp:
+        mapping = sync_delta(int(event.get('days', userid_scan.DELTA_DAYS))) if mode == 'delta' and REPORT_BASE else None
+        if mapping is None:
+            mode = 'full'
+            mapping = user_mapping.sync(BUCKET, GLUE_DB, ID_STORE, workgroup=WORKGROUP)
+        sp['users'] = len(mapping)
+    print(f'Sync complete ({mode}): {len(mapping)} users')
+    return {'users': len(mapping), 'mode': mode}
+
+
+def credit_alerts_handler(event, context):
+    """定时触发时检查最近几天（credit_alerts.RECENT_DAYS）的新文件；也可直接作为 S3 ObjectCreated 通知的目标"""
+    metrics.configure(script='credit_alerts_lambda')
+    records = (event or {}).get('Records', [])
+    if records:
+        keys = [unquote_plus(r['s3']['object']['key']) for r in records if 's3' in r]
+    else:
+        keys = credit_alerts.recent_keys(BUCKET, REPORT_BASE, datetime.now(timezone.utc).date())
+    alerts = credit_alerts.process_keys(BUCKET, keys, thresholds=ALERT_THRESHOLDS)
+    credit_alerts.publish(alerts, ALERT_TOPIC_ARN)
+    print(f'Checked {len(keys)} objects, {len(alerts)} alerts')
+    return {'objects': len(keys), 'alerts': len(alerts)}
@@ -0,0 +1,124 @@
+"""
+轻量级性能埋点：阶段耗时 span 与 Athena 查询统计。
+
+- 本地运行：每条记录输出一行 JSON，追加到 KIRO_METRICS_FILE（默认 metrics.jsonl）
+- Lambda 中：输出 CloudWatch Embedded Metric Format (EMF) 到 stdout，
+  由 CloudWatch Logs 自动提取为指标（命名空间 KiroAnalytics）
+- KIRO_METRICS=off 可关闭埋点
+
+用法:
+    from kiro_analytics import metrics
+
+    with metrics.span('s3.upload', key=key) as s:
+        s3.put_object(...)
+        s['bytes'] = len(body)
+
+    metrics.record_query(execution, label='user_report')
+    metrics.report()
+"""
+import json
+import os
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+NAMESPACE = 'KiroAnalytics'
+
+_run_id = uuid.uuid4().hex[:12]
+_script = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+_totals = defaultdict(lambda: [0, 0.0])  # stage -> [次数, 总耗时 ms]
+
+
+def configure(script=None):
+    """设置 Script 维度（默认取入口脚本文件名）"""
+    global _script
+    if script:
+        _script = script
+
+
+def enabled():
+    return os.environ.get('KIRO_METRICS', 'on').lower() not in ('off', '0', 'false')
+
+
+def in_lambda():
+    return 'AWS_LAMBDA_FUNCTION_NAME' in os.environ
+
+
+def emit(record, metrics=None):
+    """输出一条埋点记录。metrics: [(字段名, 单位)]，仅 EMF 模式用于声明指标"""
+    if not enabled():
+        return
+    record = {'ts': round(time.time(), 3), 'run_id': _run_id, 'script': _script, **record}
+    if in_lambda():
+        print(json.dumps(_to_emf(record, metrics or []), default=str), flush=True)
+        return
+    path = os.environ.get('KIRO_METRICS_FILE', 'metrics.jsonl')
+    try:
+        with open(path, 'a') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    except OSError as e:
+        print(f"  ⚠️ 埋点写入失败: {e}", file=sys.stderr)
+
+
+def _to_emf(record, metrics):
+    doc = {k: v for k, v in record.items() if k != 'ts'}
+    doc['Script'] = doc.pop('script')
+    if 'stage' in doc:
+        doc['Stage'] = doc.pop('stage')
+    doc['_aws'] = {
+        'Timestamp': int(record['ts'] * 1000),
+        'CloudWatchMetrics': [{
+            'Namespace': NAMESPACE,
+            'Dimensions': [['Script', 'Stage']] if 'Stage' in doc else [['Script']],
+            'Metrics': [{'Name': name, 'Unit': unit} for name, unit in metrics if name in doc],
+        }],
+    }
+    return doc
+
+
+@contextmanager
+def span(stage, **attrs):
+    """记录一个阶段的耗时；with 块内可向返回的 dict 写入额外属性"""
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield attrs
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        total = _totals[stage]
+        total[0] += 1
+        total[1] += duration_ms
+        emit({'type': 'span', 'stage': stage, 'duration_ms': round(duration_ms, 2),
+              'status': status, **attrs},
+             metrics=[('duration_ms', 'Milliseconds')])
+
+
+def record_query(execution, label=None):
+    """记录 Athena 查询统计。execution: get_query_execution 返回的 QueryExecution"""
+    stats = execution.get('Statistics', {})
+    emit({
+        'type': 'query',
+        'stage': 'athena.query',
+        'query_id': execution.get('QueryExecutionId'),
+        'label': label,
+        'state': execution.get('Status', {}).get('State'),
+        'bytes_scanned': stats.get('DataScannedInBytes', 0),
+        'engine_ms': stats.get('EngineExecutionTimeInMillis', 0),
+        'queue_ms': stats.get('QueryQueueTimeInMillis', 0),
+        'total_ms': stats.get('TotalExecutionTimeInMillis', 0),
+    }, metrics=[('bytes_scanned', 'Bytes'), ('engine_ms', 'Milliseconds'),
+                ('queue_ms', 'Milliseconds'), ('total_ms', 'Milliseconds')])
+
+
+def report():
+    """打印本次运行各阶段的耗时汇总"""
+    if not enabled() or not _totals:
+        return
+    print("\n⏱  阶段耗时:")
+    for stage, (count, total_ms) in sorted(_totals.items(), key=lambda kv: -kv[1][1]):
+        print(f"  {stage:<32} {count:>5} 次  {total_ms / 1000:>8.2f}s")
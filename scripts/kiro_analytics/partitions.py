@@ -0,0 +1,55 @@
+"""
+原始报告表的分区约定。
+
+Glue Crawler 按 <region>/<year>/<month>/<day>/00/ 目录自动生成分区列
+partition_0 (region) / partition_1 (year) / partition_2 (month) / partition_3 (day)。
+按日期过滤时应使用这些列，Athena 才能只读取相关日期的对象。
+
+报告通常晚 1~2 天才投递（同一天的各 Region 也可能先后到达），因此派生数据
+最近 REDO_DAYS 天的结果每次运行都要重算；超过 FINAL_AFTER_DAYS 天仍没有报告的
+日期视为当天确实没有数据，不再等待。
+"""
+from datetime import date, timedelta
+
+REGION_COL = 'partition_0'
+YEAR_COL = 'partition_1'
+MONTH_COL = 'partition_2'
+DAY_COL = 'partition_3'
+
+REDO_DAYS = 3
+FINAL_AFTER_DAYS = 7
+
+
+def partition_date_expr(alias=None):
+    """分区列拼成的 'YYYY-MM-DD' 表达式"""
+    p = f'{alias}.' if alias else ''
+    return f"concat({p}{YEAR_COL}, '-', {p}{MONTH_COL}, '-', {p}{DAY_COL})"
+
+
+def date_filter(start, end, alias=None):
+    """[start, end] 闭区间的分区谓词；年份条件可直接下推到 Glue 分区过滤"""
+    p = f'{alias}.' if alias else ''
+    start, end = str(start), str(end)
+    return (f"{p}{YEAR_COL} BETWEEN '{start[:4]}' AND '{end[:4]}' "
+            f"AND {partition_date_expr(alias)} BETWEEN '{start}' AND '{end}'")
+
+
+def iter_days(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def parse_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def redo_from(today=None, redo_days=REDO_DAYS):
+    """需要每次重算的最早日期：today 之前的 redo_days 天都可能还有报告未到"""
+    return (today or date.today()) - timedelta(days=redo_days)
+
+
+def is_final(day, today=None):
+    """day 的报告是否已不会再补投"""
+    return day <= (today or date.today()) - timedelta(days=FINAL_AFTER_DAYS)
@@ -0,0 +1,78 @@
+"""
+Kiro 报告在 S3 中的目录约定与直接读取。
+
+    s3://<bucket>/<prefix>AWSLogs/<account>/KiroLogs/<table>/<region>/<YYYY>/<MM>/<DD>/00/*.csv
+
+table 为 by_user_analytic（46 列）或 user_report（11 列），每个 region/day 按
+client_type（KIRO_CLI / KIRO_IDE）各投递一份 CSV。
+"""
+import codecs
+import csv
+import re
+from datetime import date
+
+from kiro_analytics.clients import client
+
+TABLES = ('by_user_analytic', 'user_report')
+
+_KEY_PATTERN = re.compile(
+    r'KiroLogs/(?P<table>[^/]+)/(?P<region>[^/]+)/(?P<year>\d{4})/(?P<month>\d{2})/(?P<day>\d{2})/')
+
+
+def logs_base(prefix, account_id):
+    """KiroLogs 根前缀，如 amazon-q-developer/AWSLogs/123456789012/KiroLogs/"""
+    return f'{prefix}AWSLogs/{account_id}/KiroLogs/'
+
+
+def day_prefix(base, table, region, day):
+    return f'{base}{table}/{region}/{day:%Y/%m/%d}/'
+
+
+def parse_key(key):
+    """从对象 key 解析 (table, region, date)，不符合约定时返回 None"""
+    m = _KEY_PATTERN.search(key)
+    if not m:
+        return None
+    return m['table'], m['region'], date(int(m['year']), int(m['month']), int(m['day']))
+
+
+def list_regions(bucket, base, table, region=None):
+    paginator = client('s3', region).get_paginator('list_objects_v2')
+    regions = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=f'{base}{table}/', Delimiter='/'):
+        for p in page.get('CommonPrefixes', []):
+            regions.append(p['Prefix'].rstrip('/').rsplit('/', 1)[-1])
+    return regions
+
+
+def list_day_objects(bucket, base, table, day, regions=None, region=None):
+    """列出某一天所有 region 下的 CSV 对象，返回 [{'Key', 'Size', 'ETag', ...}]"""
+    paginator = client('s3', region).get_paginator('list_objects_v2')
+    objects = []
+    for report_region in regions or list_regions(bucket, base, table, region):
+        prefix = day_prefix(base, table, report_region, day)
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            objects.extend(o for o in page.get('Contents', []) if o['Key'].endswith('.csv'))
+    return objects
+
+
+def day_arrived(bucket, base, day, tables=TABLES, region=None):
+    """每张表在 day 都至少投递了一个 CSV（任一 Region）"""
+    return all(list_day_objects(bucket, base, t, day, region=region) for t in tables)
+
+
+def iter_csv_rows(bucket, key, region=None):
+    """流式读取 CSV，列名统一为小写；csv 模块会去掉 userid 外层引号"""
+    body = client('s3', region).get_object(Bucket=bucket, Key=key)['Body']
+    reader = csv.reader(codecs.getreader('utf-8-sig')(body))
+    header = [h.strip().lower() for h in next(reader, [])]
+    for row in reader:
+        if row:
+            yield dict(zip(header, row))
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,172 @@
+"""
+每用户滚动窗口（7 / 30 / 90 天）指标与分层，增量维护。
+
+基于回填生成的 daily_user_activity（每用户每天一行），写入按 dt 分区的 Parquet 表
+user_rolling_metrics：dt=D 的分区是截至 D 日（含）的窗口累计。
+
+每天只做一次增量：
+    rolling(D) = rolling(D-1) + daily(D) - daily(D-7 / D-30 / D-90，各自只减对应窗口)
+所有累计值都是整数，加减不会产生误差。前一天的分区不存在时（首次运行或中间断档）
+从 daily_user_activity 的 90 天窗口直接计算一次作为起点。
+
+报告会晚到：daily_user_activity 中还没有 dt=D 分区、且 D 尚未超过
+partitions.FINAL_AFTER_DAYS 的日期直接跳过、不生成分区，之后再补；
+调用方每次都要把最近 REDO_DAYS 天（以及这些未生成的日期）重新传进来，
+让加减基于重算后的每日汇总而不是上次运行时的不完整结果。
+"""
+from datetime import timedelta
+
+from kiro_analytics import metrics
+from kiro_analytics.athena import WORKGROUP, run_query
+from kiro_analytics.clients import client
+from kiro_analytics.consolidate import clear_prefix
+from kiro_analytics.partitions import FINAL_AFTER_DAYS, is_final, iter_days, parse_date, redo_from
+
+TABLE = 'user_rolling_metrics'
+VIEW = 'user_segments_current'
+SOURCE = 'daily_user_activity'
+PREFIX = f'derived/{TABLE}/'
+SOURCE_PREFIX = f'derived/{SOURCE}/'
+WINDOWS = (7, 30, 90)
+# (指标名, daily_user_activity 上的表达式)
+MEASURES = [
+    ('ai_codelines', 'chat_aicodelines + inline_aicodelines'),
+    ('messages', 'chat_messagessent'),
+    ('inline_accepted', 'inline_acceptancecount'),
+    ('inline_suggestions', 'inline_suggestionscount'),
+    ('active_days', '1'),
+]
+# 与 user_activity_enhanced.user_segment 的单日阈值一致，改为按 30 天内的活跃日均值判断
+HEAVY_PER_DAY = 500
+MEDIUM_PER_DAY = 50
+
+
+def columns():
+    """[(列名, 表达式, 窗口)]，按窗口、指标排列"""
+    return [(f'{name}_{w}d', expr, w) for w in WINDOWS for name, expr in MEASURES]
+
+
+def derived_columns():
+    cols = [(f'inline_acceptance_rate_{w}d', 'double',
+             f'CAST(inline_accepted_{w}d AS DOUBLE) / NULLIF(inline_suggestions_{w}d, 0) * 100')
+            for w in WINDOWS]
+    cols.append(('user_segment', 'string',
+                 f"CASE WHEN active_days_30d = 0 THEN 'Dormant' "
+                 f"WHEN CAST(ai_codelines_30d AS DOUBLE) / active_days_30d > {HEAVY_PER_DAY} THEN 'Heavy' "
+                 f"WHEN CAST(ai_codelines_30d AS DOUBLE) / active_days_30d > {MEDIUM_PER_DAY} THEN 'Medium' "
+                 f"ELSE 'Light' END"))
+    return cols
+
+
+def create_table_sql(db, bucket):
+    cols = ['    userid string'] + [f'    {c} bigint' for c, _, _ in columns()]
+    cols += [f'    {c} {t}' for c, t, _ in derived_columns()]
+    return (f"CREATE EXTERNAL TABLE IF NOT EXISTS {db}.{TABLE} (\n" + ',\n'.join(cols) + "\n)\n"
+            f"PARTITIONED BY (dt string)\nSTORED AS PARQUET\nLOCATION 's3://{bucket}/{PREFIX}'")
+
+
+def create_view_sql(db):
+    return (f'CREATE OR REPLACE VIEW {db}.{VIEW} AS\n'
+            f'SELECT * FROM {db}.{TABLE}\nWHERE dt = (SELECT max(dt) FROM {db}.{TABLE})')
+
+
+def _insert(db, day, sums_sql):
+    """外层：在累计值上计算派生列，去掉 90 天内都不活跃的用户"""
+    select = ['userid'] + [c for c, _, _ in columns()] + [f'{expr} AS {c}' for c, _, expr in derived_columns()]
+    return (f"INSERT INTO {db}.{TABLE}\nSELECT " + ',\n    '.join(select) +
+            f",\n    '{day.isoformat()}' AS dt\nFROM (\n{sums_sql}\n)\nWHERE active_days_90d > 0")
+
+
+def incremental_sql(db, day):
+    cols = columns()
+    prev = (f"    SELECT userid, {', '.join(c for c, _, _ in cols)}\n"
+            f"    FROM {db}.{TABLE} WHERE dt = '{day - timedelta(days=1)}'")
+    add = (f"    SELECT userid, {', '.join(expr for _, expr, _ in cols)}\n"
+           f"    FROM {db}.{SOURCE} WHERE dt = '{day}'")
+    parts = [prev, add]
+    for w in WINDOWS:
+        exprs = [f'-({expr})' if cw == w else '0' for _, expr, cw in cols]
+        parts.append(f"    SELECT userid, {', '.join(exprs)}\n"
+                     f"    FROM {db}.{SOURCE} WHERE dt = '{day - timedelta(days=w)}'")
+    # UNION ALL 的列名取自第一个分支（prev），即累计列名
+    sums = ', '.join(f'SUM({c}) AS {c}' for c, _, _ in cols)
+    union = '\n    UNION ALL\n'.join(parts)
+    return _insert(db, day, f"  SELECT userid, {sums}\n  FROM (\n{union}\n  )\n  GROUP BY userid")
+
+
+def bootstrap_sql(db, day):
+    sums = ', '.join(
+        f"SUM(CASE WHEN dt >= '{day - timedelta(days=w - 1)}' THEN {expr} ELSE 0 END) AS {c}"
+        for c, expr, w in columns())
+    return _insert(db, day, f"  SELECT userid, {sums}\n  FROM {db}.{SOURCE}\n"
+                            f"  WHERE dt BETWEEN '{day - timedelta(days=max(WINDOWS) - 1)}' AND '{day}'\n"
+                            f"  GROUP BY userid")
+
+
+def _dt_partitions(bucket, prefix, region=None):
+    """prefix 下有对象的 dt 分区（空的 INSERT 不会写出文件，也就没有对应前缀）"""
+    paginator = client('s3', region).get_paginator('list_objects_v2')
+    days = set()
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/'):
+        for p in page.get('CommonPrefixes', []):
+            name = p['Prefix'][len(prefix):].rstrip('/')
+            if name.startswith('dt='):
+                days.add(name[3:])
+    return days
+
+
+def done_days(bucket, region=None):
+    """已生成的 dt 分区"""
+    return _dt_partitions(bucket, PREFIX, region)
+
+
+def source_days(bucket, region=None):
+    """daily_user_activity 中已有数据的 dt 分区"""
+    return _dt_partitions(bucket, SOURCE_PREFIX, region)
+
+
+def default_start(done, end, today=None):
+    """未指定开始日期时的起点：上次完成的后一天、最近 REDO_DAYS 天、
+    以及近 FINAL_AFTER_DAYS 天内仍未生成的日期，取最早者"""
+    if not done:
+        return end
+    candidates = [parse_date(max(done)) + timedelta(days=1), redo_from(today)]
+    recent = end - timedelta(days=FINAL_AFTER_DAYS - 1)
+    candidates += [d for d in iter_days(recent, end) if str(d) not in done and not is_final(d, today)]
+    return min(candidates)
+
+
+def ensure_table(db, bucket, workgroup=WORKGROUP, region=None):
+    run_query(create_table_sql(db, bucket), label=f'{TABLE}:create', workgroup=workgroup, region=region)
+    run_query(create_view_sql(db), label=VIEW, workgroup=workgroup, region=region)
+
+
+def update_day(db, bucket, day, incremental, workgroup=WORKGROUP, region=None):
+    """（重新）生成 dt=day 分区"""
+    mode = 'incremental' if incremental else 'bootstrap'
+    with metrics.span('rolling.day', day=day.isoformat(), mode=mode):
+        clear_prefix(bucket, f'{PREFIX}dt={day}/', region)
+        sql = incremental_sql(db, day) if incremental else bootstrap_sql(db, day)
+        run_query(sql, label=f'{TABLE}:{day}', workgroup=workgroup, region=region)
+    return mode
+
+
+def update(db, bucket, days, workgroup=WORKGROUP, region=None, today=None, log=print):
+    """按日期顺序逐天更新；每天依赖前一天的结果，因此不能并行。返回跳过的日期"""
+    ensure_table(db, bucket, workgroup=workgroup, region=region)
+    done = done_days(bucket, region)
+    available = source_days(bucket, region)
+    skipped = []
+    for day in sorted(days):
+        if str(day) not in available and not is_final(day, today):
+            # 不生成分区：下一天没有前一天的结果，会从 90 天窗口重新计算
+            clear_prefix(bucket, f'{PREFIX}dt={day}/', region)
+            done.discard(str(day))
+            skipped.append(day)
+            log(f"  ⚠️ {day} 的每日汇总为空（报告尚未到达），跳过")
+            continue
+        mode = update_day(db, bucket, day, str(day - timedelta(days=1)) in done,
+                          workgroup=workgroup, region=region)
+        done.add(str(day))
+        log(f"  ✓ {day} ({mode})")
+    return skipped
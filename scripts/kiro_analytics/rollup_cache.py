@@ -0,0 +1,247 @@
+"""
+本地列式缓存：把 Parquet 每日汇总（daily_user_activity / daily_user_credits）
+同步到本地，按天存为 NumPy 列文件，查询时 memory-map 读取并向量化聚合。
+
+    <cache_dir>/<table>/dt=YYYY-MM-DD/<column>.npy
+    <cache_dir>/dictionaries.json     字符串列的字典编码（userid、subscription_tier，只追加）
+    <cache_dir>/manifest.json         已同步的 S3 对象 key → ETag
+
+sync() 只下载 ETag 变化或新增的 dt 分区（回填重跑的日期也会被重新同步），
+查询只打开所选日期范围内的分段，逐个分段向量化聚合，毫秒级返回 Top N / 区间汇总。
+依赖 numpy，同步 Parquet 时还需要 pyarrow（pip install numpy pyarrow）。
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+import numpy as np
+
+from kiro_analytics import metrics
+from kiro_analytics.clients import client
+from kiro_analytics.partitions import parse_date
+
+DERIVED_PREFIX = 'derived/'
+DEFAULT_CACHE_DIR = '.cache/rollups'
+# 表 → (字符串列, 数值列)；字符串列做字典编码，以 int32 编码存储
+TABLES = {
+    'daily_user_activity': (
+        ['userid'],
+        ['chat_aicodelines', 'chat_messagessent', 'inline_aicodelines', 'inline_acceptancecount',
+         'inline_suggestionscount', 'testgeneration_eventcount', 'codereview_findingscount'],
+    ),
+    'daily_user_credits': (
+        ['userid', 'subscription_tier'],
+        ['credits_used', 'overage_credits_used', 'overage_cap', 'total_messages', 'chat_conversations'],
+    ),
+}
+# userid 在两张表之间共用一个字典，其他字符串列各自一个
+DICTIONARY_FOR = {'userid': 'userid', 'subscription_tier': 'subscription_tier'}
+
+
+def metric_table(metric):
+    for table, (_, numeric) in TABLES.items():
+        if metric in numeric:
+            return table
+    raise ValueError(f'未知指标: {metric}（可用: {", ".join(m for _, n in TABLES.values() for m in n)}）')
+
+
+class RollupCache:
+    def __init__(self, bucket, cache_dir=DEFAULT_CACHE_DIR, region=None):
+        self.bucket = bucket
+        self.cache_dir = cache_dir
+        self.region = region
+        self._segments = {}
+        self.manifest = self._load_json('manifest.json', {})
+        self.dictionaries = self._load_json('dictionaries.json', {})
+        self._index = {name: {v: i for i, v in enumerate(values)}
+                       for name, values in self.dictionaries.items()}
+        self.usernames = {}
+
+    # ---------- 本地文件 ----------
+
+    def _load_json(self, name, default):
+        path = os.path.join(self.cache_dir, name)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return default
+
+    def _save_json(self, name, data):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+
+    def _encode(self, column, values):
+        name = DICTIONARY_FOR[column]
+        values_list = self.dictionaries.setdefault(name, [])
+        index = self._index.setdefault(name, {})
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, v in enumerate(values):
+            v = v or ''
+            code = index.get(v)
+            if code is None:
+                code = index[v] = len(values_list)
+                values_list.append(v)
+            codes[i] = code
+        return codes
+
+    # ---------- 同步 ----------
+
+    def _remote_partitions(self, table):
+        """{dt: {key: etag}}"""
+        paginator = client('s3', self.region).get_paginator('list_objects_v2')
+        partitions = {}
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f'{DERIVED_PREFIX}{table}/'):
+            for o in page.get('Contents', []):
+                part = o['Key'].split('/')[-2]
+                if part.startswith('dt=') and not o['Key'].endswith('/'):
+                    partitions.setdefault(part[3:], {})[o['Key']] = o['ETag']
+        return partitions
+
+    def _convert(self, table, dt, keys):
+        """下载一个分区的 Parquet 文件，写成每列一个 .npy，原子替换旧分段"""
+        import pyarrow.parquet as pq
+
+        strings, numeric = TABLES[table]
+        s3 = client('s3', self.region)
+        with tempfile.TemporaryDirectory() as tmp:
+            tables = []
+            for i, key in enumerate(sorted(keys)):
+                path = os.path.join(tmp, f'{i}.parquet')
+                s3.download_file(self.bucket, key, path)
+                tables.append(pq.read_table(path, columns=strings + numeric))
+            out = os.path.join(self.cache_dir, table, f'dt={dt}')
+            staging = out + '.tmp'
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            for col in strings:
+                values = [v for t in tables for v in t.column(col).to_pylist()]
+                np.save(os.path.join(staging, f'{col}.npy'), self._encode(col, values))
+            for col in numeric:
+                arrays = [t.column(col).to_numpy(zero_copy_only=False) for t in tables]
+                data = np.concatenate(arrays) if arrays else np.array([])
+                np.save(os.path.join(staging, f'{col}.npy'),
+                        np.nan_to_num(data.astype(np.float64), nan=0.0))
+            shutil.rmtree(out, ignore_errors=True)
+            os.replace(staging, out)
+        self._segments.pop((table, dt), None)
+
+    def sync(self, tables=None, log=print):
+        """增量同步新分区或内容有变化的分区，返回同步的分区数"""
+        refreshed = 0
+        for table in tables or TABLES:
+            with metrics.span('rollup.sync', table=table) as sp:
+                remote = self._remote_partitions(table)
+                local = self.manifest.setdefault(table, {})
+                changed = [dt for dt, objs in sorted(remote.items()) if local.get(dt) != objs]
+                for dt in changed:
+                    self._convert(table, dt, remote[dt])
+                    local[dt] = remote[dt]
+                    # 每个分区完成后立即保存，中断后不会重复下载
+                    self._save_json('dictionaries.json', self.dictionaries)
+                    self._save_json('manifest.json', self.manifest)
+                sp['partitions'] = len(changed)
+            if changed:
+                log(f"  ✓ {table}: 同步 {len(changed)} 个分区（{changed[0]} ~ {changed[-1]}）")
+            refreshed += len(changed)
+        return refreshed
+
+    def load_usernames(self, mapping_key='user-mapping/user_mapping.csv'):
+        """加载 userid → 用户名映射，用于 Top N 结果显示"""
+        import csv
+        import io
+        s3 = client('s3', self.region)
+        try:
+            body = s3.get_object(Bucket=self.bucket, Key=mapping_key)['Body'].read().decode('utf-8')
+        except s3.exceptions.NoSuchKey:
+            return
+        reader = csv.reader(io.StringIO(body))
+        next(reader, None)
+        self.usernames = {row[0]: row[1] for row in reader if len(row) >= 2}
+
+    # ---------- 查询 ----------
+
+    def days(self, table):
+        return sorted(self.manifest.get(table, {}))
+
+    def _segment(self, table, dt):
+        seg = self._segments.get((table, dt))
+        if seg is None:
+            directory = os.path.join(self.cache_dir, table, f'dt={dt}')
+            strings, numeric = TABLES[table]
+            seg = {col: np.load(os.path.join(directory, f'{col}.npy'), mmap_mode='r')
+                   for col in strings + numeric}
+            self._segments[(table, dt)] = seg
+        return seg
+
+    def open_segments(self):
+        """打开全部分段的 memory-map。服务在后台同步出新缓存后先调用它再替换，
+        之后的查询不会再打开文件，也不会读到与本对象字典不一致的新分段"""
+        for table in TABLES:
+            for dt in self.days(table):
+                self._segment(table, dt)
+        return self
+
+    def segments(self, table, start, end):
+        """[start, end] 内的 [(日期, 分段)]；查询逐个分段聚合，不把 memory-map 拼接成新数组"""
+        start, end = parse_date(start).isoformat(), parse_date(end).isoformat()
+        return [(d, self._segment(table, d)) for d in self.days(table) if start <= d <= end]
+
+    def userid(self, code):
+        return self.dictionaries['userid'][code]
+
+    def top_users(self, metric, start, end, n=10):
+        segs = self.segments(metric_table(metric), start, end)
+        if not segs:
+            return []
+        totals = np.zeros(len(self.dictionaries['userid']))
+        for _, seg in segs:
+            totals += np.bincount(seg['userid'], weights=seg[metric], minlength=len(totals))
+        n = min(n, int(np.count_nonzero(totals)))
+        if n <= 0:
+            return []
+        top = np.argpartition(-totals, n - 1)[:n]
+        top = top[np.argsort(-totals[top])]
+        return [{'userid': self.userid(c).strip('"'),
+                 'username': self.usernames.get(self.userid(c), self.userid(c).strip('"')),
+                 metric: round(float(totals[c]), 2)} for c in top]
+
+    def daily_summary(self, start, end):
+        """每天的活跃用户数与各指标合计（对应视图 daily_summary）"""
+        numeric = TABLES['daily_user_activity'][1]
+        # 每用户每天一行，活跃用户数即每天的行数
+        return [dict({'date': d, 'active_users': int(len(seg['userid']))},
+                     **{c: float(seg[c].sum()) for c in numeric})
+                for d, seg in self.segments('daily_user_activity', start, end)]
+
+    def tier_summary(self, start, end):
+        """各订阅层级的用户数与 Credit 合计（对应视图 tier_summary）"""
+        segs = self.segments('daily_user_credits', start, end)
+        if not segs:
+            return []
+        tiers = self.dictionaries['subscription_tier']
+        n_users = len(self.dictionaries['userid'])
+        credits = np.zeros(len(tiers))
+        overage = np.zeros(len(tiers))
+        pairs = []
+        for _, seg in segs:
+            tier = seg['subscription_tier'].astype(np.int64)
+            pairs.append(np.unique(tier * n_users + seg['userid']))
+            credits += np.bincount(tier, weights=seg['credits_used'], minlength=len(tiers))
+            overage += np.bincount(tier, weights=seg['overage_credits_used'], minlength=len(tiers))
+        users = np.bincount(np.unique(np.concatenate(pairs)) // n_users, minlength=len(tiers))
+        return [{'subscription_tier': tiers[i], 'user_count': int(users[i]),
+                 'total_credits': round(float(credits[i]), 2), 'total_overage': round(float(overage[i]), 2)}
+                for i in np.flatnonzero(users)]
+
+    def total(self, metric, start, end):
+        return float(sum(seg[metric].sum() for _, seg in self.segments(metric_table(metric), start, end)))
+
+
+def default_range(days, today):
+    """最近 days 天（含 today）"""
+    return today - timedelta(days=days - 1), today
@@ -0,0 +1,457 @@
+"""
+本地负载与限流模拟器：用内存中的 Athena / Identity Store / S3 / Glue / QuickSight
+替身运行真实的同步与部署代码路径，不访问 AWS。
+
+通过 clients.use_factory() 注入，业务代码不需要任何修改：
+
+    sim = Simulation(users=50000, throttle_rate=0.05, time_scale=0.01)
+    with sim.installed():
+        user_mapping.sync(...)
+    sim.report()
+
+- 每次 API 调用按服务注入延迟（毫秒，乘以 time_scale 后真实 sleep），
+  并按 throttle_rate 随机返回限流错误；客户端像 botocore 一样对限流自动重试
+  （最多 RETRY_ATTEMPTS 次，指数退避），重试耗尽后抛出限流异常
+- 列表类接口按真实的分页大小返回（S3 1000、Athena 结果 1000、QuickSight 100）
+- 统计每个 (服务, 操作) 的调用次数、限流次数与失败次数
+"""
+import io
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from kiro_analytics import clients
+from kiro_analytics.userid_scan import LAZY_SIMPLE_SERDE
+
+RETRY_ATTEMPTS = 5
+# 服务 → 单次调用延迟（毫秒，time_scale=1 时）
+DEFAULT_LATENCY_MS = {'s3': 20, 'identitystore': 15, 'athena': 40, 'glue': 30, 'quicksight': 120}
+# Athena 查询本身的执行时间（毫秒）：DISTINCT 全表扫描 / DDL 等其他语句
+QUERY_MS = {'scan': 8000, 'other': 1500}
+# 操作 → 限流时抛出的异常名
+THROTTLE_ERRORS = {'athena': 'TooManyRequestsException', 's3': 'SlowDown'}
+
+
+class ClientError(Exception):
+    """与 botocore.exceptions.ClientError 相同的 response 结构"""
+
+    def __init__(self, code, operation):
+        super().__init__(f'An error occurred ({code}) when calling the {operation} operation')
+        self.response = {'Error': {'Code': code, 'Message': str(self)}}
+        self.operation_name = operation
+
+
+def _error_class(code):
+    return type(code, (ClientError,), {})
+
+
+class _Exceptions:
+    """client.exceptions.<Name>：同名异常类按需创建并缓存"""
+
+    def __init__(self):
+        self._classes = {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name not in self._classes:
+            self._classes[name] = _error_class(name)
+        return self._classes[name]
+
+
+class _Paginator:
+    def __init__(self, method, token_in, token_out):
+        self.method = method
+        self.token_in = token_in
+        self.token_out = token_out
+
+    def paginate(self, **kwargs):
+        while True:
+            page = self.method(**kwargs)
+            yield page
+            token = page.get(self.token_out)
+            if not token:
+                return
+            kwargs[self.token_in] = token
+
+
+class _Body(io.BytesIO):
+    """StreamingBody 的替身"""
+
+    def iter_lines(self):
+        for line in self.read().splitlines():
+            yield line
+
+
+class Simulation:
+    """共享状态：模拟数据、延迟与限流参数、调用统计"""
+
+    def __init__(self, users=10000, throttle_rate=0.0, time_scale=0.01, latency_ms=None,
+                 query_ms=None, quoted_userids=True, seed=0):
+        self.users = users
+        self.throttle_rate = throttle_rate
+        self.time_scale = time_scale
+        self.latency_ms = dict(DEFAULT_LATENCY_MS, **(latency_ms or {}))
+        self.query_ms = dict(QUERY_MS, **(query_ms or {}))
+        self.quoted_userids = quoted_userids
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = defaultdict(lambda: [0, 0, 0])  # (服务, 操作) → [调用, 限流, 失败]
+        self.simulated_ms = 0.0
+        self.objects = {}        # S3: key → bytes
+        self.tables = {}         # Glue: (db, name) → TableInput
+        self.partitions = {}     # Glue: (db, name) → [PartitionInput]
+        self.resources = {}      # QuickSight: (类型, id) → 参数
+        self.statements = {}     # Athena: (workgroup, name) → SQL
+        self.executions = {}     # Athena: qid → (SQL, 结果行)
+        self.user_ids = [str(uuid.UUID(int=self._rng.getrandbits(128))) for _ in range(users)]
+        self.directory = set(self.user_ids)
+
+    # ---------- 数据 ----------
+
+    def raw_userid(self, uid):
+        return f'"{uid}"' if self.quoted_userids else uid
+
+    def seed_glue_tables(self, db):
+        """Crawler 建好的两张原始表（LazySimpleSerDe，userid 带引号）"""
+        for name in ('by_user_analytic', 'user_report'):
+            serde = LAZY_SIMPLE_SERDE if self.quoted_userids else 'org.apache.hadoop.hive.serde2.OpenCSVSerde'
+            self.tables[(db, name)] = {'Name': name, 'StorageDescriptor': {'SerdeInfo': {
+                'SerializationLibrary': serde}}}
+
+    def seed_reports(self, base, days, report_regions=('us-east-1',), users_per_file=5000, active_ratio=0.3):
+        """按 <table>/<region>/YYYY/MM/DD/00/ 写入报告 CSV；每天有 active_ratio 的用户活跃"""
+        count = 0
+        for day in days:
+            active = self._rng.sample(self.user_ids, int(len(self.user_ids) * active_ratio))
+            for table in ('by_user_analytic', 'user_report'):
+                for report_region in report_regions:
+                    prefix = f'{base}{table}/{report_region}/{day:%Y/%m/%d}/00/'
+                    for i in range(0, len(active), users_per_file):
+                        lines = ['date,userid,client_type,credits_used']
+                        lines += [f'{day},{self.raw_userid(u)},KIRO_IDE,1.0' for u in active[i:i + users_per_file]]
+                        self.objects[f'{prefix}part-{i // users_per_file:05d}.csv'] = '\n'.join(lines).encode()
+                        count += 1
+        return count
+
+    # ---------- 调用模拟 ----------
+
+    def call(self, service, operation, latency_ms=None):
+        """一次逻辑调用：含 botocore 式的限流重试；重试耗尽时抛出限流异常"""
+        stats = self.calls[(service, operation)]
+        for attempt in range(RETRY_ATTEMPTS):
+            delay = self.latency_ms.get(service, 0) if latency_ms is None else latency_ms
+            with self._lock:
+                stats[0] += 1
+                throttled = self._rng.random() < self.throttle_rate
+                self.simulated_ms += delay
+            self._sleep(delay)
+            if not throttled:
+                return
+            with self._lock:
+                stats[1] += 1
+            if attempt < RETRY_ATTEMPTS - 1:
+                backoff = min(2 ** attempt * 100, 20000) * self._rng.random()
+                with self._lock:
+                    self.simulated_ms += backoff
+                self._sleep(backoff)
+        with self._lock:
+            stats[2] += 1
+        raise _error_class(THROTTLE_ERRORS.get(service, 'ThrottlingException'))('Throttling', operation)
+
+    def _sleep(self, ms):
+        if ms and self.time_scale:
+            time.sleep(ms / 1000 * self.time_scale)
+
+    def factory(self, service, region=None):
+        return SERVICES[service](self)
+
+    @contextmanager
+    def installed(self):
+        clients.use_factory(self.factory)
+        try:
+            yield self
+        finally:
+            clients.use_factory(None)
+
+    def summary(self):
+        return {
+            'calls': sum(c[0] for c in self.calls.values()),
+            'throttled': sum(c[1] for c in self.calls.values()),
+            'failed': sum(c[2] for c in self.calls.values()),
+            'simulated_s': self.simulated_ms / 1000,
+            'by_operation': {f'{s}.{o}': tuple(c) for (s, o), c in sorted(self.calls.items())},
+        }
+
+
+class _FakeClient:
+    service = None
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.exceptions = _Exceptions()
+
+    def _call(self, operation, latency_ms=None):
+        try:
+            self.sim.call(self.service, operation, latency_ms)
+        except ClientError as e:
+            # 用本客户端的异常类重新抛出，调用方的 except client.exceptions.X 才能捕获
+            raise getattr(self.exceptions, type(e).__name__)(e.response['Error']['Code'], operation) from None
+
+    def _error(self, name, operation):
+        return getattr(self.exceptions, name)(name, operation)
+
+
+class FakeS3(_FakeClient):
+    service = 's3'
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._call('PutObject')
+        self.sim.objects[Key] = Body if isinstance(Body, bytes) else Body.encode('utf-8')
+        return {'ETag': f'"{hash(self.sim.objects[Key]) & 0xffffffff:x}"'}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._call('GetObject')
+        if Key not in self.sim.objects:
+            raise self._error('NoSuchKey', 'GetObject')
+        data = self.sim.objects[Key]
+        return {'Body': _Body(data), 'ContentLength': len(data)}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._call('DeleteObject')
+        self.sim.objects.pop(Key, None)
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._call('DeleteObjects')
+        for o in Delete['Objects']:
+            self.sim.objects.pop(o['Key'], None)
+        return {'Deleted': Delete['Objects']}
+
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter=None, ContinuationToken=None, MaxKeys=1000, **kwargs):
+        self._call('ListObjectsV2')
+        entries = []
+        seen = set()
+        for key in sorted(k for k in self.sim.objects if k.startswith(Prefix)):
+            if Delimiter and Delimiter in key[len(Prefix):]:
+                common = key[:len(Prefix) + key[len(Prefix):].index(Delimiter) + 1]
+                if common not in seen:
+                    seen.add(common)
+                    entries.append(('prefix', common))
+            else:
+                entries.append(('key', key))
+        start = int(ContinuationToken or 0)
+        page = entries[start:start + MaxKeys]
+        result = {
+            'Contents': [{'Key': k, 'Size': len(self.sim.objects[k]), 'ETag': f'"{len(self.sim.objects[k]):x}"'}
+                         for t, k in page if t == 'key'],
+            'CommonPrefixes': [{'Prefix': p} for t, p in page if t == 'prefix'],
+        }
+        if start + MaxKeys < len(entries):
+            result['NextContinuationToken'] = str(start + MaxKeys)
+        return result
+
+    def get_paginator(self, operation):
+        return _Paginator(self.list_objects_v2, 'ContinuationToken', 'NextContinuationToken')
+
+
+class FakeIdentityStore(_FakeClient):
+    service = 'identitystore'
+
+    def describe_user(self, IdentityStoreId, UserId):
+        self._call('DescribeUser')
+        if UserId not in self.sim.directory:
+            raise self._error('ResourceNotFoundException', 'DescribeUser')
+        return {'UserId': UserId, 'UserName': f'user-{UserId[:8]}', 'DisplayName': f'User {UserId[:8]}'}
+
+
+class FakeGlue(_FakeClient):
+    service = 'glue'
+
+    def get_table(self, DatabaseName, Name):
+        self._call('GetTable')
+        if (DatabaseName, Name) not in self.sim.tables:
+            raise self._error('EntityNotFoundException', 'GetTable')
+        return {'Table': self.sim.tables[(DatabaseName, Name)]}
+
+    def create_table(self, DatabaseName, TableInput, **kwargs):
+        self._call('CreateTable')
+        if (DatabaseName, TableInput['Name']) in self.sim.tables:
+            raise self._error('AlreadyExistsException', 'CreateTable')
+        self.sim.tables[(DatabaseName, TableInput['Name'])] = TableInput
+
+    def update_table(self, DatabaseName, TableInput, **kwargs):
+        self._call('UpdateTable')
+        self.sim.tables[(DatabaseName, TableInput['Name'])] = TableInput
+
+    def delete_table(self, DatabaseName, Name):
+        self._call('DeleteTable')
+        if self.sim.tables.pop((DatabaseName, Name), None) is None:
+            raise self._error('EntityNotFoundException', 'DeleteTable')
+        self.sim.partitions.pop((DatabaseName, Name), None)
+
+    def get_partitions(self, DatabaseName, TableName, **kwargs):
+        self._call('GetPartitions')
+        return {'Partitions': list(self.sim.partitions.get((DatabaseName, TableName), []))}
+
+    def batch_create_partition(self, DatabaseName, TableName, PartitionInputList):
+        self._call('BatchCreatePartition')
+        self.sim.partitions.setdefault((DatabaseName, TableName), []).extend(PartitionInputList)
+        return {'Errors': []}
+
+    def get_paginator(self, operation):
+        return _Paginator(getattr(self, operation), 'NextToken', 'NextToken')
+
+
+class FakeAthena(_FakeClient):
+    """SELECT DISTINCT userid 返回全部模拟用户；其他语句（DDL、视图等）返回空结果。
+
+    带 external_location 的 CTAS 与 Athena 一样在 Glue 中登记表（含分桶定义）并写出数据文件，
+    表已存在或目标目录非空时失败；向分桶表 INSERT INTO 失败（Athena 不支持）"""
+    service = 'athena'
+    PAGE_SIZE = 1000
+    PARQUET_SERDE = 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe'
+
+    def _ctas(self, sql):
+        db, name = re.match(r'CREATE TABLE (\w+)\.(\w+)', sql, re.I).groups()
+        uri = re.search(r"external_location\s*=\s*'([^']+)'", sql).group(1)
+        prefix = uri.split('/', 3)[3]
+        if (db, name) in self.sim.tables or any(k.startswith(prefix) for k in self.sim.objects):
+            raise self._error('InvalidRequestException', 'StartQueryExecution')
+        sd = {'Location': uri, 'SerdeInfo': {'SerializationLibrary': self.PARQUET_SERDE}}
+        bucketed = re.search(r"bucketed_by\s*=\s*ARRAY\['(\w+)'\]", sql)
+        if bucketed:
+            sd['BucketColumns'] = [bucketed.group(1)]
+            sd['NumberOfBuckets'] = int(re.search(r'bucket_count\s*=\s*(\d+)', sql).group(1))
+        self.sim.tables[(db, name)] = {'Name': name, 'TableType': 'EXTERNAL_TABLE', 'StorageDescriptor': sd}
+        self.sim.objects[f'{prefix}{uuid.uuid4().hex}_bucket-00000'] = b''
+
+    def _insert(self, sql):
+        db, name = re.match(r'INSERT INTO (\w+)\.(\w+)', sql, re.I).groups()
+        if self.sim.tables.get((db, name), {}).get('StorageDescriptor', {}).get('BucketColumns'):
+            raise self._error('InvalidRequestException', 'StartQueryExecution')
+
+    def start_query_execution(self, QueryString, WorkGroup=None, ExecutionParameters=None, **kwargs):
+        self._call('StartQueryExecution')
+        sql = QueryString.strip()
+        if sql.upper().startswith('EXECUTE') and (WorkGroup, sql.split()[1]) not in self.sim.statements:
+            raise self._error('InvalidRequestException', 'StartQueryExecution')
+        if sql.upper().startswith('CREATE TABLE') and 'external_location' in sql:
+            self._ctas(sql)
+        elif sql.upper().startswith('INSERT INTO'):
+            self._insert(sql)
+        rows = [['userid']]
+        if sql.upper().startswith('SELECT DISTINCT USERID'):
+            rows += [[self.sim.raw_userid(u)] for u in self.sim.user_ids]
+        qid = uuid.uuid4().hex
+        self.sim.executions[qid] = (sql, rows, False)
+        return {'QueryExecutionId': qid}
+
+    def get_query_execution(self, QueryExecutionId):
+        sql, rows, waited = self.sim.executions[QueryExecutionId]
+        # 第一次查询状态时计入查询本身的执行时间
+        query_ms = 0 if waited else self.sim.query_ms['scan' if len(rows) > 1 else 'other']
+        self._call('GetQueryExecution', self.sim.latency_ms['athena'] + query_ms)
+        self.sim.executions[QueryExecutionId] = (sql, rows, True)
+        return {'QueryExecution': {
+            'QueryExecutionId': QueryExecutionId, 'Query': sql,
+            'Status': {'State': 'SUCCEEDED'},
+            'Statistics': {'DataScannedInBytes': 64 * len(rows), 'EngineExecutionTimeInMillis': query_ms,
+                           'QueryQueueTimeInMillis': 0, 'TotalExecutionTimeInMillis': query_ms},
+        }}
+
+    def get_query_results(self, QueryExecutionId, NextToken=None, MaxResults=PAGE_SIZE):
+        self._call('GetQueryResults')
+        _, rows, _ = self.sim.executions[QueryExecutionId]
+        start = int(NextToken or 0)
+        page = rows[start:start + MaxResults]
+        result = {'ResultSet': {'Rows': [{'Data': [{'VarCharValue': v} for v in r]} for r in page]}}
+        if start + MaxResults < len(rows):
+            result['NextToken'] = str(start + MaxResults)
+        return result
+
+    def list_prepared_statements(self, WorkGroup, NextToken=None, **kwargs):
+        self._call('ListPreparedStatements')
+        return {'PreparedStatements': [{'StatementName': n} for w, n in self.sim.statements if w == WorkGroup]}
+
+    def create_prepared_statement(self, StatementName, WorkGroup, QueryStatement, **kwargs):
+        self._call('CreatePreparedStatement')
+        self.sim.statements[(WorkGroup, StatementName)] = QueryStatement
+
+    update_prepared_statement = create_prepared_statement
+
+    def get_paginator(self, operation):
+        method = {'get_query_results': self.get_query_results,
+                  'list_prepared_statements': self.list_prepared_statements}[operation]
+        return _Paginator(method, 'NextToken', 'NextToken')
+
+
+class FakeQuickSight(_FakeClient):
+    """按 (资源类型, id) 记录创建过的数据源、数据集、仪表板与分析"""
+    service = 'quicksight'
+
+    def _create(self, kind, resource_id, operation, params):
+        self._call(operation)
+        if (kind, resource_id) in self.sim.resources:
+            raise self._error('ResourceExistsException', operation)
+        self.sim.resources[(kind, resource_id)] = params
+        return {'Status': 201, 'Arn': f'arn:aws:quicksight:::{kind}/{resource_id}'}
+
+    def _update(self, kind, resource_id, operation, params):
+        self._call(operation)
+        if (kind, resource_id) not in self.sim.resources:
+            raise self._error('ResourceNotFoundException', operation)
+        self.sim.resources[(kind, resource_id)] = params
+        return {'Status': 200}
+
+    def describe_data_source(self, AwsAccountId, DataSourceId):
+        self._call('DescribeDataSource')
+        if ('datasource', DataSourceId) not in self.sim.resources:
+            raise self._error('ResourceNotFoundException', 'DescribeDataSource')
+        return {'DataSource': {'DataSourceId': DataSourceId, 'Status': 'CREATION_SUCCESSFUL'}}
+
+    def delete_data_source(self, AwsAccountId, DataSourceId):
+        self._call('DeleteDataSource')
+        self.sim.resources.pop(('datasource', DataSourceId), None)
+
+    def create_data_source(self, **params):
+        result = self._create('datasource', params['DataSourceId'], 'CreateDataSource', params)
+        return dict(result, DataSourceId=params['DataSourceId'])
+
+    def create_data_set(self, **params):
+        return self._create('dataset', params['DataSetId'], 'CreateDataSet', params)
+
+    def update_data_set(self, **params):
+        return self._update('dataset', params['DataSetId'], 'UpdateDataSet', params)
+
+    def create_dashboard(self, **params):
+        return self._create('dashboard', params['DashboardId'], 'CreateDashboard', params)
+
+    def update_dashboard(self, **params):
+        return self._update('dashboard', params['DashboardId'], 'UpdateDashboard', params)
+
+    def list_dashboard_versions(self, AwsAccountId, DashboardId, **kwargs):
+        self._call('ListDashboardVersions')
+        return {'DashboardVersionSummaryList': [{'VersionNumber': 1}]}
+
+    def update_dashboard_published_version(self, **params):
+        self._call('UpdateDashboardPublishedVersion')
+        return {'Status': 200}
+
+    def create_analysis(self, **params):
+        return self._create('analysis', params['AnalysisId'], 'CreateAnalysis', params)
+
+    def update_analysis(self, **params):
+        return self._update('analysis', params['AnalysisId'], 'UpdateAnalysis', params)
+
+
+SERVICES = {
+    's3': FakeS3,
+    'identitystore': FakeIdentityStore,
+    'glue': FakeGlue,
+    'athena': FakeAthena,
+    'quicksight': FakeQuickSight,
+}
@@ -0,0 +1,139 @@
+"""
+Athena 预编译查询（prepared statements）目录：按用户、按日期区间、按订阅层级的查询。
+
+语句在部署时注册到工作组（deploy.sh 第 5 步），执行时只传参数：
+
+    EXECUTE kiro_user_activity USING 'uid', '2026-03-01', '2026-03-07', ...
+
+参数通过 StartQueryExecution 的 ExecutionParameters 传入，等价于 EXECUTE ... USING。
+每个参数都先按类型校验并转成单个 SQL 字面量（日期必须是合法日期，userid / tier
+只允许安全字符），不再把用户输入拼进 SQL 文本。
+"""
+import re
+
+from kiro_analytics import consolidate
+from kiro_analytics.athena import WORKGROUP, run_query
+from kiro_analytics.clients import client
+from kiro_analytics.partitions import YEAR_COL, parse_date, partition_date_expr
+
+PREFIX = 'kiro_'
+_USERID = re.compile(r'^[A-Za-z0-9._:@-]{1,128}$')
+_TIER = re.compile(r'^[A-Za-z0-9_ -]{1,64}$')
+
+# 日期区间谓词：年份条件用于分区裁剪，参数依次为 start, end, start, end
+_RANGE = (f"{YEAR_COL} BETWEEN substr(?, 1, 4) AND substr(?, 1, 4)\n"
+          f"  AND {partition_date_expr()} BETWEEN ? AND ?")
+_RANGE_PARAMS = ['start', 'end', 'start', 'end']
+
+# 名称（不含前缀） → (说明, 参数名（按 ? 出现顺序）, SQL 模板；{by_user_analytic} / {user_report} 为表名)
+CATALOG = {
+    'user_activity': (
+        '单个用户在日期区间内每天的 AI 代码行与消息数',
+        ['userid'] + _RANGE_PARAMS,
+        f"SELECT {partition_date_expr()} AS d,\n"
+        f"       SUM(chat_aicodelines) AS chat_aicodelines,\n"
+        f"       SUM(inline_aicodelines) AS inline_aicodelines,\n"
+        f"       SUM(inline_acceptancecount) AS inline_acceptancecount,\n"
+        f"       SUM(inline_suggestionscount) AS inline_suggestionscount,\n"
+        f"       SUM(chat_messagessent) AS chat_messagessent\n"
+        f"FROM {{by_user_analytic}}\n"
+        f"WHERE replace(userid, '\"', '') = ?\n  AND {_RANGE}\n"
+        f"GROUP BY 1\nORDER BY 1",
+    ),
+    'user_credits': (
+        '单个用户在日期区间内每天的 Credit 与消息数',
+        ['userid'] + _RANGE_PARAMS,
+        f"SELECT {partition_date_expr()} AS d,\n"
+        f"       max(subscription_tier) AS subscription_tier,\n"
+        f"       SUM(credits_used) AS credits_used,\n"
+        f"       SUM(overage_credits_used) AS overage_credits_used,\n"
+        f"       SUM(total_messages) AS total_messages\n"
+        f"FROM {{user_report}}\n"
+        f"WHERE replace(userid, '\"', '') = ?\n  AND {_RANGE}\n"
+        f"GROUP BY 1\nORDER BY 1",
+    ),
+    'tier_users': (
+        '某订阅层级的用户在日期区间内的 Credit 合计',
+        ['tier'] + _RANGE_PARAMS,
+        f"SELECT replace(userid, '\"', '') AS userid,\n"
+        f"       SUM(credits_used) AS credits_used,\n"
+        f"       SUM(overage_credits_used) AS overage_credits_used,\n"
+        f"       COUNT(DISTINCT {partition_date_expr()}) AS active_days\n"
+        f"FROM {{user_report}}\n"
+        f"WHERE subscription_tier = ?\n  AND {_RANGE}\n"
+        f"GROUP BY 1\nORDER BY credits_used DESC",
+    ),
+    'range_summary': (
+        '日期区间内每天的活跃用户数与 Credit 合计',
+        _RANGE_PARAMS,
+        f"SELECT {partition_date_expr()} AS d,\n"
+        f"       COUNT(DISTINCT replace(userid, '\"', '')) AS active_users,\n"
+        f"       SUM(credits_used) AS credits_used,\n"
+        f"       SUM(total_messages) AS total_messages\n"
+        f"FROM {{user_report}}\n"
+        f"WHERE {_RANGE}\n"
+        f"GROUP BY 1\nORDER BY 1",
+    ),
+}
+# 参数名 → 类型
+PARAM_TYPES = {'userid': 'userid', 'tier': 'tier', 'start': 'date', 'end': 'date'}
+
+
+def statement_name(name):
+    return f'{PREFIX}{name}'
+
+
+def render_sql(name, db, config=None):
+    """带 ? 占位符的语句文本；config 中 glue.compact_tables 为 true 时读取合并后的表"""
+    _, _, template = CATALOG[name]
+    tables = {t: f'{db}.{consolidate.source_table(config or {}, t)}' for t in ('by_user_analytic', 'user_report')}
+    return template.format(**tables)
+
+
+def literal(kind, value):
+    """按类型校验参数并转为 SQL 字面量；不合法时抛出 ValueError"""
+    if kind == 'date':
+        try:
+            return f"'{parse_date(value).isoformat()}'"
+        except (TypeError, ValueError):
+            raise ValueError(f'日期格式应为 YYYY-MM-DD: {value!r}')
+    value = str(value).strip().strip('"')
+    pattern = _USERID if kind == 'userid' else _TIER
+    if not pattern.match(value):
+        raise ValueError(f'{kind} 含有不允许的字符: {value!r}')
+    return f"'{value}'"
+
+
+def parameters(name, values):
+    """values: {参数名: 值}，按占位符顺序返回 ExecutionParameters"""
+    _, params, _ = CATALOG[name]
+    missing = sorted({p for p in params if values.get(p) in (None, '')})
+    if missing:
+        raise ValueError(f'{statement_name(name)} 缺少参数: {", ".join(missing)}')
+    return [literal(PARAM_TYPES[p], values[p]) for p in params]
+
+
+def register(db, config=None, workgroup=WORKGROUP, region=None, log=print):
+    """创建或更新目录中的全部语句（幂等）"""
+    athena = client('athena', region)
+    existing = set()
+    paginator = athena.get_paginator('list_prepared_statements')
+    for page in paginator.paginate(WorkGroup=workgroup):
+        existing.update(s['StatementName'] for s in page.get('PreparedStatements', []))
+    for name, (description, _, _) in CATALOG.items():
+        kwargs = dict(StatementName=statement_name(name), WorkGroup=workgroup,
+                      QueryStatement=render_sql(name, db, config), Description=description)
+        if statement_name(name) in existing:
+            athena.update_prepared_statement(**kwargs)
+            log(f"  ✓ {statement_name(name)}（已更新）")
+        else:
+            athena.create_prepared_statement(**kwargs)
+            log(f"  ✓ {statement_name(name)}")
+
+
+def execute(name, values, workgroup=WORKGROUP, region=None):
+    """执行已注册的语句，返回结果行（不含表头）"""
+    if name not in CATALOG:
+        raise ValueError(f'未知语句: {name}（可用: {", ".join(CATALOG)}）')
+    return run_query(f'EXECUTE {statement_name(name)}', label=statement_name(name),
+                     params=parameters(name, values), workgroup=workgroup, region=region)
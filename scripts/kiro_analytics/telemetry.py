@@ -0,0 +1,236 @@
+"""
+Athena 查询成本遥测。
+
+分页读取工作组的查询历史（ListQueryExecutions + BatchGetQueryExecution），
+把每个已结束查询的扫描量、耗时、来源写入按日期分区的 JSON 表 athena_query_telemetry：
+
+    s3://<bucket>/telemetry/athena_queries/dt=YYYY-MM-DD/<run>.json.gz
+
+断点（最近一次采集到的提交时间 + 重叠窗口内的查询 ID + 近几日扫描总量）
+保存在同目录的 _checkpoint.json 中，重复运行只处理新查询。
+"""
+import gzip
+import hashlib
+import json
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from kiro_analytics import metrics
+from kiro_analytics.athena import WORKGROUP
+from kiro_analytics.clients import client
+
+TABLE = 'athena_query_telemetry'
+PREFIX = 'telemetry/athena_queries/'
+CHECKPOINT_KEY = f'{PREFIX}_checkpoint.json'
+# 长查询可能晚于后提交的查询结束，回看一段时间避免漏采
+OVERLAP = timedelta(hours=2)
+BATCH = 50
+DAILY_HISTORY_DAYS = 7
+QUERY_TEXT_LIMIT = 4000
+USD_PER_TB = 5.0
+
+# 与 cloudformation.yaml 参数默认值保持一致，可在 config.yaml 的 athena 段覆盖
+DEFAULT_BYTES_CUTOFF_PER_QUERY = 10 * 1024 ** 3   # 单查询 10 GB
+DEFAULT_DAILY_SCAN_BUDGET = 100 * 1024 ** 3       # 工作组每日 100 GB
+
+COLUMNS = [
+    ('query_id', 'string'),
+    ('workgroup', 'string'),
+    ('state', 'string'),
+    ('statement_type', 'string'),
+    ('source', 'string'),
+    ('dataset', 'string'),
+    ('query_fingerprint', 'string'),
+    ('query', 'string'),
+    ('submitted_at', 'string'),
+    ('completed_at', 'string'),
+    ('bytes_scanned', 'bigint'),
+    ('engine_ms', 'bigint'),
+    ('queue_ms', 'bigint'),
+    ('planning_ms', 'bigint'),
+    ('total_ms', 'bigint'),
+    ('error', 'string'),
+]
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """去掉字面量和多余空白后的 SQL 摘要；同一图表的重复查询得到相同指纹"""
+    normalized = _SPACES.sub(' ', _LITERALS.sub('?', sql)).strip().lower()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def classify(sql):
+    """按 SQL 特征推断查询来源和涉及的数据表"""
+    text = sql.lower()
+    if 'create or replace view' in text:
+        source = 'create_views'
+    elif 'select distinct userid' in text:
+        source = 'user_mapping_sync'
+    elif text.startswith(('create table', 'insert into', 'unload')):
+        source = 'etl'
+    elif '"awsdatacatalog".' in text:
+        # QuickSight 直连查询总是带完整限定的 "AwsDataCatalog"."db"."table"
+        source = 'quicksight'
+    else:
+        source = 'adhoc'
+    tables = [t for t in ('by_user_analytic', 'user_report', 'user_mapping') if t in text]
+    return source, ','.join(tables)
+
+
+def to_record(execution):
+    status = execution.get('Status', {})
+    stats = execution.get('Statistics', {})
+    sql = execution.get('Query', '')
+    source, dataset = classify(sql)
+    submitted = status.get('SubmissionDateTime')
+    completed = status.get('CompletionDateTime')
+    return {
+        'query_id': execution['QueryExecutionId'],
+        'workgroup': execution.get('WorkGroup'),
+        'state': status.get('State'),
+        'statement_type': execution.get('StatementType'),
+        'source': source,
+        'dataset': dataset,
+        'query_fingerprint': fingerprint(sql),
+        'query': sql[:QUERY_TEXT_LIMIT],
+        'submitted_at': submitted.isoformat() if submitted else None,
+        'completed_at': completed.isoformat() if completed else None,
+        'bytes_scanned': stats.get('DataScannedInBytes', 0),
+        'engine_ms': stats.get('EngineExecutionTimeInMillis', 0),
+        'queue_ms': stats.get('QueryQueueTimeInMillis', 0),
+        'planning_ms': stats.get('QueryPlanningTimeInMillis', 0),
+        'total_ms': stats.get('TotalExecutionTimeInMillis', 0),
+        'error': status.get('StateChangeReason'),
+    }
+
+
+def load_checkpoint(bucket, region=None):
+    s3 = client('s3', region)
+    try:
+        body = s3.get_object(Bucket=bucket, Key=CHECKPOINT_KEY)['Body'].read()
+        return json.loads(body)
+    except s3.exceptions.NoSuchKey:
+        return {'last_submitted': None, 'recent': {}, 'daily_bytes': {}}
+
+
+def save_checkpoint(bucket, checkpoint, region=None):
+    client('s3', region).put_object(Bucket=bucket, Key=CHECKPOINT_KEY,
+                                    Body=json.dumps(checkpoint).encode('utf-8'),
+                                    ContentType='application/json')
+
+
+def iter_new_executions(workgroup, since, seen_ids, region=None):
+    """按时间倒序分页，遇到整页都早于 since 时停止；只返回已结束且未采集过的查询"""
+    athena = client('athena', region)
+    paginator = athena.get_paginator('list_query_executions')
+    for page in paginator.paginate(WorkGroup=workgroup):
+        ids = page.get('QueryExecutionIds', [])
+        older = 0
+        for i in range(0, len(ids), BATCH):
+            with metrics.span('athena.batch_get', count=len(ids[i:i + BATCH])):
+                resp = athena.batch_get_query_execution(QueryExecutionIds=ids[i:i + BATCH])
+            for execution in resp.get('QueryExecutions', []):
+                status = execution['Status']
+                submitted = status.get('SubmissionDateTime')
+                if since and submitted and submitted < since:
+                    older += 1
+                    continue
+                if status['State'] in ('QUEUED', 'RUNNING'):
+                    continue
+                if execution['QueryExecutionId'] in seen_ids:
+                    continue
+                yield execution
+        if ids and older == len(ids):
+            return
+
+
+def write_partitions(bucket, records, run_id, region=None):
+    """按提交日期分区写入 gzip JSON Lines，返回写入的对象 key 列表"""
+    by_day = defaultdict(list)
+    for r in records:
+        by_day[(r['submitted_at'] or '')[:10] or 'unknown'].append(r)
+    keys = []
+    s3 = client('s3', region)
+    for day, rows in sorted(by_day.items()):
+        key = f'{PREFIX}dt={day}/{run_id}.json.gz'
+        body = gzip.compress('\n'.join(json.dumps(r, ensure_ascii=False) for r in rows).encode('utf-8'))
+        with metrics.span('s3.upload', key=key, bytes=len(body), rows=len(rows)):
+            s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/json')
+        keys.append(key)
+    return keys
+
+
+def table_input(bucket):
+    """JSON 外部表，dt 分区使用 partition projection，无需 MSCK REPAIR"""
+    return {
+        'Name': TABLE,
+        'TableType': 'EXTERNAL_TABLE',
+        'PartitionKeys': [{'Name': 'dt', 'Type': 'string'}],
+        'Parameters': {
+            'classification': 'json',
+            'projection.enabled': 'true',
+            'projection.dt.type': 'date',
+            'projection.dt.format': 'yyyy-MM-dd',
+            'projection.dt.range': '2024-01-01,NOW',
+            'projection.dt.interval': '1',
+            'projection.dt.interval.unit': 'DAYS',
+            'storage.location.template': f's3://{bucket}/{PREFIX}dt=${{dt}}/',
+        },
+        'StorageDescriptor': {
+            'Columns': [{'Name': n, 'Type': t} for n, t in COLUMNS],
+            'Location': f's3://{bucket}/{PREFIX}',
+            'InputFormat': 'org.apache.hadoop.mapred.TextInputFormat',
+            'OutputFormat': 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat',
+            'SerdeInfo': {'SerializationLibrary': 'org.openx.data.jsonserde.JsonSerDe'},
+        },
+    }
+
+
+def ensure_table(glue_db, bucket, region=None):
+    glue = client('glue', region)
+    with metrics.span('glue.update', table=TABLE):
+        try:
+            glue.create_table(DatabaseName=glue_db, TableInput=table_input(bucket))
+        except glue.exceptions.AlreadyExistsException:
+            glue.update_table(DatabaseName=glue_db, TableInput=table_input(bucket))
+
+
+def collect(bucket, workgroup=WORKGROUP, region=None):
+    """采集新查询并写入遥测表，返回 (记录列表, 更新后的断点)"""
+    checkpoint = load_checkpoint(bucket, region)
+    last = checkpoint.get('last_submitted')
+    since = datetime.fromisoformat(last) - OVERLAP if last else None
+    recent = dict(checkpoint.get('recent', {}))  # query_id -> submitted_at
+
+    with metrics.span('telemetry.list', workgroup=workgroup) as sp:
+        records = [to_record(e) for e in iter_new_executions(workgroup, since, recent, region)]
+        sp['queries'] = len(records)
+
+    run_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    if records:
+        write_partitions(bucket, records, run_id, region)
+
+    daily = defaultdict(int, checkpoint.get('daily_bytes', {}))
+    for r in records:
+        daily[(r['submitted_at'] or '')[:10]] += r['bytes_scanned'] or 0
+    keep_from = (datetime.now(timezone.utc) - timedelta(days=DAILY_HISTORY_DAYS)).strftime('%Y-%m-%d')
+
+    recent.update({r['query_id']: r['submitted_at'] for r in records if r['submitted_at']})
+    newest = max(list(recent.values()) + ([last] if last else []), default=None)
+    cutoff = (datetime.fromisoformat(newest) - OVERLAP).isoformat() if newest else ''
+
+    checkpoint = {
+        'last_submitted': newest,
+        'recent': {qid: ts for qid, ts in recent.items() if ts >= cutoff},
+        'daily_bytes': {d: b for d, b in daily.items() if d and d >= keep_from},
+    }
+    save_checkpoint(bucket, checkpoint, region)
+    return records, checkpoint
+
+
+def estimated_cost_usd(bytes_scanned):
+    return bytes_scanned / 1024 ** 4 * USD_PER_TB
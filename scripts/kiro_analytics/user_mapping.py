@@ -0,0 +1,230 @@
+"""
+userid → 用户名映射同步。
+
+从 Athena 查出所有 userid，通过 IAM Identity Center 获取用户名，
+生成映射 CSV 上传到 S3，并创建/更新 Glue 外部表 user_mapping。
+sync_delta() 只处理直接从 S3 报告文件中读到的新 userid（见 kiro_analytics.userid_scan），
+与已有映射合并，不需要全表扫描。
+sync_stores() 用于多账户汇总（见 kiro_analytics.fanout）：各账户的 userid 到各自的 Identity Store 查询。
+scripts/sync_user_mapping.py 与 Lambda (kiro-user-mapping-sync) 共用此模块。
+"""
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from kiro_analytics import metrics
+from kiro_analytics.athena import WORKGROUP, run_query
+from kiro_analytics.clients import client
+
+MAPPING_PREFIX = 'user-mapping/'
+MAPPING_KEY = f'{MAPPING_PREFIX}user_mapping.csv'
+SOURCE_TABLES = ['by_user_analytic', 'user_report']
+
+
+def clean_userid(raw_uid):
+    """去掉 CSV serde 可能保留的引号"""
+    return raw_uid.strip('"').strip()
+
+
+def collect_userids(glue_db, workgroup=WORKGROUP, region=None, log=print):
+    """从两张表查出所有不重复的原始 userid（可能带引号）"""
+    raw_userids = set()
+    for table in SOURCE_TABLES:
+        try:
+            rows = run_query(f'SELECT DISTINCT userid FROM {glue_db}.{table}',
+                             label=table, workgroup=workgroup, region=region)
+            log(f"  {table}: {len(rows)} 个 userid")
+            for row in rows:
+                if row[0]:
+                    raw_userids.add(row[0])
+        except Exception as e:
+            log(f"  跳过 {table}: {e}")
+    return raw_userids
+
+
+def collect_userids_by_account(glue_db, tables, workgroup=WORKGROUP, region=None, log=print):
+    """从多账户汇总表（含 account 分区列）查出 {account: 原始 userid 集合}"""
+    by_account = {}
+    for table in tables:
+        try:
+            rows = run_query(f'SELECT DISTINCT account, userid FROM {glue_db}.{table}',
+                             label=table, workgroup=workgroup, region=region)
+            log(f"  {table}: {len(rows)} 个 (account, userid)")
+            for account, uid in rows:
+                if uid:
+                    by_account.setdefault(account, set()).add(uid)
+        except Exception as e:
+            log(f"  跳过 {table}: {e}")
+    return by_account
+
+
+def get_display_name(user_id, identity_store_id, region=None):
+    """从 Identity Center 获取用户显示名，失败时回退为 userid"""
+    try:
+        user = client('identitystore', region).describe_user(
+            IdentityStoreId=identity_store_id, UserId=user_id)
+        return user.get('DisplayName', '') or user.get('UserName', '') or user_id
+    except Exception:
+        return user_id
+
+
+def resolve_names(raw_userids, identity_store_id, region=None):
+    """返回 [(原始 userid, 用户名)]；映射表存储原始 userid（与 Athena 表中一致）以便 JOIN"""
+    mapping = []
+    with metrics.span('identity.lookup') as sp:
+        for raw_uid in sorted(raw_userids):
+            clean_uid = clean_userid(raw_uid)
+            if not clean_uid:
+                continue
+            mapping.append((raw_uid, get_display_name(clean_uid, identity_store_id, region)))
+        sp['users'] = len(mapping)
+    return mapping
+
+
+def resolve_names_multi(userids_by_store, region=None):
+    """
+    userids_by_store: {identity_store_id: 原始 userid 集合}。各 Identity Store 并行查询，
+    总耗时取决于用户最多的那个 store；在所属 store 中查不到的 userid 再依次到其他 store 查找。
+    返回 [(原始 userid, 用户名)]
+    """
+    stores = sorted(userids_by_store)
+    with ThreadPoolExecutor(max_workers=max(1, len(stores))) as pool:
+        results = list(pool.map(lambda s: resolve_names(userids_by_store[s], s, region=region), stores))
+    names = {}
+    for mapping in results:
+        for uid, name in mapping:
+            if names.get(uid, clean_userid(uid)) == clean_userid(uid):
+                names[uid] = name
+    unresolved = {uid for uid, name in names.items() if name == clean_userid(uid)}
+    for store in stores:
+        pending = {uid for uid in unresolved if uid not in userids_by_store[store]}
+        if not pending:
+            continue
+        for uid, name in resolve_names(pending, store, region=region):
+            if name != clean_userid(uid):
+                names[uid] = name
+                unresolved.discard(uid)
+    return sorted(names.items())
+
+
+def build_csv(mapping):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(['userid', 'username'])
+    writer.writerows(mapping)
+    return buf.getvalue().encode('utf-8')
+
+
+def upload_mapping(bucket, body, region=None):
+    with metrics.span('s3.upload', key=MAPPING_KEY, bytes=len(body)):
+        client('s3', region).put_object(
+            Bucket=bucket,
+            Key=MAPPING_KEY,
+            Body=body,
+            ContentType='text/csv'
+        )
+
+
+def load_mapping(bucket, region=None):
+    """读取已有映射 CSV，返回 {原始 userid: 用户名}；不存在时返回 None"""
+    s3 = client('s3', region)
+    try:
+        body = s3.get_object(Bucket=bucket, Key=MAPPING_KEY)['Body'].read().decode('utf-8')
+    except s3.exceptions.NoSuchKey:
+        return None
+    reader = csv.reader(io.StringIO(body))
+    next(reader, None)
+    return {row[0]: row[1] for row in reader if len(row) >= 2}
+
+
+def mapping_table_input(bucket):
+    return {
+        'Name': 'user_mapping',
+        'StorageDescriptor': {
+            'Columns': [
+                {'Name': 'userid', 'Type': 'string'},
+                {'Name': 'username', 'Type': 'string'},
+            ],
+            'Location': f's3://{bucket}/{MAPPING_PREFIX}',
+            'InputFormat': 'org.apache.hadoop.mapred.TextInputFormat',
+            'OutputFormat': 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat',
+            'SerdeInfo': {
+                'SerializationLibrary': 'org.apache.hadoop.hive.serde2.OpenCSVSerde',
+                'Parameters': {
+                    'separatorChar': ',',
+                    'quoteChar': '"',
+                    'escapeChar': '\\'
+                }
+            }
+        },
+        'TableType': 'EXTERNAL_TABLE',
+        'Parameters': {
+            'skip.header.line.count': '1',
+            'classification': 'csv'
+        }
+    }
+
+
+def ensure_table(glue_db, bucket, region=None):
+    """创建或更新 user_mapping 表，返回 'created' / 'updated'"""
+    glue = client('glue', region)
+    table_input = mapping_table_input(bucket)
+    with metrics.span('glue.update', table='user_mapping'):
+        try:
+            glue.create_table(DatabaseName=glue_db, TableInput=table_input)
+            return 'created'
+        except glue.exceptions.AlreadyExistsException:
+            glue.update_table(DatabaseName=glue_db, TableInput=table_input)
+            return 'updated'
+
+
+def sync(bucket, glue_db, identity_store_id, workgroup=WORKGROUP, region=None, log=print):
+    """完整同步流程，返回映射列表"""
+    raw_userids = collect_userids(glue_db, workgroup=workgroup, region=region, log=log)
+    mapping = resolve_names(raw_userids, identity_store_id, region=region)
+    upload_mapping(bucket, build_csv(mapping), region=region)
+    ensure_table(glue_db, bucket, region=region)
+    return mapping
+
+
+def sync_delta(bucket, glue_db, identity_store_id, raw_userids, region=None, log=print):
+    """
+    增量同步：只为映射中尚不存在的 userid（以及上次查询失败、用户名仍是 userid 的条目）
+    查询 Identity Center，合并后上传。尚无映射文件时返回 None，由调用方回退到完整同步。
+    """
+    existing = load_mapping(bucket, region=region)
+    if existing is None:
+        return None
+    retry = {uid for uid, name in existing.items() if name == clean_userid(uid)}
+    pending = {uid for uid in raw_userids if uid not in existing} | retry
+    log(f"  已有 {len(existing)} 个用户，新增 {len(pending - retry)} 个，重试 {len(retry)} 个")
+    if not pending:
+        return sorted(existing.items())
+    existing.update(resolve_names(pending, identity_store_id, region=region))
+    mapping = sorted(existing.items())
+    upload_mapping(bucket, build_csv(mapping), region=region)
+    ensure_table(glue_db, bucket, region=region)
+    return mapping
+
+
+def sync_stores(bucket, glue_db, userids_by_store, full=False, region=None, log=print):
+    """
+    多 Identity Store 同步：full=True 时重新查询全部 userid，否则只查询映射中尚不存在的
+    （以及用户名仍是 userid 的）条目，合并后上传。
+    """
+    existing = load_mapping(bucket, region=region) or {}
+    retry = {uid for uid, name in existing.items() if name == clean_userid(uid)}
+    if full:
+        pending_by_store = userids_by_store
+    else:
+        pending_by_store = {store: {uid for uid in uids if uid not in existing or uid in retry}
+                            for store, uids in userids_by_store.items()}
+    pending = set().union(*pending_by_store.values()) if pending_by_store else set()
+    log(f"  已有 {len(existing)} 个用户，{len(userids_by_store)} 个 Identity Store 共需查询 {len(pending)} 个")
+    if not pending:
+        return sorted(existing.items())
+    existing.update(resolve_names_multi({s: u for s, u in pending_by_store.items() if u}, region=region))
+    mapping = sorted(existing.items())
+    upload_mapping(bucket, build_csv(mapping), region=region)
+    ensure_table(glue_db, bucket, region=region)
+    return mapping
@@ -0,0 +1,136 @@
+"""
+直接从 S3（或本地目录）流式读取报告 CSV，提取 userid 集合，不经过 Athena。
+
+用于用户映射的每日增量同步：新用户一定出现在新投递的
+by_user_analytic / user_report 文件中，只需逐行读取这些文件的 userid 列。
+报告最多晚到 REDO_DAYS 天，增量同步默认扫描今天及之前 REDO_DAYS 天的目录。
+
+keep_quotes=True 时按 LazySimpleSerDe 的方式按逗号切分、保留引号，
+得到与 Athena 表中完全一致的原始 userid（映射表需要用它做 JOIN）。
+S3 Select 已不再对新账户开放，这里使用普通的流式 GET，多个文件并行读取。
+"""
+import csv
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from kiro_analytics import metrics, reports
+from kiro_analytics.clients import client
+from kiro_analytics.partitions import REDO_DAYS
+
+LAZY_SIMPLE_SERDE = 'org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe'
+DELTA_DAYS = REDO_DAYS + 1
+
+
+class S3Source:
+    def __init__(self, bucket, region=None):
+        self.bucket = bucket
+        self.region = region
+
+    def list_dirs(self, prefix):
+        paginator = client('s3', self.region).get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter='/'):
+            for p in page.get('CommonPrefixes', []):
+                yield p['Prefix'].rstrip('/').rsplit('/', 1)[-1]
+
+    def list_files(self, prefix):
+        paginator = client('s3', self.region).get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for o in page.get('Contents', []):
+                if o['Key'].endswith('.csv'):
+                    yield o['Key']
+
+    def open(self, key):
+        """二进制流，可直接交给 pyarrow 等流式读取"""
+        return client('s3', self.region).get_object(Bucket=self.bucket, Key=key)['Body']
+
+    def iter_lines(self, key):
+        body = client('s3', self.region).get_object(Bucket=self.bucket, Key=key)['Body']
+        for line in body.iter_lines():
+            yield line.decode('utf-8-sig')
+
+
+class LocalSource:
+    """本地目录树，结构与 S3 key 相同（用于离线测试）"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def list_dirs(self, prefix):
+        path = os.path.join(self.root, prefix)
+        if os.path.isdir(path):
+            yield from sorted(d for d in os.listdir(path) if os.path.isdir(os.path.join(path, d)))
+
+    def list_files(self, prefix):
+        for dirpath, _, files in os.walk(os.path.join(self.root, prefix)):
+            for name in sorted(files):
+                if name.endswith('.csv'):
+                    yield os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, '/')
+
+    def open(self, key):
+        return open(os.path.join(self.root, key), 'rb')
+
+    def iter_lines(self, key):
+        with open(os.path.join(self.root, key), encoding='utf-8-sig') as f:
+            for line in f:
+                yield line.rstrip('\r\n')
+
+
+def userids_from_lines(lines, keep_quotes=False):
+    """逐行解析一个 CSV，返回 userid 集合；找不到 userid 列时返回空集合"""
+    lines = iter(lines)
+    header = next(lines, None)
+    if header is None:
+        return set()
+    columns = [c.strip().strip('"').lower() for c in header.split(',')]
+    if 'userid' not in columns:
+        return set()
+    idx = columns.index('userid')
+    found = set()
+    if keep_quotes:
+        for line in lines:
+            parts = line.split(',')
+            if len(parts) > idx and parts[idx].strip():
+                found.add(parts[idx].strip())
+    else:
+        for row in csv.reader(lines):
+            if len(row) > idx and row[idx].strip():
+                found.add(row[idx].strip())
+    return found
+
+
+def recent_days(last_day, days=DELTA_DAYS):
+    """last_day 及之前共 days 天，最近的在前"""
+    return [last_day - timedelta(days=i) for i in range(days)]
+
+
+def day_keys(source, base, days, tables=reports.TABLES):
+    keys = []
+    for table in tables:
+        for report_region in source.list_dirs(f'{base}{table}/'):
+            for day in days:
+                keys.extend(source.list_files(reports.day_prefix(base, table, report_region, day)))
+    return keys
+
+
+def scan(source, base, days, keep_quotes=False, workers=8):
+    """并行读取指定日期的所有报告文件，返回 userid 集合"""
+    with metrics.span('userid_scan.list') as sp:
+        keys = day_keys(source, base, days)
+        sp['files'] = len(keys)
+    userids = set()
+    with metrics.span('userid_scan.read', files=len(keys)) as sp:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(keys) or 1))) as pool:
+            for found in pool.map(lambda k: userids_from_lines(source.iter_lines(k), keep_quotes), keys):
+                userids |= found
+        sp['userids'] = len(userids)
+    return userids
+
+
+def table_keeps_quotes(glue_db, table='by_user_analytic', region=None):
+    """Crawler 建的表若使用 LazySimpleSerDe，Athena 中的 userid 会保留 CSV 引号"""
+    try:
+        t = client('glue', region).get_table(DatabaseName=glue_db, Name=table)['Table']
+    except Exception:
+        return False
+    return t['StorageDescriptor'].get('SerdeInfo', {}).get('SerializationLibrary') == LAZY_SIMPLE_SERDE
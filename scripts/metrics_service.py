@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+本地指标查询服务：供 Slack 机器人和内部脚本查询「本周 Top 用户」「本月 Credit」等，
+不经过 QuickSight 或 Athena。数据来自回填生成的 Parquet 每日汇总
+（daily_user_activity / daily_user_credits），同步到本地后 memory-map 查询。
+
+用法:
+    python3 scripts/metrics_service.py sync                               # 增量同步
+    python3 scripts/metrics_service.py query top_users --metric credits_used --days 7
+    python3 scripts/metrics_service.py query daily_summary --start 2026-03-01 --end 2026-03-07
+    python3 scripts/metrics_service.py serve --port 8765 --refresh-minutes 15
+
+HTTP 接口（GET，参数同 query 子命令；POST /refresh 立即同步）:
+    /top_users?metric=credits_used&days=7&n=10
+    /daily_summary?start=2026-03-01&end=2026-03-07
+    /tier_summary?days=30
+    /total?metric=credits_used&start=2026-03-01&end=2026-03-31
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import yaml
+
+from kiro_analytics import metrics
+from kiro_analytics.rollup_cache import DEFAULT_CACHE_DIR, RollupCache, default_range
+
+QUERIES = ('top_users', 'daily_summary', 'tier_summary', 'total')
+
+
+def answer(cache, name, params):
+    """params: dict(metric, start, end, days, n)，返回 (结果, 耗时 ms)"""
+    if name not in QUERIES:
+        raise ValueError(f'未知查询: {name}（可用: {", ".join(QUERIES)}）')
+    if params.get('start'):
+        start, end = params['start'], params.get('end') or date.today().isoformat()
+    else:
+        start, end = default_range(int(params.get('days') or 7), date.today())
+    began = time.perf_counter()
+    if name == 'top_users':
+        result = cache.top_users(params.get('metric') or 'credits_used', start, end, int(params.get('n') or 10))
+    elif name == 'total':
+        result = cache.total(params.get('metric') or 'credits_used', start, end)
+    else:
+        result = getattr(cache, name)(start, end)
+    return result, round((time.perf_counter() - began) * 1000, 2)
+
+
+class Current:
+    """服务当前使用的缓存。后台同步在新的 RollupCache 上完成，再在锁内替换引用；
+    查询只在锁内取引用，聚合在锁外进行，同步期间查询不会被阻塞"""
+
+    def __init__(self, cache):
+        self._cache = cache.open_segments()
+        self._lock = threading.Lock()
+        # 同一时刻只允许一个同步（后台定时与 POST /refresh 可能同时触发）
+        self._refresh_lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            return self._cache
+
+    def refresh(self, log=print):
+        with self._refresh_lock:
+            old = self.get()
+            cache = RollupCache(old.bucket, cache_dir=old.cache_dir, region=old.region)
+            refreshed = cache.sync(log=log)
+            cache.load_usernames()
+            cache.open_segments()
+            with self._lock:
+                self._cache = cache
+        return refreshed
+
+
+def make_handler(current):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            name = url.path.strip('/')
+            cache = current.get()
+            if name == 'health':
+                return self._send(200, {'days': {t: len(cache.days(t)) for t in cache.manifest}})
+            params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            try:
+                result, elapsed = answer(cache, name, params)
+            except ValueError as e:
+                return self._send(400, {'error': str(e)})
+            self._send(200, {'query': name, 'elapsed_ms': elapsed, 'result': result})
+
+        def do_POST(self):
+            if urlparse(self.path).path.strip('/') != 'refresh':
+                return self._send(404, {'error': 'not found'})
+            refreshed = current.refresh(log=lambda *_: None)
+            self._send(200, {'refreshed_partitions': refreshed})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def refresh_loop(current, minutes):
+    while True:
+        time.sleep(minutes * 60)
+        try:
+            current.refresh()
+        except Exception as e:
+            print(f"  ✗ 后台同步失败: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地指标查询服务')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='本地缓存目录')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('sync', help='增量同步 Parquet 汇总到本地')
+    q = sub.add_parser('query', help='执行一次查询')
+    q.add_argument('name', choices=QUERIES)
+    q.add_argument('--metric', help='指标列，如 credits_used / chat_aicodelines')
+    q.add_argument('--start', help='开始日期 YYYY-MM-DD')
+    q.add_argument('--end', help='结束日期 YYYY-MM-DD（默认今天）')
+    q.add_argument('--days', type=int, default=7, help='未指定 --start 时查询最近 N 天')
+    q.add_argument('--n', type=int, default=10, help='Top N')
+    q.add_argument('--no-sync', action='store_true', help='查询前不同步')
+    s = sub.add_parser('serve', help='启动 HTTP 服务')
+    s.add_argument('--host', default='127.0.0.1')
+    s.add_argument('--port', type=int, default=8765)
+    s.add_argument('--refresh-minutes', type=int, default=15, help='后台增量同步间隔')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open('config.yaml'))
+    cache = RollupCache(config['s3']['bucket_name'], cache_dir=args.cache_dir,
+                        region=config['aws']['region'])
+
+    if args.command == 'query' and args.no_sync:
+        cache.load_usernames()
+    else:
+        print("同步每日汇总...")
+        cache.sync()
+        cache.load_usernames()
+
+    if args.command == 'query':
+        result, elapsed = answer(cache, args.name, vars(args))
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        print(f"\n✓ {args.name} 用时 {elapsed} ms")
+    elif args.command == 'serve':
+        current = Current(cache)
+        threading.Thread(target=refresh_loop, args=(current, args.refresh_minutes), daemon=True).start()
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(current))
+        print(f"✓ 监听 http://{args.host}:{args.port}/（每 {args.refresh_minutes} 分钟增量同步）")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    metrics.report()
+
+
+if __name__ == '__main__':
+    main()
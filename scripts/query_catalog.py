@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Athena 预编译查询目录：注册语句，按用户 / 日期区间 / 订阅层级执行。
+
+语句定义位于 kiro_analytics.statements，deploy.sh 第 5 步会执行 register。
+
+用法:
+    python3 scripts/query_catalog.py register
+    python3 scripts/query_catalog.py list
+    python3 scripts/query_catalog.py run user_activity --userid <userid> --start 2026-03-01 --end 2026-03-07
+    python3 scripts/query_catalog.py run tier_users --tier PRO --start 2026-03-01
+    python3 scripts/query_catalog.py run range_summary --start 2026-03-01 --end 2026-03-31
+"""
+import argparse
+import sys
+from datetime import date
+
+import yaml
+
+from kiro_analytics import metrics, statements
+from kiro_analytics.athena import WORKGROUP
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Athena 预编译查询目录')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('register', help='创建或更新工作组中的全部语句')
+    sub.add_parser('list', help='列出目录中的语句与参数')
+    r = sub.add_parser('run', help='执行一条语句')
+    r.add_argument('name', choices=list(statements.CATALOG))
+    r.add_argument('--userid', help='userid（带不带引号均可）')
+    r.add_argument('--tier', help='订阅层级')
+    r.add_argument('--start', help='开始日期 YYYY-MM-DD')
+    r.add_argument('--end', default=date.today().isoformat(), help='结束日期 YYYY-MM-DD（默认今天）')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open('config.yaml'))
+    region = config['aws']['region']
+    glue_db = config['glue']['database_name']
+    workgroup = config.get('athena', {}).get('workgroup', WORKGROUP)
+
+    if args.command == 'list':
+        for name, (description, params, _) in statements.CATALOG.items():
+            print(f"  {statements.statement_name(name)}({', '.join(dict.fromkeys(params))}): {description}")
+        return
+
+    if args.command == 'register':
+        print(f"注册预编译语句到工作组 {workgroup}...")
+        statements.register(glue_db, config, workgroup=workgroup, region=region)
+        print(f"\n✅ 共 {len(statements.CATALOG)} 条语句")
+        metrics.report()
+        return
+
+    try:
+        rows = statements.execute(args.name, vars(args), workgroup=workgroup, region=region)
+    except ValueError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    for row in rows:
+        print('  ' + '\t'.join(row))
+    print(f"\n✓ {statements.statement_name(args.name)}: {len(rows)} 行")
+    metrics.report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+本地负载与限流模拟：用内存中的 AWS 服务替身运行真实的用户映射同步与部署脚本，
+报告墙钟时间、模拟的 API 时间、每个接口的调用 / 限流 / 失败次数与峰值内存。
+不访问 AWS，用于在修改并发或缓存策略前后做对比。
+
+替身实现位于 kiro_analytics.simulator，通过 clients.use_factory() 注入。
+
+用法:
+    python3 scripts/simulate_load.py                                  # 全部场景，1 万用户
+    python3 scripts/simulate_load.py sync-full --users 100000 --throttle-rate 0.05
+    python3 scripts/simulate_load.py sync-delta --users 50000 --new-ratio 0.02
+    python3 scripts/simulate_load.py deploy --time-scale 1            # 按真实延迟 sleep
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+import yaml
+
+from kiro_analytics import reports, simulator, statements, user_mapping, userid_scan
+from kiro_analytics.user_mapping import clean_userid
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPTS_DIR)
+SCENARIOS = ('sync-full', 'sync-delta', 'deploy')
+
+
+def load_config():
+    """以 config.example.yaml 为模板，填入模拟账户的取值"""
+    with open(os.path.join(REPO_DIR, 'config.example.yaml')) as f:
+        config = yaml.safe_load(f)
+    config['aws']['account_id'] = '123456789012'
+    config['s3']['bucket_name'] = 'kiro-sim-bucket'
+    config['identity_center']['identity_store_id'] = 'd-0000000000'
+    config['quicksight']['user_arn'] = 'arn:aws:quicksight:us-east-1:123456789012:user/default/sim'
+    return config
+
+
+CONFIG = load_config()
+
+
+def quiet(*_):
+    pass
+
+
+def fallback_names(mapping):
+    """Identity Store 查询失败、用户名回退为 userid 的条目数"""
+    return sum(1 for uid, name in mapping if name == clean_userid(uid))
+
+
+def run_sync_full(sim, args):
+    cfg = CONFIG
+    sim.seed_glue_tables(cfg['glue']['database_name'])
+    mapping = user_mapping.sync(cfg['s3']['bucket_name'], cfg['glue']['database_name'],
+                                cfg['identity_center']['identity_store_id'], region=cfg['aws']['region'], log=quiet)
+    return {'users': len(mapping), 'fallback_names': fallback_names(mapping)}
+
+
+def run_sync_delta(sim, args):
+    cfg = CONFIG
+    bucket, glue_db, region = cfg['s3']['bucket_name'], cfg['glue']['database_name'], cfg['aws']['region']
+    sim.seed_glue_tables(glue_db)
+    base = reports.logs_base(cfg['s3']['prefix'], cfg['aws']['account_id'])
+    today = date.today()
+    days = userid_scan.recent_days(today)
+    files = sim.seed_reports(base, days, report_regions=args.report_regions.split(','))
+    # 已有映射覆盖 1 - new_ratio 的用户，其余是本次需要查询的新用户
+    known = sim.user_ids[:int(len(sim.user_ids) * (1 - args.new_ratio))]
+    sim.objects[user_mapping.MAPPING_KEY] = user_mapping.build_csv(
+        [(sim.raw_userid(u), f'User {u[:8]}') for u in known])
+
+    source = userid_scan.S3Source(bucket, region)
+    keep_quotes = userid_scan.table_keeps_quotes(glue_db, region=region)
+    raw_userids = userid_scan.scan(source, base, days, keep_quotes=keep_quotes, workers=args.workers)
+    mapping = user_mapping.sync_delta(bucket, glue_db, cfg['identity_center']['identity_store_id'],
+                                      raw_userids, region=region, log=quiet)
+    return {'files': files, 'userids_found': len(raw_userids), 'users': len(mapping),
+            'fallback_names': fallback_names(mapping)}
+
+
+def run_deploy(sim, args):
+    """create_views → query_catalog register → create_datasets → create_dashboard_publish"""
+    import runpy
+
+    cfg = CONFIG
+    sim.seed_glue_tables(cfg['glue']['database_name'])
+    workdir = tempfile.mkdtemp(prefix='kiro-sim-')
+    with open(os.path.join(workdir, 'config.yaml'), 'w') as f:
+        yaml.safe_dump(cfg, f)
+    os.symlink(os.path.join(REPO_DIR, 'sql'), os.path.join(workdir, 'sql'))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import create_datasets
+        import create_views
+        create_views.main()
+        statements.register(cfg['glue']['database_name'], cfg, region=cfg['aws']['region'], log=quiet)
+        create_datasets.QuickSightDeployer().deploy_all()
+        runpy.run_path(os.path.join(SCRIPTS_DIR, 'create_dashboard_publish.py'), run_name='__main__')
+    finally:
+        os.chdir(cwd)
+    return {'quicksight_resources': len(sim.resources), 'statements': len(sim.statements)}
+
+
+RUNNERS = {'sync-full': run_sync_full, 'sync-delta': run_sync_delta, 'deploy': run_deploy}
+
+
+def run_scenario(name, args):
+    sim = simulator.Simulation(users=args.users, throttle_rate=args.throttle_rate, time_scale=args.time_scale,
+                               seed=args.seed)
+    tracemalloc.start()
+    began = time.perf_counter()
+    error = None
+    with sim.installed():
+        try:
+            extra = RUNNERS[name](sim, args)
+        except Exception as e:
+            extra, error = {}, f'{type(e).__name__}: {e}'
+    wall = time.perf_counter() - began
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    summary = sim.summary()
+    summary.update(scenario=name, wall_s=wall, peak_mb=peak / 1024 ** 2, error=error, **extra)
+    return summary
+
+
+def print_summary(s, top):
+    flag = '✗' if s['error'] else '✓'
+    print(f"\n{flag} {s['scenario']}: 墙钟 {s['wall_s']:.2f}s，模拟 API 时间 {s['simulated_s']:.1f}s，"
+          f"峰值内存 {s['peak_mb']:.1f} MB")
+    print(f"  API 调用 {s['calls']} 次，限流 {s['throttled']} 次，重试耗尽 {s['failed']} 次")
+    for key in ('users', 'userids_found', 'files', 'fallback_names', 'quicksight_resources', 'statements'):
+        if key in s:
+            print(f"  {key}: {s[key]}")
+    ops = sorted(s['by_operation'].items(), key=lambda kv: -kv[1][0])[:top]
+    for op, (calls, throttled, failed) in ops:
+        print(f"    {op:<40} {calls:>8} 次  限流 {throttled:>6}  失败 {failed:>4}")
+    if s['error']:
+        print(f"  ✗ {s['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地负载与限流模拟')
+    parser.add_argument('scenarios', nargs='*', choices=SCENARIOS + ('all',), default='all',
+                        help='要运行的场景（默认全部）')
+    parser.add_argument('--users', type=int, default=10000, help='模拟用户数（默认 1 万）')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='每次调用被限流的概率，如 0.05')
+    parser.add_argument('--time-scale', type=float, default=0.01,
+                        help='延迟缩放：1 表示按真实延迟 sleep，0 表示不 sleep（默认 0.01）')
+    parser.add_argument('--new-ratio', type=float, default=0.01, help='sync-delta 中新用户占比')
+    parser.add_argument('--report-regions', default='us-east-1', help='sync-delta 中报告所在 Region，逗号分隔')
+    parser.add_argument('--workers', type=int, default=8, help='sync-delta 读取报告文件的并行线程数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--top', type=int, default=8, help='每个场景显示调用最多的前 N 个接口')
+    args = parser.parse_args()
+
+    os.environ.setdefault('KIRO_METRICS', 'off')
+    scenarios = SCENARIOS if 'all' in args.scenarios else list(dict.fromkeys(args.scenarios))
+    print(f"模拟 {args.users} 个用户，限流概率 {args.throttle_rate}，延迟缩放 {args.time_scale}")
+    results = []
+    for name in scenarios:
+        print(f"\n▶ {name}")
+        results.append(run_scenario(name, args))
+    for s in results:
+        print_summary(s, args.top)
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\n进程峰值 RSS {rss_mb:.0f} MB")
+    if any(s['error'] for s in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
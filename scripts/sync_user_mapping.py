@@ -2,152 +2,101 @@
 """
 从 Athena 查出所有 userid，通过 IAM Identity Center 获取用户名，
 生成映射 CSV 上传到 S3，并创建/更新 Athena 外部表。
+
+同步逻辑位于 kiro_analytics.user_mapping，与 Lambda 共用。
+
+用法:
+    python3 scripts/sync_user_mapping.py                          # 完整同步（Athena）
+    python3 scripts/sync_user_mapping.py --from-s3                # 增量：直接读取最近几天的报告文件
+    python3 scripts/sync_user_mapping.py --from-s3 --date 2026-03-05
+    python3 scripts/sync_user_mapping.py --local-root ./sample --date 2026-03-05   # 离线：只列出 userid
 """
-import boto3
+import argparse
+import sys
+from datetime import date, datetime, timezone
+
 import yaml
-import csv
-import io
-import time
+
+from kiro_analytics import metrics, reports, user_mapping, userid_scan
+from kiro_analytics.athena import WORKGROUP, run_query
+from kiro_analytics.partitions import REDO_DAYS
+
+parser = argparse.ArgumentParser(description='同步 userid → 用户名映射')
+parser.add_argument('--from-s3', action='store_true', help='直接从 S3 报告文件提取新 userid（不经过 Athena）')
+parser.add_argument('--local-root', help='从本地目录树（与 S3 key 结构相同）提取 userid，只打印不同步')
+parser.add_argument('--date', help='扫描的最后一天 YYYY-MM-DD（默认今天）')
+parser.add_argument('--days', type=int, default=userid_scan.DELTA_DAYS,
+                    help=f'向前扫描的天数，含 --date 当天（默认 {userid_scan.DELTA_DAYS}，覆盖最多晚到 {REDO_DAYS} 天的报告）')
+args = parser.parse_args()
 
 config = yaml.safe_load(open('config.yaml'))
 region = config['aws']['region']
-account_id = config['aws']['account_id']
 bucket = config['s3']['bucket_name']
 glue_db = config['glue']['database_name']
 identity_store_id = config.get('identity_center', {}).get('identity_store_id', 'd-906791923a')
 
-athena = boto3.client('athena', region_name=region)
-s3 = boto3.client('s3', region_name=region)
-ids = boto3.client('identitystore', region_name=region)
-glue = boto3.client('glue', region_name=region)
-
-WORKGROUP = 'kiro-analytics-workgroup'
-MAPPING_PREFIX = 'user-mapping/'
-MAPPING_KEY = f'{MAPPING_PREFIX}user_mapping.csv'
-
-
-def run_query(sql):
-    """执行 Athena 查询并返回结果行"""
-    r = athena.start_query_execution(QueryString=sql, WorkGroup=WORKGROUP)
-    qid = r['QueryExecutionId']
-    while True:
-        s = athena.get_query_execution(QueryExecutionId=qid)['QueryExecution']['Status']['State']
-        if s == 'SUCCEEDED':
-            break
-        elif s == 'FAILED':
-            reason = athena.get_query_execution(QueryExecutionId=qid)['QueryExecution']['Status'].get('StateChangeReason', '')
-            raise Exception(f"Query failed: {reason}")
-        time.sleep(2)
-    rows = []
-    paginator = athena.get_paginator('get_query_results')
-    for page in paginator.paginate(QueryExecutionId=qid):
-        for row in page['ResultSet']['Rows']:
-            rows.append([col.get('VarCharValue', '') for col in row['Data']])
-    return rows[1:]  # skip header
-
-
-def get_display_name(user_id):
-    """从 Identity Center 获取用户显示名"""
-    try:
-        user = ids.describe_user(IdentityStoreId=identity_store_id, UserId=user_id)
-        return user.get('DisplayName', '') or user.get('UserName', '') or user_id
-    except Exception:
-        return user_id
-
+last_day = date.fromisoformat(args.date) if args.date else datetime.now(timezone.utc).date()
+days = userid_scan.recent_days(last_day, args.days)
+base = reports.logs_base(config['s3']['prefix'], config['aws']['account_id'])
+
+if args.local_root:
+    found = userid_scan.scan(userid_scan.LocalSource(args.local_root), base, days)
+    for uid in sorted(found):
+        print(uid)
+    print(f"\n✓ {days[-1]} ~ {days[0]} 共 {len(found)} 个 userid", file=sys.stderr)
+    sys.exit(0)
+
+if args.from_s3:
+    print(f"1. 扫描 {days[-1]} ~ {days[0]} 的报告文件...")
+    keep_quotes = userid_scan.table_keeps_quotes(glue_db, region=region)
+    raw_userids = userid_scan.scan(userid_scan.S3Source(bucket, region), base, days, keep_quotes=keep_quotes)
+    print(f"  找到 {len(raw_userids)} 个不重复用户")
+    print("2. 合并到已有映射...")
+    mapping = user_mapping.sync_delta(bucket, glue_db, identity_store_id, raw_userids, region=region)
+    if mapping is not None:
+        print(f"\n✅ 增量同步完成！共 {len(mapping)} 个用户")
+        metrics.report()
+        sys.exit(0)
+    print("  尚无映射文件，执行完整同步")
 
 # ============================================
 # 1. 从两张表查出所有不重复的 userid
 # ============================================
 print("1. 查询所有 userid...")
-raw_userids = set()  # 原始值（可能带引号）
-
-for table in ['by_user_analytic', 'user_report']:
-    try:
-        rows = run_query(f'SELECT DISTINCT userid FROM {glue_db}.{table}')
-        for row in rows:
-            if row[0]:
-                raw_userids.add(row[0])
-    except Exception as e:
-        print(f"  跳过 {table}: {e}")
-
+raw_userids = user_mapping.collect_userids(glue_db, workgroup=WORKGROUP, region=region)
 print(f"  找到 {len(raw_userids)} 个不重复用户")
 
 # ============================================
 # 2. 逐个查询 Identity Center 获取用户名
 # ============================================
 print("2. 从 Identity Center 获取用户名...")
-mapping = []
-for raw_uid in sorted(raw_userids):
-    # 去掉 CSV serde 可能保留的引号
-    clean_uid = raw_uid.strip('"').strip()
-    if not clean_uid:
-        continue
-    name = get_display_name(clean_uid)
-    # 映射表存储原始 userid（与 Athena 表中一致）以便 JOIN
-    mapping.append((raw_uid, name))
-    print(f"  {raw_uid} → {name}")
+mapping = user_mapping.resolve_names(raw_userids, identity_store_id, region=region)
+for uid, name in mapping:
+    print(f"  {uid} → {name}")
 
 # ============================================
 # 3. 生成 CSV 并上传到 S3
 # ============================================
 print("3. 上传映射文件到 S3...")
-buf = io.StringIO()
-writer = csv.writer(buf)
-writer.writerow(['userid', 'username'])
-for uid, name in mapping:
-    writer.writerow([uid, name])
-
-s3.put_object(
-    Bucket=bucket,
-    Key=MAPPING_KEY,
-    Body=buf.getvalue().encode('utf-8'),
-    ContentType='text/csv'
-)
-print(f"  ✓ s3://{bucket}/{MAPPING_KEY}")
+user_mapping.upload_mapping(bucket, user_mapping.build_csv(mapping), region=region)
+print(f"  ✓ s3://{bucket}/{user_mapping.MAPPING_KEY}")
 
 # ============================================
 # 4. 创建/更新 Glue 表指向映射 CSV
 # ============================================
 print("4. 创建 Athena 映射表...")
-table_input = {
-    'Name': 'user_mapping',
-    'StorageDescriptor': {
-        'Columns': [
-            {'Name': 'userid', 'Type': 'string'},
-            {'Name': 'username', 'Type': 'string'},
-        ],
-        'Location': f's3://{bucket}/{MAPPING_PREFIX}',
-        'InputFormat': 'org.apache.hadoop.mapred.TextInputFormat',
-        'OutputFormat': 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat',
-        'SerdeInfo': {
-            'SerializationLibrary': 'org.apache.hadoop.hive.serde2.OpenCSVSerde',
-            'Parameters': {
-                'separatorChar': ',',
-                'quoteChar': '"',
-                'escapeChar': '\\'
-            }
-        }
-    },
-    'TableType': 'EXTERNAL_TABLE',
-    'Parameters': {
-        'skip.header.line.count': '1',
-        'classification': 'csv'
-    }
-}
-
-try:
-    glue.create_table(DatabaseName=glue_db, TableInput=table_input)
+if user_mapping.ensure_table(glue_db, bucket, region=region) == 'created':
     print("  ✓ user_mapping 表创建成功")
-except glue.exceptions.AlreadyExistsException:
-    glue.update_table(DatabaseName=glue_db, TableInput=table_input)
+else:
     print("  ✓ user_mapping 表已更新")
 
 # ============================================
 # 5. 验证
 # ============================================
 print("5. 验证映射表...")
-rows = run_query(f'SELECT * FROM {glue_db}.user_mapping LIMIT 5')
+rows = run_query(f'SELECT * FROM {glue_db}.user_mapping LIMIT 5', label='user_mapping', region=region)
 for row in rows:
     print(f"  {row[0]} → {row[1]}")
 
 print(f"\n✅ 用户映射同步完成！共 {len(mapping)} 个用户")
+metrics.report()
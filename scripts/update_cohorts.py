@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+增量更新新用户首次出现索引（user_first_seen）与按周 cohort 留存表（cohort_retention_weekly）。
+
+报告会晚 1~2 天到达：索引只更新到最近 3 天之前、且报告已连续到达的日期；
+周日超过 7 天的周才记为已完成，之前的周每次运行重算。
+
+用法:
+    python3 scripts/update_cohorts.py                     # 索引更新到报告已到达的日期，计算所有新完成的周
+    python3 scripts/update_cohorts.py --end 2026-03-08
+    python3 scripts/update_cohorts.py --rebuild           # 清空后从头重建（补投了更早的报告时使用）
+"""
+import argparse
+from datetime import date, timedelta
+
+import yaml
+
+from kiro_analytics import cohorts, metrics, reports
+from kiro_analytics.athena import WORKGROUP
+from kiro_analytics.partitions import parse_date
+
+
+def main():
+    parser = argparse.ArgumentParser(description='增量更新 cohort 留存')
+    parser.add_argument('--end', default=(date.today() - timedelta(days=1)).isoformat(),
+                        help='更新到的日期 YYYY-MM-DD（默认昨天）')
+    parser.add_argument('--rebuild', action='store_true', help='清空索引和留存表后从头重建')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open('config.yaml'))
+    region = config['aws']['region']
+    bucket = config['s3']['bucket_name']
+    glue_db = config['glue']['database_name']
+    base = reports.logs_base(config['s3']['prefix'], config['aws']['account_id'])
+    workgroup = config.get('athena', {}).get('workgroup', WORKGROUP)
+
+    if args.rebuild:
+        print("清空 user_first_seen / cohort_retention_weekly ...")
+        cohorts.reset(bucket, region=region)
+
+    print(f"更新 cohort 到 {args.end} ...")
+    state = cohorts.update(glue_db, bucket, parse_date(args.end), base, workgroup=workgroup, region=region)
+
+    print(f"\n✅ 首次出现索引截至 {state['first_seen_through']}，"
+          f"留存已关闭到 {state['retention_through'] or '-'} 所在周")
+    metrics.report()
+
+
+if __name__ == '__main__':
+    main()
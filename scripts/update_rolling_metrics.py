@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+增量更新每用户 7 / 30 / 90 天滚动指标与分层（user_rolling_metrics，视图 user_segments_current）。
+
+每天只加上新一天、减去滑出窗口的那一天，不重算全部历史；逐天顺序执行。
+运行前会先用 sql/backfill/daily_user_activity.sql 补齐所需日期的每日汇总（有断点，已完成的日期会跳过）。
+报告会晚到：最近 3 天每次都连同每日汇总一起重算，每日汇总为空的日期跳过、不生成分区，下次运行再补。
+
+用法:
+    python3 scripts/update_rolling_metrics.py                          # 从上次完成的日期续到昨天
+    python3 scripts/update_rolling_metrics.py --start 2026-03-01 --end 2026-03-31
+    python3 scripts/update_rolling_metrics.py --skip-daily             # 不补齐 daily_user_activity
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+import yaml
+
+from kiro_analytics import backfill, metrics, rolling
+from kiro_analytics.athena import WORKGROUP
+from kiro_analytics.partitions import iter_days, parse_date
+
+DAILY_TEMPLATE = 'sql/backfill/daily_user_activity.sql'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='增量更新每用户滚动窗口指标')
+    parser.add_argument('--start', help='开始日期 YYYY-MM-DD（默认上次完成日期的后一天与最近 3 天中较早者）')
+    parser.add_argument('--end', default=(date.today() - timedelta(days=1)).isoformat(),
+                        help='结束日期 YYYY-MM-DD（默认昨天）')
+    parser.add_argument('--skip-daily', action='store_true', help='不补齐 daily_user_activity')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open('config.yaml'))
+    region = config['aws']['region']
+    bucket = config['s3']['bucket_name']
+    glue_db = config['glue']['database_name']
+    athena_cfg = config.get('athena', {})
+    workgroup = athena_cfg.get('workgroup', WORKGROUP)
+
+    end = parse_date(args.end)
+    if args.start:
+        start = parse_date(args.start)
+    else:
+        start = rolling.default_start(rolling.done_days(bucket, region), end)
+    if start > end:
+        print(f"✓ 已是最新（最后完成 {start - timedelta(days=1)}）")
+        return
+
+    if not args.skip_daily:
+        # 增量需要 D 与 D-7 / D-30 / D-90，首次计算需要 D 之前 90 天
+        daily_start = start - timedelta(days=max(rolling.WINDOWS))
+        print(f"1. 补齐 daily_user_activity: {daily_start} ~ {end}")
+        with open(DAILY_TEMPLATE) as f:
+            template = f.read()
+        summary = backfill.run(
+            'daily_user_activity', template,
+            {'db': glue_db, 'bucket': bucket}, daily_start, end,
+            workers=4, max_concurrency=int(athena_cfg.get('max_concurrent_queries',
+                                                           backfill.DEFAULT_MAX_CONCURRENCY)),
+            workgroup=workgroup, region=region)
+        if summary['failed']:
+            print(f"✗ {summary['failed']} 个 chunk 失败，滚动指标依赖完整的每日汇总，已停止")
+            sys.exit(1)
+
+    print(f"2. 更新滚动指标: {start} ~ {end}")
+    skipped = rolling.update(glue_db, bucket, list(iter_days(start, end)), workgroup=workgroup, region=region)
+
+    print(f"\n✅ {glue_db}.{rolling.TABLE} 已更新到 {end}，最新分层见 {glue_db}.{rolling.VIEW}")
+    if skipped:
+        print(f"⚠️ {len(skipped)} 天的报告尚未到达（{', '.join(map(str, skipped))}），下次运行会自动补上")
+    metrics.report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+报告数据质量校验：直接流式读取 S3 中的报告 CSV，检查列数、userid、计数列与日期格式，
+输出每个文件的行数与吞吐。不经过 Athena，不产生扫描费用。
+
+校验逻辑位于 kiro_analytics.data_quality，deploy.sh 第 4 步调用本脚本。
+
+用法:
+    python3 scripts/validate_data.py                          # 校验最新一天的全部文件
+    python3 scripts/validate_data.py --date 2026-03-05
+    python3 scripts/validate_data.py --start 2026-03-01 --end 2026-03-07 --sample 20
+    python3 scripts/validate_data.py --local-root ./sample --date 2026-03-05   # 离线校验本地目录
+"""
+import argparse
+import sys
+
+import yaml
+
+from kiro_analytics import data_quality, metrics, reports
+from kiro_analytics.partitions import iter_days, parse_date
+from kiro_analytics.userid_scan import LocalSource, S3Source
+
+
+def main():
+    parser = argparse.ArgumentParser(description='报告数据质量校验')
+    parser.add_argument('--date', help='校验指定日期 YYYY-MM-DD（默认最新一天）')
+    parser.add_argument('--start', help='开始日期 YYYY-MM-DD')
+    parser.add_argument('--end', help='结束日期 YYYY-MM-DD（默认与 --start 相同）')
+    parser.add_argument('--sample', type=int, help='每张表最多随机抽取 N 个文件')
+    parser.add_argument('--local-root', help='校验本地目录树（与 S3 key 结构相同）')
+    parser.add_argument('--workers', type=int, default=8, help='并行线程数')
+    parser.add_argument('--verbose', action='store_true', help='输出每个文件的结果')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open('config.yaml'))
+    region = config['aws']['region']
+    base = reports.logs_base(config['s3']['prefix'], config['aws']['account_id'])
+    source = LocalSource(args.local_root) if args.local_root else S3Source(config['s3']['bucket_name'], region)
+
+    if args.start:
+        days = list(iter_days(parse_date(args.start), parse_date(args.end or args.start)))
+    elif args.date:
+        days = [parse_date(args.date)]
+    else:
+        latest = [d for d in (data_quality.latest_day(source, base, t) for t in reports.TABLES) if d]
+        if not latest:
+            print("✗ 未找到任何报告文件，请确认 Kiro 报告已投递到 S3")
+            sys.exit(1)
+        days = sorted(set(latest))
+    print(f"校验 {days[0]} ~ {days[-1]} 的报告文件"
+          f"{f'（每张表抽样 {args.sample} 个）' if args.sample else ''}...")
+
+    results = data_quality.run(source, base, days, sample=args.sample, workers=args.workers)
+    for r in results:
+        if args.verbose or r['issues']:
+            flag = '✗' if any(n in data_quality.ERRORS for n in r['issues']) else '✓'
+            issues = ', '.join(f'{k}={v}' for k, v in sorted(r['issues'].items()))
+            print(f"  {flag} {r['key'].rsplit('/', 1)[-1]}: {r['rows']} 行，"
+                  f"{r['bytes'] / 1024:.1f} KB，{r['mb_per_s']:.1f} MB/s{'，' + issues if issues else ''}")
+
+    summary = data_quality.summarize(results)
+    for table in reports.TABLES:
+        table_results = [r for r in results if r['table'] == table]
+        rows = sum(r['rows'] for r in table_results)
+        print(f"  {table}: {len(table_results)} 个文件，{rows} 条记录")
+    for name, n in sorted(summary['warnings'].items()):
+        print(f"  ⚠️ {name}: {n}")
+    metrics.emit({'type': 'data_quality', 'stage': 'data_quality.summary', 'files': summary['files'],
+                  'rows': summary['rows'], 'bytes': summary['bytes'],
+                  'errors': sum(summary['errors'].values())},
+                 metrics=[('files', 'Count'), ('rows', 'Count'), ('bytes', 'Bytes'), ('errors', 'Count')])
+    metrics.report()
+
+    if not results:
+        print("✗ 所选日期没有报告文件")
+        sys.exit(1)
+    if summary['errors']:
+        for name, n in sorted(summary['errors'].items()):
+            print(f"  ✗ {name}: {n}")
+        print("✗ 数据质量校验未通过")
+        sys.exit(1)
+    print(f"\n✅ 数据质量校验通过：{summary['files']} 个文件，{summary['rows']} 条记录")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+-- =============================================
+-- 每日每用户行为汇总（合并 KIRO_CLI / KIRO_IDE 两份 CSV），Parquet 按 dt 分区
+-- 用法: python3 scripts/backfill.py sql/backfill/daily_user_activity.sql --start 2026-02-01 --end 2026-05-31
+-- =============================================
+
+-- @once
+CREATE EXTERNAL TABLE IF NOT EXISTS {db}.daily_user_activity (
+    userid string,
+    chat_aicodelines bigint,
+    chat_messagessent bigint,
+    inline_aicodelines bigint,
+    inline_acceptancecount bigint,
+    inline_suggestionscount bigint,
+    testgeneration_eventcount bigint,
+    codereview_findingscount bigint
+)
+PARTITIONED BY (dt string)
+STORED AS PARQUET
+LOCATION 's3://{bucket}/derived/daily_user_activity/';
+
+-- @clear s3://{bucket}/derived/daily_user_activity/dt={dt}/
+INSERT INTO {db}.daily_user_activity
+SELECT
+    userid,
+    SUM(chat_aicodelines),
+    SUM(chat_messagessent),
+    SUM(inline_aicodelines),
+    SUM(inline_acceptancecount),
+    SUM(inline_suggestionscount),
+    SUM(testgeneration_eventcount),
+    SUM(codereview_findingscount),
+    {partition_date} AS dt
+FROM {db}.by_user_analytic
+WHERE {partition_filter}
+GROUP BY userid, {partition_date};
@@ -0,0 +1,33 @@
+-- =============================================
+-- 每日每用户 Credit 汇总（合并 KIRO_CLI / KIRO_IDE 两份 CSV），Parquet 按 dt 分区
+-- 用法: python3 scripts/backfill.py sql/backfill/daily_user_credits.sql --start 2026-02-10 --end 2026-05-31
+-- =============================================
+
+-- @once
+CREATE EXTERNAL TABLE IF NOT EXISTS {db}.daily_user_credits (
+    userid string,
+    subscription_tier string,
+    credits_used double,
+    overage_credits_used double,
+    overage_cap double,
+    total_messages bigint,
+    chat_conversations bigint
+)
+PARTITIONED BY (dt string)
+STORED AS PARQUET
+LOCATION 's3://{bucket}/derived/daily_user_credits/';
+
+-- @clear s3://{bucket}/derived/daily_user_credits/dt={dt}/
+INSERT INTO {db}.daily_user_credits
+SELECT
+    userid,
+    max(subscription_tier),
+    SUM(credits_used),
+    SUM(overage_credits_used),
+    max(overage_cap),
+    SUM(total_messages),
+    SUM(chat_conversations),
+    {partition_date} AS dt
+FROM {db}.user_report
+WHERE {partition_filter}
+GROUP BY userid, {partition_date};
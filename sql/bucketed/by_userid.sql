@@ -0,0 +1,21 @@
+-- =============================================
+-- 按 userid 分桶的派生表（Parquet），by_user_analytic 与 user_report 共用
+-- 由 scripts/create_bucketed_tables.py 渲染并执行：Athena 不支持向分桶表 INSERT INTO，
+-- 每个月单独执行一次本 CTAS，写入 <版本目录>/ym=YYYY-MM/，再由脚本登记为按 ym 分区的正式表
+-- 占位符: {db} {table} {source} {columns} {location} {bucket_column} {bucket_count} {month_filter}
+-- {columns} 为源表的数据列，不含 partition_0..3
+-- =============================================
+
+CREATE TABLE {db}.{table}
+WITH (
+    format = 'PARQUET',
+    write_compression = 'SNAPPY',
+    external_location = '{location}',
+    bucketed_by = ARRAY['{bucket_column}'],
+    bucket_count = {bucket_count}
+) AS
+SELECT
+    {columns},
+    replace(userid, '"', '') AS {bucket_column}
+FROM {db}.{source}
+WHERE {month_filter}
@@ -0,0 +1,34 @@
+-- =============================================
+-- 视图基于 athena_query_telemetry 表（Athena 查询成本遥测）
+-- 由 scripts/collect_query_telemetry.py 创建和写入
+-- =============================================
+
+-- 最近 30 天最昂贵的查询（按 SQL 指纹聚合，同一 QuickSight 图表的重复查询归为一组）
+CREATE OR REPLACE VIEW kiro_analytics.athena_expensive_queries AS
+SELECT
+    source,
+    dataset,
+    query_fingerprint,
+    arbitrary(query) AS sample_query,
+    COUNT(*) AS executions,
+    COUNT(DISTINCT dt) AS active_days,
+    SUM(bytes_scanned) AS total_bytes_scanned,
+    MAX(bytes_scanned) AS max_bytes_scanned,
+    AVG(total_ms) AS avg_total_ms,
+    SUM(CASE WHEN state <> 'SUCCEEDED' THEN 1 ELSE 0 END) AS failed_or_cancelled,
+    SUM(bytes_scanned) / 1099511627776.0 * 5 AS est_cost_usd,
+    RANK() OVER (ORDER BY SUM(bytes_scanned) DESC) AS cost_rank
+FROM kiro_analytics.athena_query_telemetry
+WHERE dt >= date_format(date_add('day', -30, current_date), '%Y-%m-%d')
+GROUP BY source, dataset, query_fingerprint;
+
+-- 每日扫描量（按来源）
+CREATE OR REPLACE VIEW kiro_analytics.athena_daily_scan AS
+SELECT
+    dt,
+    source,
+    COUNT(*) AS queries,
+    SUM(bytes_scanned) AS total_bytes_scanned,
+    SUM(bytes_scanned) / 1099511627776.0 * 5 AS est_cost_usd
+FROM kiro_analytics.athena_query_telemetry
+GROUP BY dt, source;
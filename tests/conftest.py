@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+os.environ['KIRO_METRICS'] = 'off'
+
+from kiro_analytics import simulator  # noqa: E402
+
+
+@pytest.fixture
+def sim():
+    """内存中的 AWS 替身，不 sleep、不限流"""
+    s = simulator.Simulation(users=20, time_scale=0, seed=1)
+    with s.installed():
+        yield s
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+from kiro_analytics import backfill
+
+TEMPLATE = """
+-- @once
+CREATE TABLE IF NOT EXISTS {db}.t (x int);
+
+-- @clear s3://{bucket}/derived/t/dt={dt}/
+INSERT INTO {db}.t SELECT 1 FROM {db}.src WHERE {partition_filter};
+"""
+
+
+def test_split_range_by_day_and_week():
+    assert backfill.split_range('2026-03-01', '2026-03-03') == [
+        (date(2026, 3, 1), date(2026, 3, 1)), (date(2026, 3, 2), date(2026, 3, 2)),
+        (date(2026, 3, 3), date(2026, 3, 3))]
+    # 2026-03-04 是周三：第一块到周日，之后每块从周一开始
+    assert backfill.split_range('2026-03-04', '2026-03-17', chunk='week') == [
+        (date(2026, 3, 4), date(2026, 3, 8)), (date(2026, 3, 9), date(2026, 3, 15)),
+        (date(2026, 3, 16), date(2026, 3, 17))]
+
+
+def test_parse_template_directives():
+    once, per_chunk, clear = backfill.parse_template(TEMPLATE)
+    assert once == ['CREATE TABLE IF NOT EXISTS {db}.t (x int)']
+    assert per_chunk == ['INSERT INTO {db}.t SELECT 1 FROM {db}.src WHERE {partition_filter}']
+    assert clear == ['s3://{bucket}/derived/t/dt={dt}/']
+
+
+def test_render_fills_dates_and_partition_filter():
+    sql = backfill.render('SELECT {start} {end} {partition_filter}', {'db': 'd'},
+                          date(2026, 3, 1), date(2026, 3, 2))
+    assert sql.startswith('SELECT 2026-03-01 2026-03-02 partition_1')
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    """用线程池代替进程池，run_chunk 按 scanned[start] 返回扫描字节数"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(backfill, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(backfill, 'start_query', lambda *a, **k: 'qid')
+    monkeypatch.setattr(backfill, 'wait_query', lambda *a, **k: {})
+    scanned = {}
+    executed = []
+
+    def fake_chunk(job, statements, clear, params, start, end, workgroup, region):
+        executed.append(start)
+        n = scanned.get(start, 100)
+        return {'start': start.isoformat(), 'end': end.isoformat(), 'days': (end - start).days + 1,
+                'seconds': 0, 'bytes_scanned': n, 'empty': n == 0, 'query_ids': []}
+
+    monkeypatch.setattr(backfill, 'run_chunk', fake_chunk)
+
+    def run(start, end, today):
+        executed.clear()
+        return backfill.run('job', TEMPLATE, {'db': 'd', 'bucket': 'b'}, start, end,
+                            today=today, log=lambda *_: None), sorted(executed)
+
+    return run, scanned
+
+
+def test_empty_chunks_are_not_checkpointed(runner):
+    run, scanned = runner
+    today = date(2026, 3, 20)
+    scanned[date(2026, 3, 2)] = 0
+    summary, _ = run('2026-03-01', '2026-03-03', today)
+    assert summary['empty'] == [(date(2026, 3, 2), date(2026, 3, 2))]
+    assert set(backfill.Checkpoint('job').done) == {'2026-03-01..2026-03-01', '2026-03-03..2026-03-03'}
+
+    # 报告到达后再次运行只重跑缺失的那一天
+    scanned[date(2026, 3, 2)] = 50
+    _, executed = run('2026-03-01', '2026-03-03', today)
+    assert executed == [date(2026, 3, 2)]
+    assert '2026-03-02..2026-03-02' in backfill.Checkpoint('job').done
+
+
+def test_trailing_days_are_always_redone(runner):
+    run, _ = runner
+    today = date(2026, 3, 10)
+    run('2026-03-01', '2026-03-09', today)
+    _, executed = run('2026-03-01', '2026-03-09', today)
+    assert executed == [date(2026, 3, 7), date(2026, 3, 8), date(2026, 3, 9)]
+
+
+def test_redone_chunk_that_turns_empty_loses_its_checkpoint(runner):
+    run, scanned = runner
+    today = date(2026, 3, 10)
+    run('2026-03-09', '2026-03-09', today)
+    assert backfill.Checkpoint('job').is_done(date(2026, 3, 9), date(2026, 3, 9))
+    scanned[date(2026, 3, 9)] = 0
+    run('2026-03-09', '2026-03-09', today)
+    assert not backfill.Checkpoint('job').is_done(date(2026, 3, 9), date(2026, 3, 9))
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+from kiro_analytics import bucketing
+from kiro_analytics.athena import run_query
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+with open(os.path.join(REPO_DIR, 'sql', 'bucketed', 'by_userid.sql')) as f:
+    TEMPLATE = f.read()
+OLD_KEY = 'derived/bucketed/user_report/ym=2026-01/0.parquet'
+
+
+def test_bucket_count_is_power_of_two_and_capped():
+    mb = 1024 ** 2
+    assert bucketing.bucket_count({}) == 1
+    assert bucketing.bucket_count({'2026-03': 300 * mb, '2026-02': 10 * mb}) == 2
+    assert bucketing.bucket_count({'2026-03': 1000 * mb}) == 4
+    assert bucketing.bucket_count({'2026-03': 10 ** 6 * mb}) == bucketing.MAX_BUCKETS
+
+
+@pytest.fixture
+def athena(sim, monkeypatch):
+    """模拟的 Athena 执行 CTAS 并登记表；fail_on 中的月份查询失败"""
+    sqls, fail_on = [], set()
+
+    def failing_run_query(sql, label=None, **kwargs):
+        if label[-6:] in fail_on:
+            raise RuntimeError(f'Query exhausted resources: {label}')
+        sqls.append(sql)
+        return run_query(sql, label=label, **kwargs)
+
+    monkeypatch.setattr(bucketing, 'run_query', failing_run_query)
+    sim.tables[('db', 'user_report')] = {
+        'Name': 'user_report',
+        'StorageDescriptor': {'Columns': [{'Name': c} for c in ('date', 'userid', 'credits_used')]},
+        'PartitionKeys': [{'Name': f'partition_{i}'} for i in range(4)]}
+    sim.tables[('db', 'user_report_bucketed')] = {
+        'Name': 'user_report_bucketed', 'StorageDescriptor': {'Location': 's3://b/derived/bucketed/user_report/'}}
+    sim.objects[OLD_KEY] = b'old'
+    return sqls, fail_on
+
+
+def rebuild(months):
+    return bucketing.rebuild(TEMPLATE, 'db', 'b', 'user_report', 'user_report', 4, months, log=lambda *_: None)
+
+
+def building_tables(sim):
+    return [name for _, name in sim.tables if bucketing.TMP_SUFFIX in name]
+
+
+def test_rebuild_runs_one_bucketed_ctas_per_month(sim, athena):
+    sqls, _ = athena
+    rebuild(['2026-03', '2026-01', '2026-02'])
+    assert [s.split()[2] for s in sqls] == [
+        'db.user_report_bucketed_building_202601', 'db.user_report_bucketed_building_202602',
+        'db.user_report_bucketed_building_202603']
+    assert "partition_1 = '2026' AND partition_2 = '01'" in sqls[0]
+    assert "/ym=2026-03/'" in sqls[2] and "bucket_count = 4" in sqls[2]
+    assert '"date",\n    "userid",\n    "credits_used",' in sqls[0]
+    assert 'SELECT *' not in sqls[0] and 'partition_0' not in sqls[0]
+
+    table = sim.tables[('db', 'user_report_bucketed')]
+    location = table['StorageDescriptor']['Location']
+    assert location.startswith('s3://b/derived/bucketed/user_report-')
+    assert table['StorageDescriptor']['BucketColumns'] == ['userid_norm']
+    assert table['StorageDescriptor']['NumberOfBuckets'] == 4
+    assert table['PartitionKeys'] == [{'Name': 'ym', 'Type': 'string'}]
+    assert table['Parameters']['projection.ym.range'] == '2026-01,2026-03'
+    assert table['Parameters']['storage.location.template'] == location + 'ym=${ym}/'
+    assert building_tables(sim) == []
+    assert OLD_KEY not in sim.objects
+    assert sum(k.startswith(location[len('s3://b/'):]) for k in sim.objects) == 3
+    # 正式表原地更新，不经过删除再创建
+    assert ('glue', 'UpdateTable') in sim.calls and ('glue', 'CreateTable') not in sim.calls
+
+
+def test_failed_month_keeps_the_old_table(sim, athena):
+    _, fail_on = athena
+    fail_on.add('202602')
+    with pytest.raises(RuntimeError):
+        rebuild(['2026-01', '2026-02'])
+    table = sim.tables[('db', 'user_report_bucketed')]
+    assert table['StorageDescriptor']['Location'] == 's3://b/derived/bucketed/user_report/'
+    assert building_tables(sim) == []
+    assert list(sim.objects) == [OLD_KEY]
+
+
+def test_failed_update_keeps_the_old_table(sim, athena, monkeypatch):
+    from kiro_analytics.simulator import FakeGlue
+
+    def update_table(self, DatabaseName, TableInput, **kwargs):
+        raise self._error('ThrottlingException', 'UpdateTable')
+
+    monkeypatch.setattr(FakeGlue, 'update_table', update_table)
+    with pytest.raises(Exception):
+        rebuild(['2026-01'])
+    table = sim.tables[('db', 'user_report_bucketed')]
+    assert table['StorageDescriptor']['Location'] == 's3://b/derived/bucketed/user_report/'
+    assert building_tables(sim) == []
+    assert list(sim.objects) == [OLD_KEY]
+
+
+def test_first_rebuild_creates_the_table(sim, athena):
+    del sim.tables[('db', 'user_report_bucketed')]
+    rebuild(['2026-01'])
+    assert ('glue', 'CreateTable') in sim.calls
+    assert sim.tables[('db', 'user_report_bucketed')]['Parameters']['projection.ym.range'] == '2026-01,2026-01'
+
+
+def test_simulated_athena_rejects_insert_into_bucketed_tables(sim, athena):
+    rebuild(['2026-01'])
+    with pytest.raises(Exception):
+        run_query('INSERT INTO db.user_report_bucketed SELECT 1', label='insert')
@@ -0,0 +1,74 @@
+from datetime import date
+
+import pytest
+
+from kiro_analytics import cohorts
+
+
+def test_complete_weeks():
+    assert cohorts.complete_weeks(date(2026, 3, 2), date(2026, 3, 15)) == [date(2026, 3, 2), date(2026, 3, 9)]
+    assert cohorts.complete_weeks(date(2026, 3, 2), date(2026, 3, 7)) == []
+
+
+@pytest.fixture
+def env(monkeypatch):
+    """state 保存在内存中，记录执行的查询；arrived 为报告已到达的日期"""
+    state = {'first_seen_through': None, 'retention_through': None}
+    queries = []
+    arrived = set()
+    monkeypatch.setattr(cohorts, 'load_state', lambda *a: dict(state))
+    monkeypatch.setattr(cohorts, 'save_state', lambda bucket, s, region=None: state.update(s))
+    monkeypatch.setattr(cohorts, 'clear_prefix', lambda *a, **k: None)
+    monkeypatch.setattr(cohorts, 'earliest_cohort', lambda *a, **k: date(2026, 3, 2))
+    monkeypatch.setattr(cohorts, 'run_query', lambda sql, label=None, **k: queries.append(label) or [])
+    monkeypatch.setattr(cohorts.reports, 'day_arrived', lambda bucket, base, day, region=None: day in arrived)
+    return state, queries, arrived
+
+
+def run(end, today):
+    return cohorts.update('db', 'b', end, 'base/', today=today, log=lambda *_: None)
+
+
+def test_first_seen_applies_delivery_lag(env):
+    state, _, arrived = env
+    today = date(2026, 3, 20)
+    arrived.update(date(2026, 3, d) for d in range(1, 20))
+    run(date(2026, 3, 19), today)
+    # 最近 3 天（17~19）和 redo_from 当天之前一天为止
+    assert state['first_seen_through'] == '2026-03-16'
+
+
+def test_first_seen_stops_at_first_missing_day(env):
+    state, _, arrived = env
+    today = date(2026, 3, 20)
+    state['first_seen_through'] = '2026-03-10'
+    # 3-13 及之前已不会再补投；3-14 尚未到达，挡住之后已到达的 3-15
+    arrived.update({date(2026, 3, 15)})
+    run(date(2026, 3, 19), today)
+    assert state['first_seen_through'] == '2026-03-13'
+
+    arrived.update({date(2026, 3, 14), date(2026, 3, 16)})
+    run(date(2026, 3, 19), today)
+    assert state['first_seen_through'] == '2026-03-16'
+
+
+def retention_queries(queries):
+    return [q.split(':')[1] for q in queries if q.startswith(cohorts.RETENTION)]
+
+
+def test_open_weeks_are_recomputed_until_final(env):
+    state, queries, arrived = env
+    arrived.update(date(2026, 3, d) for d in range(1, 31))
+    run(date(2026, 3, 19), date(2026, 3, 20))
+    # 两周都已完整；3-08 已超过 7 天，第一周关闭，3-15 还可能补投，第二周未关闭
+    assert retention_queries(queries) == ['2026-03-02', '2026-03-09']
+    assert state['retention_through'] == '2026-03-02'
+
+    queries.clear()
+    run(date(2026, 3, 19), date(2026, 3, 20))
+    assert retention_queries(queries) == ['2026-03-09']
+
+    queries.clear()
+    run(date(2026, 3, 21), date(2026, 3, 22))
+    assert retention_queries(queries) == ['2026-03-09']
+    assert state['retention_through'] == '2026-03-09'
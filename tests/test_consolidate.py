@@ -0,0 +1,49 @@
+from kiro_analytics import consolidate
+
+HEADER = 'date,userid,client_type,credits_used,overage_cap,subscription_tier'
+
+
+def test_merge_sums_counters_and_takes_max_cap():
+    rows = consolidate.merge_client_rows(HEADER, [
+        '2026-03-01,u1,KIRO_CLI,1.5,100,PRO',
+        '2026-03-01,u1,KIRO_IDE,2,200,PRO',
+        '2026-03-01,u2,KIRO_IDE,3,100,PRO',
+    ])
+    assert rows == ['2026-03-01,u1,ALL,3.5,200,PRO', '2026-03-01,u2,KIRO_IDE,3,100,PRO']
+
+
+def test_merge_keeps_quotes_and_fills_empty_text():
+    rows = consolidate.merge_client_rows(HEADER, [
+        '2026-03-01,"u1","KIRO_CLI",1,100,',
+        '2026-03-01,"u1","KIRO_IDE",1,100,PRO',
+    ])
+    assert rows == ['2026-03-01,"u1","ALL",2,100,PRO']
+
+
+def test_merge_keeps_rows_with_wrong_width():
+    rows = consolidate.merge_client_rows(HEADER, ['2026-03-01,u1,KIRO_CLI,1,100,PRO,extra',
+                                                  '2026-03-01,u1,KIRO_CLI,1,100,PRO'])
+    assert rows[0] == '2026-03-01,u1,KIRO_CLI,1,100,PRO,extra'
+    assert len(rows) == 2
+
+
+def test_merge_passes_non_finite_values_through():
+    rows = consolidate.merge_client_rows(HEADER, [
+        '2026-03-01,u1,KIRO_CLI,nan,inf,PRO',
+        '2026-03-01,u1,KIRO_IDE,2,100,PRO',
+        '2026-03-01,u2,KIRO_CLI,1e308,1,PRO',
+        '2026-03-01,u2,KIRO_IDE,1e308,1,PRO',
+    ])
+    assert rows == ['2026-03-01,u1,ALL,nan,inf,PRO', '2026-03-01,u2,ALL,,1,PRO']
+
+
+def test_ensure_tables_falls_back_to_crawler_regions(sim):
+    sim.seed_glue_tables('db')
+    sim.partitions[('db', 'user_report')] = [{'Values': ['eu-west-1', '2026', '03', '01']}]
+    messages = []
+    created = consolidate.ensure_tables('db', 'b', set(), log=messages.append)
+    assert created == ['user_report_compact']
+    params = sim.tables[('db', 'user_report_compact')]['Parameters']
+    assert params['projection.partition_0.values'] == 'eu-west-1'
+    assert ('db', 'by_user_analytic_compact') not in sim.tables
+    assert 'by_user_analytic' in messages[0]
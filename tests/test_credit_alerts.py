@@ -0,0 +1,52 @@
+from datetime import date
+
+from kiro_analytics import credit_alerts
+
+
+def row(credits, cap='100'):
+    return {'userid': '"u1"', 'credits_used': credits, 'overage_cap': cap, 'subscription_tier': 'PRO'}
+
+
+def test_thresholds_are_strict():
+    users = {}
+    assert credit_alerts.apply_rows(users, [row('80')]) == []
+    [warning] = credit_alerts.apply_rows(users, [row('0.5')])
+    assert warning['status'] == 'Warning'
+    assert credit_alerts.apply_rows(users, [row('19.5')]) == []
+    [over] = credit_alerts.apply_rows(users, [row('0.1')])
+    assert over['status'] == 'Over Limit' and over['userid'] == 'u1'
+    assert credit_alerts.apply_rows(users, [row('10')]) == []
+
+
+def test_no_alert_without_cap():
+    assert credit_alerts.apply_rows({}, [row('500', cap='0')]) == []
+
+
+def test_prune_processed_keeps_recent_keys():
+    key = 'p/AWSLogs/1/KiroLogs/user_report/us-east-1/2026/03/{:02d}/00/a.csv'
+    state = {'processed': [key.format(d) for d in range(1, 21)], 'users': {}}
+    credit_alerts.prune_processed(state)
+    assert state['processed'] == [key.format(d) for d in range(14, 21)]
+    assert state['processed_since'] == '2026-03-14'
+
+
+def test_process_keys_skips_processed_and_pruned_keys(sim):
+    key = 'p/AWSLogs/1/KiroLogs/user_report/us-east-1/2026/03/{:02d}/00/a.csv'
+    body = b'date,userid,client_type,subscription_tier,credits_used,overage_cap\n2026-03-01,u1,KIRO_IDE,PRO,50,100\n'
+    for d in (1, 10, 20):
+        sim.objects[key.format(d)] = body
+    assert credit_alerts.process_keys('b', [key.format(10), key.format(20)]) != []
+    # 3-01 早于 processed_since（3-14），已处理过的 3-20 也不会重复累加
+    assert credit_alerts.process_keys('b', [key.format(1), key.format(20)]) == []
+    state = credit_alerts.load_state('b', '2026-03')
+    assert state['users']['u1'][0] == 100
+
+
+def test_recent_keys_pick_up_late_files(sim):
+    base = 'p/AWSLogs/1/KiroLogs/'
+    today = date(2026, 3, 10)
+    late = f'{base}user_report/us-east-1/2026/03/07/00/late.csv'
+    old = f'{base}user_report/us-east-1/2026/03/06/00/old.csv'
+    sim.objects[late] = sim.objects[old] = b'date,userid,credits_used\n'
+    assert credit_alerts.recent_keys('b', base, today) == [late]
+    assert credit_alerts.RECENT_DAYS < credit_alerts.PROCESSED_RETAIN_DAYS
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from kiro_analytics import data_quality  # noqa: E402
+from kiro_analytics.userid_scan import LocalSource  # noqa: E402
+
+BASE = 'r/AWSLogs/1/KiroLogs/'
+REPORT_HEADER = ('date,userid,client_type,subscription_tier,credits_used,overage_cap,overage_credits_used,'
+                 'overage_enabled,total_messages,chat_conversations,profileid')
+
+
+def write(root, table, lines, day='2026/03/05'):
+    key = f'{BASE}{table}/us-east-1/{day}/00/a.csv'
+    path = os.path.join(root, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return key
+
+
+def validate(tmp_path, table, lines):
+    key = write(str(tmp_path), table, lines)
+    return data_quality.validate_file(LocalSource(str(tmp_path)), key)
+
+
+def report_row(userid='u1', credits='1.5', tier='PRO', profile='arn:aws:codewhisperer:us-east-1:1:profile/X',
+               client='KIRO_IDE', date='2026-03-05'):
+    return f'{date},{userid},{client},{tier},{credits},100,0,false,3,1,{profile}'
+
+
+def test_clean_user_report(tmp_path):
+    result = validate(tmp_path, 'user_report', [REPORT_HEADER, report_row(), report_row(userid='u2')])
+    assert result['rows'] == 2
+    assert result['issues'] == {}
+
+
+def test_counter_columns_must_be_numeric(tmp_path):
+    result = validate(tmp_path, 'user_report', [REPORT_HEADER, report_row(credits='abc'), report_row(credits='-1')])
+    assert result['issues'] == {'non_numeric': 1, 'negative': 1}
+
+
+def test_text_columns_are_not_numeric_checked(tmp_path):
+    # subscription_tier / profileid 以及未列出的新列都是文本，不应报 non_numeric
+    header = REPORT_HEADER + ',new_text_column'
+    result = validate(tmp_path, 'user_report', [header, report_row() + ',hello'])
+    assert 'non_numeric' not in result['issues']
+    assert result['issues'] == {'column_count': 12}
+
+
+def test_userid_date_and_client_type(tmp_path):
+    result = validate(tmp_path, 'user_report', [
+        REPORT_HEADER,
+        report_row(userid=''),
+        report_row(userid='"u1"'),
+        report_row(date='03-05-2026'),
+        report_row(date='2026-03-04'),
+        report_row(client='KIRO_WEB'),
+    ])
+    assert result['issues'] == {'null_userid': 1, 'quoted_userid': 1, 'bad_date': 1, 'date_mismatch': 1,
+                                'unknown_client_type': 1}
+
+
+def test_by_user_analytic_date_format_and_missing_columns(tmp_path):
+    counters = sorted(data_quality.COUNTER_COLUMNS['by_user_analytic'])
+    header = ','.join(['date', 'userid'] + counters)
+    row = ','.join(['03-05-2026', 'u1'] + ['1'] * len(counters))
+    result = validate(tmp_path, 'by_user_analytic', [header, row, row.replace('03-05-2026', '2026-03-05')])
+    assert result['issues']['bad_date'] == 1
+    assert result['issues']['column_count'] == len(counters) + 2
+    assert 'missing_columns' not in result['issues']
+
+
+def test_bad_rows_are_counted_not_fatal(tmp_path):
+    result = validate(tmp_path, 'user_report', [REPORT_HEADER, report_row(), 'short,row', report_row()])
+    assert result['rows'] == 2
+    assert result['issues'] == {'bad_rows': 1}
+
+
+def test_summarize_splits_errors_and_warnings():
+    summary = data_quality.summarize([
+        {'rows': 2, 'bytes': 10, 'issues': {'non_numeric': 1, 'quoted_userid': 2}},
+        {'rows': 1, 'bytes': 5, 'issues': {'non_numeric': 1}},
+    ])
+    assert summary['errors'] == {'non_numeric': 2}
+    assert summary['warnings'] == {'quoted_userid': 2}
+    assert (summary['rows'], summary['bytes']) == (3, 15)
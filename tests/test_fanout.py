@@ -0,0 +1,37 @@
+from kiro_analytics import fanout
+
+LAYOUT = {
+    '111111111111': {'by_user_analytic': ['us-east-1'], 'user_report': ['us-east-1']},
+    '222222222222': {'by_user_analytic': ['eu-west-1'], 'user_report': ['eu-west-1']},
+}
+
+
+def projection(sim, table='user_report_all'):
+    params = sim.tables[('db', table)]['Parameters']
+    return params['projection.account.values'], params['projection.partition_0.values']
+
+
+def test_table_input_adds_account_partition():
+    crawler = {'Name': 'user_report', 'StorageDescriptor': {'Columns': []}}
+    ti = fanout.table_input(crawler, 'b', LAYOUT)
+    assert ti['Name'] == 'user_report_all'
+    assert ti['PartitionKeys'][0] == {'Name': 'account', 'Type': 'string'}
+    assert ti['Parameters']['storage.location.template'].startswith('s3://b/org/user_report/${account}/')
+
+
+def test_filtered_run_keeps_other_accounts(sim):
+    sim.seed_glue_tables('db')
+    fanout.ensure_tables('db', 'b', LAYOUT)
+    fanout.ensure_tables('db', 'b', {'111111111111': LAYOUT['111111111111']})
+    assert projection(sim) == ('111111111111,222222222222', 'eu-west-1,us-east-1')
+
+
+def test_discover_filters_accounts(sim):
+    for account, tables in LAYOUT.items():
+        for table, regions in tables.items():
+            for r in regions:
+                sim.objects[f'p/AWSLogs/{account}/KiroLogs/{table}/{r}/2026/03/01/00/a.csv'] = b'x'
+    from kiro_analytics.userid_scan import S3Source
+    source = S3Source('b')
+    assert fanout.discover(source, 'p/') == LAYOUT
+    assert list(fanout.discover(source, 'p/', ['222222222222'])) == ['222222222222']
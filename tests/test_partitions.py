@@ -0,0 +1,22 @@
+from datetime import date
+
+from kiro_analytics import partitions
+
+
+def test_date_filter_uses_partition_columns():
+    sql = partitions.date_filter('2025-12-30', '2026-01-02')
+    assert "partition_1 BETWEEN '2025' AND '2026'" in sql
+    assert "BETWEEN '2025-12-30' AND '2026-01-02'" in sql
+
+
+def test_iter_days_is_inclusive():
+    days = list(partitions.iter_days(date(2026, 2, 27), date(2026, 3, 2)))
+    assert days == [date(2026, 2, 27), date(2026, 2, 28), date(2026, 3, 1), date(2026, 3, 2)]
+    assert list(partitions.iter_days(date(2026, 3, 2), date(2026, 3, 1))) == []
+
+
+def test_redo_from_and_is_final():
+    today = date(2026, 3, 10)
+    assert partitions.redo_from(today) == date(2026, 3, 7)
+    assert partitions.is_final(date(2026, 3, 3), today)
+    assert not partitions.is_final(date(2026, 3, 4), today)
@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+import pytest
+
+from kiro_analytics import rolling
+
+
+def test_incremental_sql_adds_day_and_subtracts_each_window():
+    sql = rolling.incremental_sql('db', date(2026, 3, 31))
+    assert "FROM db.user_rolling_metrics WHERE dt = '2026-03-30'" in sql
+    assert "FROM db.daily_user_activity WHERE dt = '2026-03-31'" in sql
+    for w in rolling.WINDOWS:
+        assert f"WHERE dt = '{date(2026, 3, 31) - timedelta(days=w)}'" in sql
+    assert "'2026-03-31' AS dt" in sql
+
+
+def test_bootstrap_sql_reads_the_longest_window():
+    sql = rolling.bootstrap_sql('db', date(2026, 3, 31))
+    assert "WHERE dt BETWEEN '2026-01-01' AND '2026-03-31'" in sql
+    # 7 天窗口从 D-6 开始
+    assert "dt >= '2026-03-25' THEN chat_messagessent" in sql
+
+
+def test_default_start_redoes_trailing_days_and_recent_gaps():
+    today = date(2026, 3, 20)
+    end = date(2026, 3, 19)
+    done = {str(date(2026, 3, d)) for d in range(1, 20)}
+    assert rolling.default_start(done, end, today) == date(2026, 3, 17)
+    # 近 7 天内未生成的日期也会被重新尝试
+    assert rolling.default_start(done - {'2026-03-14'}, end, today) == date(2026, 3, 14)
+    # 已超过 FINAL_AFTER_DAYS 的缺口不再追溯
+    assert rolling.default_start(done - {'2026-03-05'}, end, today) == date(2026, 3, 17)
+    assert rolling.default_start(set(), end, today) == end
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    calls = []
+    monkeypatch.setattr(rolling, 'ensure_table', lambda *a, **k: None)
+    monkeypatch.setattr(rolling, 'clear_prefix', lambda *a, **k: None)
+    monkeypatch.setattr(rolling, 'update_day',
+                        lambda db, bucket, day, incremental, **k: calls.append((day, incremental)) or
+                        ('incremental' if incremental else 'bootstrap'))
+    return calls
+
+
+def test_update_skips_days_without_source_and_bootstraps_after_gap(monkeypatch, recorded):
+    today = date(2026, 3, 20)
+    monkeypatch.setattr(rolling, 'done_days', lambda *a: {'2026-03-15'})
+    monkeypatch.setattr(rolling, 'source_days', lambda *a: {'2026-03-16', '2026-03-18'})
+    days = [date(2026, 3, d) for d in (16, 17, 18)]
+    skipped = rolling.update('db', 'b', days, today=today, log=lambda *_: None)
+    assert skipped == [date(2026, 3, 17)]
+    assert recorded == [(date(2026, 3, 16), True), (date(2026, 3, 18), False)]
+
+
+def test_update_treats_old_missing_days_as_empty(monkeypatch, recorded):
+    today = date(2026, 3, 20)
+    monkeypatch.setattr(rolling, 'done_days', lambda *a: {'2026-03-01'})
+    monkeypatch.setattr(rolling, 'source_days', lambda *a: set())
+    skipped = rolling.update('db', 'b', [date(2026, 3, 2)], today=today, log=lambda *_: None)
+    assert skipped == []
+    assert recorded == [(date(2026, 3, 2), True)]
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from kiro_analytics import rollup_cache  # noqa: E402
+
+DAYS = ['2026-03-01', '2026-03-02']
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """两天、三个用户的本地分段，与 _convert 写出的结构相同"""
+    writer = rollup_cache.RollupCache('b', cache_dir=str(tmp_path))
+    for table, (strings, numeric) in rollup_cache.TABLES.items():
+        for i, dt in enumerate(DAYS):
+            out = os.path.join(str(tmp_path), table, f'dt={dt}')
+            os.makedirs(out)
+            np.save(os.path.join(out, 'userid.npy'), writer._encode('userid', ['"a"', '"b"', '"c"']))
+            if 'subscription_tier' in strings:
+                np.save(os.path.join(out, 'subscription_tier.npy'),
+                        writer._encode('subscription_tier', ['PRO', 'PRO', 'FREE']))
+            for col in numeric:
+                np.save(os.path.join(out, f'{col}.npy'), np.array([1.0, 2.0, 3.0]) * (i + 1))
+            writer.manifest.setdefault(table, {})[dt] = {}
+    writer._save_json('manifest.json', writer.manifest)
+    writer._save_json('dictionaries.json', writer.dictionaries)
+    return rollup_cache.RollupCache('b', cache_dir=str(tmp_path)).open_segments()
+
+
+def test_top_users_sums_across_days(cache):
+    top = cache.top_users('credits_used', DAYS[0], DAYS[1], n=2)
+    assert [(u['userid'], u['credits_used']) for u in top] == [('c', 9.0), ('b', 6.0)]
+    assert cache.top_users('credits_used', '2027-01-01', '2027-01-02') == []
+
+
+def test_daily_and_tier_summary(cache):
+    daily = cache.daily_summary(DAYS[0], DAYS[1])
+    assert [(d['date'], d['active_users'], d['chat_aicodelines']) for d in daily] == [
+        ('2026-03-01', 3, 6.0), ('2026-03-02', 3, 12.0)]
+    tiers = {t['subscription_tier']: (t['user_count'], t['total_credits'])
+             for t in cache.tier_summary(DAYS[0], DAYS[1])}
+    assert tiers == {'PRO': (2, 9.0), 'FREE': (1, 9.0)}
+    assert cache.total('credits_used', DAYS[1], DAYS[1]) == 12.0
+
+
+def test_unknown_metric():
+    with pytest.raises(ValueError):
+        rollup_cache.metric_table('nope')
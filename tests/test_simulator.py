@@ -0,0 +1,22 @@
+import pytest
+
+from kiro_analytics import simulator, user_mapping
+
+
+def test_sync_full_under_throttling():
+    sim = simulator.Simulation(users=50, throttle_rate=0.2, time_scale=0, seed=3)
+    with sim.installed():
+        sim.seed_glue_tables('db')
+        mapping = user_mapping.sync('b', 'db', 'd-1', log=lambda *_: None)
+    summary = sim.summary()
+    assert len(mapping) == 50
+    assert summary['throttled'] > 0
+    assert summary['failed'] == 0
+
+
+def test_retries_are_exhausted_when_always_throttled():
+    sim = simulator.Simulation(users=1, throttle_rate=1.0, time_scale=0)
+    with pytest.raises(Exception):
+        sim.call('identitystore', 'DescribeUser')
+    calls, throttled, failed = sim.calls[('identitystore', 'DescribeUser')]
+    assert (calls, throttled, failed) == (simulator.RETRY_ATTEMPTS, simulator.RETRY_ATTEMPTS, 1)
@@ -0,0 +1,33 @@
+from datetime import date
+
+import pytest
+
+from kiro_analytics import statements
+
+
+def test_literal_dates_and_identifiers():
+    assert statements.literal('date', '2026-03-01') == "'2026-03-01'"
+    assert statements.literal('date', date(2026, 3, 1)) == "'2026-03-01'"
+    assert statements.literal('userid', '"24681498-20e1-7057"') == "'24681498-20e1-7057'"
+    assert statements.literal('tier', 'PRO_PLUS') == "'PRO_PLUS'"
+
+
+@pytest.mark.parametrize('kind, value', [
+    ('date', '03/01/2026'),
+    ('userid', "u1' OR '1'='1"),
+    ('userid', ''),
+    ('tier', 'PRO;DROP'),
+])
+def test_literal_rejects_bad_values(kind, value):
+    with pytest.raises(ValueError):
+        statements.literal(kind, value)
+
+
+def test_parameters_follow_placeholder_order():
+    name = 'user_activity'
+    _, params, _ = statements.CATALOG[name]
+    values = {'userid': 'u1', 'start': '2026-03-01', 'end': '2026-03-07'}
+    assert statements.parameters(name, values) == [statements.literal(statements.PARAM_TYPES[p], values[p])
+                                                   for p in params]
+    with pytest.raises(ValueError):
+        statements.parameters(name, {'userid': 'u1'})
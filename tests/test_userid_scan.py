@@ -0,0 +1,26 @@
+from datetime import date
+
+from kiro_analytics import partitions, userid_scan
+
+LINES = ['date,userid,client_type', '2026-03-01,"u1",KIRO_CLI', '2026-03-01,u2,KIRO_IDE', '2026-03-01,,KIRO_IDE']
+
+
+def test_userids_strip_quotes_by_default():
+    assert userid_scan.userids_from_lines(LINES) == {'u1', 'u2'}
+
+
+def test_userids_keep_quotes_for_lazy_simple_serde():
+    assert userid_scan.userids_from_lines(LINES, keep_quotes=True) == {'"u1"', 'u2'}
+
+
+def test_userids_without_userid_column():
+    assert userid_scan.userids_from_lines(['date,client_type', '2026-03-01,KIRO_CLI']) == set()
+    assert userid_scan.userids_from_lines([]) == set()
+
+
+def test_recent_days_cover_late_reports():
+    today = date(2026, 3, 10)
+    days = userid_scan.recent_days(today)
+    assert days[0] == today
+    assert days[-1] == partitions.redo_from(today)
+    assert userid_scan.recent_days(today, 2) == [date(2026, 3, 10), date(2026, 3, 9)]